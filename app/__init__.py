@@ -1,6 +1,16 @@
 
 from app.db.models import Base
 from app.db.connect import engine
+from app.db.notifications import install_notify_triggers
+from app.db.partitions import install_partitioning
+from app.db.prediction_facts import install_prediction_facts_triggers
+from app.db.raster_stats import install_raster_stats_triggers
+from app.db.versioning import install_version_triggers
 
 
 Base.metadata.create_all(bind=engine)
+install_version_triggers(engine)
+install_notify_triggers(engine)
+install_raster_stats_triggers(engine)
+install_prediction_facts_triggers(engine)
+install_partitioning(engine)
@@ -1,3 +1,4 @@
+import json
 import os
 
 from dotenv import load_dotenv
@@ -8,6 +9,10 @@ from app.config.import_secrets_AWS import get_parameter  # type: ignore
 load_dotenv(override=True)
 
 
+def env_flag(name: str, default: bool = False) -> bool:
+    return os.environ.get(name, str(default)).strip().lower() in ("1", "true", "yes")
+
+
 if "DEBUG" in os.environ:
 
     SENTINAL_HUB = {
@@ -59,3 +64,120 @@ DATABASE_URL = URL.create(
     host=DB_HOST,
     database=DB_NAME,
 )
+
+ADMIN_ENDPOINTS_ENABLED = env_flag("ADMIN_ENDPOINTS_ENABLED")
+
+# Slow query log (opt-in)
+SLOW_QUERY_LOG_ENABLED = env_flag("SLOW_QUERY_LOG_ENABLED")
+SLOW_QUERY_THRESHOLD_MS = float(os.environ.get("SLOW_QUERY_THRESHOLD_MS", 500))
+SLOW_QUERY_EXPLAIN_SAMPLE_RATE = float(
+    os.environ.get("SLOW_QUERY_EXPLAIN_SAMPLE_RATE", 0.1)
+)
+SLOW_QUERY_LOG_FILE = os.environ.get("SLOW_QUERY_LOG_FILE", "slow_queries.log")
+
+# Per-request profiling (opt-in, debugging only): requests sent with
+# `X-Profile: 1` or `?profile=1` are profiled, sampling every
+# PROFILING_INTERVAL seconds
+PROFILING_ENABLED = env_flag("PROFILING_ENABLED")
+PROFILING_INTERVAL = float(os.environ.get("PROFILING_INTERVAL", 0.001))
+
+# Requests running one statement this many times are logged as likely N+1
+# queries; 0 turns the check off
+QUERY_REPEAT_THRESHOLD = int(os.environ.get("QUERY_REPEAT_THRESHOLD", 10))
+
+# Conditional GET: max-age sent with ETags on data-versioned read routes
+DATA_CACHE_MAX_AGE = int(os.environ.get("DATA_CACHE_MAX_AGE", 0))
+
+# Server-side response cache, kept fresh by LISTEN/NOTIFY
+RESPONSE_CACHE_ENABLED = env_flag("RESPONSE_CACHE_ENABLED", True)
+RESPONSE_CACHE_MAX_BYTES = int(
+    os.environ.get("RESPONSE_CACHE_MAX_BYTES", 256 * 1024 * 1024)
+)
+# In-memory spatial index answering /aoi-centers and /aoi?bbox
+AOI_INDEX_ENABLED = env_flag("AOI_INDEX_ENABLED", True)
+
+# Seconds between attempts of startup warm-up steps that failed; /ready
+# answers 503 until all of them succeeded
+WARMUP_RETRY_SECONDS = float(os.environ.get("WARMUP_RETRY_SECONDS", 5))
+
+# Connection pooling
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", 1800))
+DB_POOL_PRE_PING = env_flag("DB_POOL_PRE_PING", True)
+# Behind PgBouncer (transaction pooling) the app keeps no pool of its own.
+DB_PGBOUNCER = env_flag("DB_PGBOUNCER")
+# Comma-separated SQLAlchemy URLs of read replicas
+DB_REPLICA_URLS = [
+    url.strip() for url in os.environ.get("DB_REPLICA_URLS", "").split(",") if url.strip()
+]
+
+# Per-route statement_timeout budgets in seconds; QUERY_BUDGETS takes a JSON
+# object overriding single routes, e.g. {"predictions": 10}
+QUERY_BUDGETS = {
+    "default": 30.0,
+    "aoi": 15.0,
+    "aoi-centers": 15.0,
+    "export": 600.0,
+    "jobs": 20.0,
+    "predictions": 20.0,
+    "predictions-by-day-and-aoi": 20.0,
+    "predictions-heatmap": 60.0,
+    "scl": 20.0,
+}
+QUERY_BUDGETS.update(json.loads(os.environ.get("QUERY_BUDGETS", "{}")))
+
+# Admission control: concurrent requests, wait queue length and queue timeout
+# (seconds) for heavy read routes and for everything else
+HEAVY_ROUTE_CONCURRENCY = int(os.environ.get("HEAVY_ROUTE_CONCURRENCY", 4))
+HEAVY_ROUTE_QUEUE = int(os.environ.get("HEAVY_ROUTE_QUEUE", 32))
+HEAVY_ROUTE_QUEUE_TIMEOUT = float(os.environ.get("HEAVY_ROUTE_QUEUE_TIMEOUT", 10))
+LIGHT_ROUTE_CONCURRENCY = int(os.environ.get("LIGHT_ROUTE_CONCURRENCY", 32))
+LIGHT_ROUTE_QUEUE = int(os.environ.get("LIGHT_ROUTE_QUEUE", 128))
+LIGHT_ROUTE_QUEUE_TIMEOUT = float(os.environ.get("LIGHT_ROUTE_QUEUE_TIMEOUT", 2))
+
+# Response compression (zstd, brotli when installed, gzip)
+COMPRESSION_ENABLED = env_flag("COMPRESSION_ENABLED", True)
+COMPRESSION_MINIMUM_SIZE = int(os.environ.get("COMPRESSION_MINIMUM_SIZE", 1024))
+# Bodies or chunks at least this large are compressed off the event loop.
+COMPRESSION_OFFLOAD_SIZE = int(
+    os.environ.get("COMPRESSION_OFFLOAD_SIZE", 256 * 1024)
+)
+
+# Generated files (tile archives): a directory or s3://bucket/prefix
+OBJECT_STORAGE_URL = os.environ.get("OBJECT_STORAGE_URL", "storage")
+# Build a PMTiles archive for every completed job in the background
+TILE_ARCHIVES_ENABLED = env_flag("TILE_ARCHIVES_ENABLED")
+TILE_ARCHIVE_POLL_SECONDS = float(os.environ.get("TILE_ARCHIVE_POLL_SECONDS", 60))
+TILE_ARCHIVE_INCLUDE_SCL = env_flag("TILE_ARCHIVE_INCLUDE_SCL")
+
+# Raster tiles: open COG handles kept, GDAL block cache (MB) and an optional
+# local directory standing in for the hosts of PredictionRaster.raster_url
+RASTER_DATASET_CACHE_SIZE = int(os.environ.get("RASTER_DATASET_CACHE_SIZE", 64))
+RASTER_BLOCK_CACHE_MB = int(os.environ.get("RASTER_BLOCK_CACHE_MB", 256))
+RASTER_LOCAL_ROOT = os.environ.get("RASTER_LOCAL_ROOT")
+
+# prediction_facts partitions created ahead of the current month, and how
+# often (seconds) the maintenance task checks
+PARTITION_PREMAKE_MONTHS = int(os.environ.get("PARTITION_PREMAKE_MONTHS", 3))
+PARTITION_MAINTENANCE_SECONDS = float(
+    os.environ.get("PARTITION_MAINTENANCE_SECONDS", 3600)
+)
+
+# Rows removed per purge transaction after DELETE /jobs or /aoi, and how
+# often (seconds) the purge worker looks for new work. A failing purge is
+# retried with exponential backoff and marked FAILED after
+# PURGE_MAX_FAILURES failed batches in a row.
+PURGE_BATCH_ROWS = int(os.environ.get("PURGE_BATCH_ROWS", 10000))
+PURGE_POLL_SECONDS = float(os.environ.get("PURGE_POLL_SECONDS", 5))
+PURGE_MAX_FAILURES = int(os.environ.get("PURGE_MAX_FAILURES", 8))
+
+# Move predictions of images older than PREDICTION_ARCHIVE_AFTER_DAYS (whole
+# months) to Parquet files in OBJECT_STORAGE_URL; checked every
+# PREDICTION_ARCHIVE_POLL_SECONDS
+PREDICTION_ARCHIVE_ENABLED = env_flag("PREDICTION_ARCHIVE_ENABLED")
+PREDICTION_ARCHIVE_AFTER_DAYS = int(os.environ.get("PREDICTION_ARCHIVE_AFTER_DAYS", 365))
+PREDICTION_ARCHIVE_POLL_SECONDS = float(
+    os.environ.get("PREDICTION_ARCHIVE_POLL_SECONDS", 3600)
+)
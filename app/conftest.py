@@ -0,0 +1,24 @@
+from contextlib import contextmanager
+
+import pytest
+
+from app.core.query_budget import QueryRecorder
+from app.db.connect import engine, replica_engines
+
+
+@pytest.fixture
+def query_budget():
+    """Fail the test when the block runs more than max_queries statements,
+    or one statement more than max_repeats times (N+1 queries):
+
+        with query_budget(max_queries=2):
+            client.get("/model")
+    """
+
+    @contextmanager
+    def budget(max_queries: int, max_repeats: int = 1):
+        with QueryRecorder([engine, *replica_engines]) as recorder:
+            yield recorder
+        recorder.check(max_queries, max_repeats)
+
+    return budget
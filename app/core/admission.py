@@ -0,0 +1,175 @@
+import asyncio
+import math
+from collections import deque
+
+from starlette.responses import JSONResponse
+
+from app.config.config import (
+    HEAVY_ROUTE_CONCURRENCY,
+    HEAVY_ROUTE_QUEUE,
+    HEAVY_ROUTE_QUEUE_TIMEOUT,
+    LIGHT_ROUTE_CONCURRENCY,
+    LIGHT_ROUTE_QUEUE,
+    LIGHT_ROUTE_QUEUE_TIMEOUT,
+)
+from app.core.metrics import CallbackGauge, Counter, registry
+
+HEAVY = "heavy"
+LIGHT = "light"
+
+# Reads that scan predictions or build large payloads.
+HEAVY_PATHS = {
+    "/aoi",
+    "/aoi-centers",
+    "/export/predictions",
+    "/images-by-day",
+    "/jobs",
+    "/predictions",
+    "/predictions-by-day-and-aoi",
+    "/predictions/heatmap",
+    "/scl",
+}
+# Never queued, so probes keep answering under load.
+EXEMPT_PATHS = {"/health", "/ready", "/metrics"}
+
+ADMISSION_REJECTED = registry.register(
+    Counter(
+        "admission_rejected_total",
+        "Requests answered 503 by admission control.",
+        ("route_class", "reason"),
+    )
+)
+
+
+class Rejected(Exception):
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class Bulkhead:
+    """At most `limit` concurrent requests, with a bounded FIFO wait queue.
+
+    A freed slot is handed straight to the oldest waiter, so late arrivals
+    cannot overtake the queue.
+    """
+
+    def __init__(self, name: str, limit: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._waiters: deque[asyncio.Future] = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    @property
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self.queue_timeout))
+
+    async def acquire(self):
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            raise Rejected("queue_full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait({waiter}, timeout=self.queue_timeout)
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+        if not waiter.done():
+            self._abandon(waiter)
+            raise Rejected("queue_timeout")
+
+    def release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def _abandon(self, waiter: asyncio.Future):
+        if waiter.done():
+            # The slot was handed over just as the waiter gave up.
+            self.release()
+        else:
+            self._waiters.remove(waiter)
+            waiter.cancel()
+
+
+def route_class(scope) -> str | None:
+    path = scope["path"]
+    if path in EXEMPT_PATHS:
+        return None
+    if scope["method"] in ("GET", "HEAD") and path in HEAVY_PATHS:
+        return HEAVY
+    return LIGHT
+
+
+bulkheads = {
+    HEAVY: Bulkhead(
+        HEAVY, HEAVY_ROUTE_CONCURRENCY, HEAVY_ROUTE_QUEUE, HEAVY_ROUTE_QUEUE_TIMEOUT
+    ),
+    LIGHT: Bulkhead(
+        LIGHT, LIGHT_ROUTE_CONCURRENCY, LIGHT_ROUTE_QUEUE, LIGHT_ROUTE_QUEUE_TIMEOUT
+    ),
+}
+
+registry.register(
+    CallbackGauge(
+        "admission_requests",
+        "Admitted and queued requests by route class.",
+        ("route_class", "state"),
+        lambda: {
+            (name, state): getattr(bulkhead, state)
+            for name, bulkhead in bulkheads.items()
+            for state in ("active", "queued")
+        },
+    )
+)
+
+
+class AdmissionControlMiddleware:
+    """Separate concurrency limits for heavy and light routes.
+
+    Heavy reads can hold at most HEAVY_ROUTE_CONCURRENCY pooled connections,
+    which leaves the rest of the pool to cheap lookups. Requests that find
+    the queue full or wait longer than the queue timeout get 503 with
+    Retry-After.
+    """
+
+    def __init__(self, app, bulkheads: dict[str, Bulkhead] = bulkheads):
+        self.app = app
+        self.bulkheads = bulkheads
+
+    async def __call__(self, scope, receive, send):
+        name = route_class(scope) if scope["type"] == "http" else None
+        if name is None:
+            await self.app(scope, receive, send)
+            return
+
+        bulkhead = self.bulkheads[name]
+        try:
+            await bulkhead.acquire()
+        except Rejected as rejected:
+            ADMISSION_REJECTED.inc((name, rejected.reason))
+            response = JSONResponse(
+                status_code=503,
+                content={"detail": "Server busy, retry later"},
+                headers={"Retry-After": str(bulkhead.retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            bulkhead.release()
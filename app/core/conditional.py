@@ -0,0 +1,115 @@
+import hashlib
+from contextvars import ContextVar
+from typing import Optional
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+
+from app.config.config import DATA_CACHE_MAX_AGE
+from app.db.connect import ReadSession
+from app.db.versioning import get_data_version
+
+# Read routes whose responses depend only on the versioned tables.
+VERSIONED_PATHS = {
+    "/aoi",
+    "/aoi-centers",
+    "/export/predictions",
+    "/images-by-day",
+    "/jobs",
+    "/predictions",
+    "/predictions-by-day-and-aoi",
+    "/predictions/heatmap",
+    "/scl",
+}
+
+# The data version the request's ETag was derived from.
+_request_data_version: ContextVar[Optional[int]] = ContextVar(
+    "request_data_version", default=None
+)
+
+
+def request_data_version() -> Optional[int]:
+    return _request_data_version.get()
+
+
+def read_data_version() -> int:
+    session = ReadSession()
+    try:
+        return get_data_version(session)
+    finally:
+        session.close()
+
+
+def make_etag(version: int, path: str, query_string: bytes) -> str:
+    digest = hashlib.sha1(
+        f"{version}:{path}?".encode() + query_string
+    ).hexdigest()[:20]
+    # Weak, because compression may change the bytes but not the content.
+    return f'W/"{digest}"'
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:]
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+class ConditionalGetMiddleware:
+    """ETag / If-None-Match for read routes, keyed on the data version.
+
+    A matching If-None-Match is answered with 304 before the route (and its
+    query) runs. The route sees the version through request_data_version(),
+    so cached bodies older than the ETag are not served under it.
+    """
+
+    def __init__(self, app, paths=VERSIONED_PATHS, max_age=DATA_CACHE_MAX_AGE):
+        self.app = app
+        self.paths = paths
+        self.cache_control = f"public, max-age={max_age}, must-revalidate"
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] not in ("GET", "HEAD")
+            or scope["path"] not in self.paths
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        version = await run_in_threadpool(read_data_version)
+        etag = make_etag(version, scope["path"], scope["query_string"])
+
+        if_none_match = Headers(scope=scope).get("if-none-match")
+        if if_none_match and _matches(if_none_match, etag):
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": 304,
+                    "headers": [
+                        (b"etag", etag.encode()),
+                        (b"cache-control", self.cache_control.encode()),
+                    ],
+                }
+            )
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        async def send_with_etag(message):
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                headers = MutableHeaders(scope=message)
+                headers["ETag"] = etag
+                headers["Cache-Control"] = self.cache_control
+            await send(message)
+
+        token = _request_data_version.set(version)
+        try:
+            await self.app(scope, receive, send_with_etag)
+        finally:
+            _request_data_version.reset(token)
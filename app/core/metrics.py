@@ -0,0 +1,284 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Optional
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+SIZE_BUCKETS = (
+    1_000, 10_000, 100_000, 1_000_000, 10_000_000, 50_000_000, 100_000_000,
+)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+
+UNMATCHED_ROUTE = "unmatched"
+
+
+@dataclass
+class RequestStats:
+    """Per-request counters filled by the engine hooks and the routes."""
+
+    db_queries: int = 0
+    db_time: float = 0.0
+    rows_fetched: int = 0
+    serialization_time: float = 0.0
+    response_bytes: int = 0
+    # SQL text (with placeholders) -> times executed
+    statements: dict = field(default_factory=dict)
+
+
+_current_stats: ContextVar[Optional[RequestStats]] = ContextVar(
+    "request_stats", default=None
+)
+
+
+def current_stats() -> Optional[RequestStats]:
+    return _current_stats.get()
+
+
+def _format_labels(labelnames: tuple, labels: tuple) -> str:
+    if not labelnames:
+        return ""
+    pairs = []
+    for name, value in zip(labelnames, labels):
+        value = (
+            str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        )
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: tuple = (), amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for labels, value in sorted(values.items()):
+            yield self.name, _format_labels(self.labelnames, labels), value
+
+
+class CallbackGauge:
+    """Gauge whose values are read from `callback` at scrape time."""
+
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple, callback):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.callback = callback
+
+    def samples(self):
+        for labels, value in sorted(self.callback().items()):
+            yield self.name, _format_labels(self.labelnames, labels), value
+
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple = (),
+        buckets: tuple = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # labels -> [per-bucket counts..., sum, count]
+        self._values: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: tuple, value: float):
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = [0] * len(self.buckets) + [0.0, 0]
+                self._values[labels] = entry
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[i] += 1
+                    break
+            entry[-2] += value
+            entry[-1] += 1
+
+    def samples(self):
+        with self._lock:
+            values = {labels: list(entry) for labels, entry in self._values.items()}
+        bucket_labelnames = self.labelnames + ("le",)
+        for labels, entry in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, entry):
+                cumulative += count
+                yield (
+                    f"{self.name}_bucket",
+                    _format_labels(bucket_labelnames, labels + (_format_value(bound),)),
+                    cumulative,
+                )
+            yield f"{self.name}_sum", _format_labels(self.labelnames, labels), entry[-2]
+            yield f"{self.name}_count", _format_labels(self.labelnames, labels), entry[-1]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+REQUESTS = registry.register(
+    Counter(
+        "http_requests_total",
+        "Total HTTP requests.",
+        ("method", "route", "status"),
+    )
+)
+REQUEST_LATENCY = registry.register(
+    Histogram(
+        "http_request_duration_seconds",
+        "Time from receiving the request to sending the last body chunk.",
+        ("method", "route"),
+    )
+)
+RESPONSE_SIZE = registry.register(
+    Histogram(
+        "http_response_size_bytes",
+        "Response body size as sent to the client.",
+        ("method", "route"),
+        buckets=SIZE_BUCKETS,
+    )
+)
+DB_QUERIES = registry.register(
+    Histogram(
+        "db_queries_per_request",
+        "Number of SQL statements executed per request.",
+        ("route",),
+        buckets=QUERY_COUNT_BUCKETS,
+    )
+)
+DB_TIME = registry.register(
+    Histogram(
+        "db_query_duration_seconds",
+        "Total time spent in SQL statements per request.",
+        ("route",),
+    )
+)
+DB_ROWS = registry.register(
+    Counter(
+        "db_rows_fetched_total",
+        "Rows returned by SELECT statements.",
+        ("route",),
+    )
+)
+SERIALIZATION_TIME = registry.register(
+    Histogram(
+        "serialization_duration_seconds",
+        "Time spent encoding response payloads per request.",
+        ("route",),
+    )
+)
+
+
+def record_db_query(duration: float, rows: int | None, statement: str = ""):
+    stats = _current_stats.get()
+    if stats is None:
+        return
+    stats.db_queries += 1
+    stats.statements[statement] = stats.statements.get(statement, 0) + 1
+    stats.db_time += duration
+    if rows is not None and rows > 0:
+        stats.rows_fetched += rows
+
+
+@contextmanager
+def serialization_timer():
+    """Attribute the time spent in the block to response serialization."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats = _current_stats.get()
+        if stats is not None:
+            stats.serialization_time += time.perf_counter() - start
+
+
+def route_label(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", UNMATCHED_ROUTE)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, DB usage and payload size per route."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current_stats.set(stats)
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                stats.response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_stats.reset(token)
+            elapsed = time.perf_counter() - start
+            method = scope["method"]
+            route = route_label(scope)
+            REQUESTS.inc((method, route, str(status_code)))
+            REQUEST_LATENCY.observe((method, route), elapsed)
+            RESPONSE_SIZE.observe((method, route), stats.response_bytes)
+            DB_QUERIES.observe((route,), stats.db_queries)
+            DB_TIME.observe((route,), stats.db_time)
+            DB_ROWS.inc((route,), stats.rows_fetched)
+            SERIALIZATION_TIME.observe((route,), stats.serialization_time)
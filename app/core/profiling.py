@@ -0,0 +1,194 @@
+"""Opt-in profiles of single requests, for diagnosing slow routes.
+
+With PROFILING_ENABLED, a request sent with `X-Profile: 1` (or `?profile=1`)
+runs under pyinstrument, or cProfile when pyinstrument is not installed.
+The response carries an `X-Profile-Id` header; the report, with the time
+split into DB, serialization and everything else, is kept in memory and
+served by GET /admin/profiles/{id}.
+
+The middleware profiles the request's task on the event loop. Payloads run
+in the threadpool through start_cancellable (app/db/deadline.py) are
+profiled in their worker thread as well; other threadpool work shows up
+as time awaited. One request is profiled at a time, others run normally.
+"""
+
+import cProfile
+import datetime
+import io
+import itertools
+import pstats
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from functools import wraps
+from typing import Callable, Optional
+from urllib.parse import parse_qs
+
+from app.config.config import PROFILING_INTERVAL
+from app.core.metrics import current_stats
+
+try:
+    from pyinstrument import Profiler
+except ImportError:  # pragma: no cover - optional dependency
+    Profiler = None
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_ID_HEADER = b"x-profile-id"
+RECENT_PROFILES = 20
+# Lines of cProfile stats kept per report
+CPROFILE_LINES = 60
+
+_recent = deque(maxlen=RECENT_PROFILES)
+_recent_lock = threading.Lock()
+_ids = itertools.count(1)
+_active = threading.Lock()
+
+
+def _start_profiler(async_mode: bool):
+    if Profiler is not None:
+        profiler = Profiler(
+            interval=PROFILING_INTERVAL,
+            async_mode="enabled" if async_mode else "disabled",
+        )
+        profiler.start()
+    else:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    return profiler
+
+
+def _stop_profiler(profiler) -> str:
+    if Profiler is not None:
+        profiler.stop()
+        return profiler.output_text(unicode=False, color=False)
+    profiler.disable()
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(
+        CPROFILE_LINES
+    )
+    return out.getvalue()
+
+
+class RequestProfile:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.threads: list[tuple[str, str]] = []
+
+    def add_thread(self, name: str, report: str):
+        with self._lock:
+            self.threads.append((name, report))
+
+
+_current_profile: ContextVar[Optional[RequestProfile]] = ContextVar(
+    "request_profile", default=None
+)
+
+
+def profiled(fn: Callable) -> Callable:
+    """fn, profiled in its thread if the current request is being profiled."""
+    profile = _current_profile.get()
+    if profile is None:
+        return fn
+
+    @wraps(fn)
+    def run(*args):
+        try:
+            profiler = _start_profiler(async_mode=False)
+        except ValueError:
+            # cProfile on Python 3.12+ allows one profiler per process.
+            return fn(*args)
+        try:
+            return fn(*args)
+        finally:
+            profile.add_thread(threading.current_thread().name, _stop_profiler(profiler))
+
+    return run
+
+
+def _wants_profile(scope) -> bool:
+    for name, value in scope["headers"]:
+        if name == PROFILE_HEADER:
+            return value.strip().lower() in (b"1", b"true")
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    return query.get("profile", [""])[-1].lower() in ("1", "true")
+
+
+def recent_profiles() -> list[dict]:
+    """The stored profiles without their reports, newest first."""
+    with _recent_lock:
+        entries = list(_recent)
+    return [
+        {key: value for key, value in entry.items() if key != "report"}
+        for entry in reversed(entries)
+    ]
+
+
+def get_profile(profile_id: int) -> dict | None:
+    with _recent_lock:
+        for entry in _recent:
+            if entry["id"] == profile_id:
+                return entry
+    return None
+
+
+class ProfilingMiddleware:
+    """ASGI middleware profiling requests that ask for it; see module docstring."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or not _wants_profile(scope)
+            or not _active.acquire(blocking=False)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = next(_ids)
+        profile = RequestProfile()
+        token = _current_profile.set(profile)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [
+                    (PROFILE_ID_HEADER, str(profile_id).encode())
+                ]
+            await send(message)
+
+        started_at = datetime.datetime.now(datetime.timezone.utc)
+        start = time.perf_counter()
+        profiler = _start_profiler(async_mode=True)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            report = _stop_profiler(profiler)
+            total = time.perf_counter() - start
+            _current_profile.reset(token)
+            _active.release()
+            self._store(profile_id, scope, started_at, total, report, profile)
+
+    def _store(self, profile_id, scope, started_at, total, report, profile):
+        stats = current_stats()
+        db_time = stats.db_time if stats else 0.0
+        serialization_time = stats.serialization_time if stats else 0.0
+        for name, thread_report in profile.threads:
+            report += f"\n--- thread {name} ---\n{thread_report}"
+        entry = {
+            "id": profile_id,
+            "started_at": started_at.isoformat(),
+            "method": scope["method"],
+            "path": scope["path"],
+            "query_string": scope.get("query_string", b"").decode("latin-1"),
+            "profiler": "pyinstrument" if Profiler is not None else "cProfile",
+            "total_ms": round(total * 1000, 1),
+            "db_ms": round(db_time * 1000, 1),
+            "db_queries": stats.db_queries if stats else 0,
+            "serialization_ms": round(serialization_time * 1000, 1),
+            "other_ms": round((total - db_time - serialization_time) * 1000, 1),
+            "report": report,
+        }
+        with _recent_lock:
+            _recent.append(entry)
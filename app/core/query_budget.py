@@ -0,0 +1,126 @@
+"""Statements per request: query budgets and N+1 detection.
+
+A route that loads related rows lazily runs the same statement once per row
+(N+1) and gets slower with every row. The metrics hooks in app/db/connect.py
+count each request's statements by SQL text, and SQLAlchemy renders that
+text with placeholders, so repeats of one statement shape count together.
+
+QueryBudgetMiddleware logs and counts requests that repeat a statement
+QUERY_REPEAT_THRESHOLD times or more. In tests, the query_budget fixture
+(app/conftest.py) records a block's statements with QueryRecorder and fails
+the test when the block goes over its budget.
+"""
+
+import logging
+
+from sqlalchemy import event
+
+from app.config.config import QUERY_REPEAT_THRESHOLD
+from app.core.metrics import Counter, current_stats, registry, route_label
+
+logger = logging.getLogger(__name__)
+
+MAX_LOGGED_CHARS = 500
+
+REPEATED_STATEMENTS = registry.register(
+    Counter(
+        "db_repeated_statement_requests_total",
+        "Requests that ran one statement QUERY_REPEAT_THRESHOLD times or more.",
+        ("route",),
+    )
+)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def repeated_statements(statements: dict, threshold: int) -> dict:
+    """The statements run at least threshold times, most repeated first."""
+    return dict(
+        sorted(
+            ((sql, count) for sql, count in statements.items() if count >= threshold),
+            key=lambda item: -item[1],
+        )
+    )
+
+
+def _shorten(statement: str) -> str:
+    statement = " ".join(statement.split())
+    if len(statement) <= MAX_LOGGED_CHARS:
+        return statement
+    return statement[:MAX_LOGGED_CHARS] + "..."
+
+
+class QueryRecorder:
+    """Records the statements run on the given engines, from any thread,
+    while the block runs."""
+
+    def __init__(self, engines):
+        self.engines = list(dict.fromkeys(engines))
+        self.statements: list[str] = []
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        for engine in self.engines:
+            event.listen(engine, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, *exc_info):
+        for engine in self.engines:
+            event.remove(engine, "before_cursor_execute", self._record)
+
+    def counts(self) -> dict:
+        counts = {}
+        for statement in self.statements:
+            counts[statement] = counts.get(statement, 0) + 1
+        return counts
+
+    def check(self, max_queries: int, max_repeats: int = 1):
+        """Raise QueryBudgetExceeded if more than max_queries statements ran
+        or one of them ran more than max_repeats times."""
+        problems = []
+        if len(self.statements) > max_queries:
+            problems.append(
+                f"{len(self.statements)} statements, budget is {max_queries}"
+            )
+        for statement, count in repeated_statements(
+            self.counts(), max_repeats + 1
+        ).items():
+            problems.append(f"ran {count} times: {_shorten(statement)}")
+        if problems:
+            raise QueryBudgetExceeded("\n".join(problems))
+
+
+class QueryBudgetMiddleware:
+    """ASGI middleware reporting requests that repeat a statement; it reads
+    the counts MetricsMiddleware collects, so it must run inside it."""
+
+    def __init__(self, app, threshold: int = QUERY_REPEAT_THRESHOLD):
+        self.app = app
+        self.threshold = threshold
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            stats = current_stats() if scope["type"] == "http" else None
+            if stats is not None:
+                self._report(scope, stats.statements)
+
+    def _report(self, scope, statements: dict):
+        repeated = repeated_statements(statements, self.threshold)
+        if not repeated:
+            return
+        route = route_label(scope)
+        REPEATED_STATEMENTS.inc((route,))
+        for statement, count in repeated.items():
+            logger.warning(
+                "%s %s ran a statement %s times (N+1?): %s",
+                scope["method"],
+                route,
+                count,
+                _shorten(statement),
+            )
@@ -0,0 +1,25 @@
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+from app.core.metrics import serialization_timer
+
+
+def render_json(content: Any) -> bytes:
+    """Encode content exactly like JSONResponse does, timing the work."""
+    with serialization_timer():
+        return json.dumps(
+            content,
+            ensure_ascii=False,
+            allow_nan=False,
+            indent=None,
+            separators=(",", ":"),
+        ).encode("utf-8")
+
+
+class TimedJSONResponse(JSONResponse):
+    """JSONResponse that reports its encoding time to the request metrics."""
+
+    def render(self, content: Any) -> bytes:
+        return render_json(content)
@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+
+from app.core.admission import HEAVY, LIGHT, Bulkhead, Rejected, route_class
+
+
+def test_route_class():
+    assert route_class({"path": "/jobs", "method": "GET"}) == HEAVY
+    assert route_class({"path": "/jobs", "method": "POST"}) == LIGHT
+    assert route_class({"path": "/jobs/1", "method": "GET"}) == LIGHT
+    assert route_class({"path": "/health", "method": "GET"}) is None
+
+
+def test_queue_full_and_queue_timeout_are_rejected():
+    async def scenario():
+        bulkhead = Bulkhead("test", limit=1, max_queue=1, queue_timeout=0.05)
+        await bulkhead.acquire()
+        queued = asyncio.ensure_future(bulkhead.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(Rejected) as full:
+            await bulkhead.acquire()
+        with pytest.raises(Rejected) as timeout:
+            await queued
+        return bulkhead, full.value, timeout.value
+
+    bulkhead, full, timeout = asyncio.run(scenario())
+
+    assert full.reason == "queue_full"
+    assert timeout.reason == "queue_timeout"
+    assert bulkhead.active == 1
+    assert bulkhead.queued == 0
+
+
+def test_released_slot_goes_to_the_oldest_waiter():
+    order = []
+
+    async def request(bulkhead, name):
+        await bulkhead.acquire()
+        order.append(name)
+        await asyncio.sleep(0.01)
+        bulkhead.release()
+
+    async def scenario():
+        bulkhead = Bulkhead("test", limit=1, max_queue=10, queue_timeout=1)
+        await asyncio.gather(*(request(bulkhead, name) for name in "abcd"))
+        return bulkhead
+
+    bulkhead = asyncio.run(scenario())
+
+    assert order == list("abcd")
+    assert bulkhead.active == 0
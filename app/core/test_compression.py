@@ -0,0 +1,68 @@
+import gzip
+import json
+
+from fastapi import FastAPI
+from fastapi.responses import Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.core.compression import CompressionMiddleware, choose_encoding
+
+PAYLOAD = json.dumps({"features": [{"type": "Feature", "id": i} for i in range(2000)]})
+
+app = FastAPI()
+app.add_middleware(CompressionMiddleware, minimum_size=100, offload_size=1024)
+
+
+@app.get("/large")
+async def large():
+    return Response(PAYLOAD, media_type="application/json")
+
+
+@app.get("/small")
+async def small():
+    return Response("{}", media_type="application/json")
+
+
+@app.get("/image")
+async def image():
+    return Response(b"\x89PNG" * 1000, media_type="image/png")
+
+
+@app.get("/stream")
+async def stream():
+    return StreamingResponse(
+        (PAYLOAD[i : i + 5000] for i in range(0, len(PAYLOAD), 5000)),
+        media_type="application/json",
+    )
+
+
+client = TestClient(app)
+
+
+def test_choose_encoding_honours_quality():
+    assert choose_encoding("gzip") == "gzip"
+    assert choose_encoding("gzip;q=0.5, identity") == "gzip"
+    assert choose_encoding("gzip;q=0") is None
+    assert choose_encoding("") is None
+
+
+def test_large_body_is_compressed():
+    response = client.get("/large", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "accept-encoding" in response.headers["vary"].lower()
+    assert int(response.headers["content-length"]) < len(PAYLOAD) / 5
+    assert response.text == PAYLOAD
+
+
+def test_small_and_precompressed_bodies_are_not():
+    for path in ("/small", "/image"):
+        response = client.get(path, headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in response.headers
+
+
+def test_streaming_response_is_compressed_incrementally():
+    with client.stream("GET", "/stream", headers={"Accept-Encoding": "gzip"}) as response:
+        assert response.headers["content-encoding"] == "gzip"
+        assert "content-length" not in response.headers
+        raw = b"".join(response.iter_raw())
+    assert gzip.decompress(raw).decode() == PAYLOAD
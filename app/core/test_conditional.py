@@ -0,0 +1,18 @@
+from app.core.conditional import _matches, make_etag
+
+
+def test_etag_changes_with_version_and_query():
+    etag = make_etag(1, "/aoi", b"id=1")
+    assert etag.startswith('W/"')
+    assert etag == make_etag(1, "/aoi", b"id=1")
+    assert etag != make_etag(2, "/aoi", b"id=1")
+    assert etag != make_etag(1, "/aoi", b"id=2")
+
+
+def test_if_none_match_accepts_lists_and_strong_form():
+    etag = make_etag(1, "/aoi", b"")
+    assert _matches(etag, etag)
+    assert _matches(f'"other", {etag}', etag)
+    assert _matches(etag[2:], etag)
+    assert _matches("*", etag)
+    assert not _matches('W/"other"', etag)
@@ -0,0 +1,28 @@
+from app.core.metrics import Counter, Histogram, MetricsRegistry
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry()
+    histogram = registry.register(
+        Histogram("latency_seconds", "Latency.", ("route",), buckets=(0.1, 1.0))
+    )
+    histogram.observe(("/aoi",), 0.05)
+    histogram.observe(("/aoi",), 0.5)
+    histogram.observe(("/aoi",), 5)
+
+    text = registry.render()
+
+    assert "# TYPE latency_seconds histogram" in text
+    assert 'latency_seconds_bucket{route="/aoi",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{route="/aoi",le="1"} 2' in text
+    assert 'latency_seconds_bucket{route="/aoi",le="+Inf"} 3' in text
+    assert 'latency_seconds_count{route="/aoi"} 3' in text
+    assert 'latency_seconds_sum{route="/aoi"} 5.55' in text
+
+
+def test_counter_escapes_label_values():
+    registry = MetricsRegistry()
+    counter = registry.register(Counter("requests_total", "Requests.", ("route",)))
+    counter.inc(('/a"b',), 2)
+
+    assert 'requests_total{route="/a\\"b"} 2' in registry.render()
@@ -0,0 +1,44 @@
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.core.metrics import MetricsMiddleware
+from app.core.profiling import ProfilingMiddleware, get_profile
+from app.db.deadline import run_cancellable
+
+app = FastAPI()
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(MetricsMiddleware)
+
+
+def count_squares() -> int:
+    return sum(i * i for i in range(10_000))
+
+
+@app.get("/work")
+async def work(request: Request):
+    return {"total": await run_cancellable(request, count_squares)}
+
+
+client = TestClient(app)
+
+
+def test_unflagged_request_is_not_profiled():
+    response = client.get("/work")
+    assert response.status_code == 200
+    assert "x-profile-id" not in response.headers
+
+
+def test_flagged_request_stores_a_profile():
+    response = client.get("/work", headers={"X-Profile": "1"})
+    assert response.json() == {"total": sum(i * i for i in range(10_000))}
+
+    profile = get_profile(int(response.headers["x-profile-id"]))
+    assert profile["path"] == "/work"
+    assert profile["db_queries"] == 0
+    assert profile["total_ms"] >= profile["other_ms"]
+    assert profile["report"]
+
+
+def test_query_flag_enables_profiling():
+    response = client.get("/work?profile=1")
+    assert "x-profile-id" in response.headers
@@ -0,0 +1,57 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from app.core import query_budget
+from app.core.metrics import MetricsMiddleware, record_db_query
+from app.core.query_budget import (
+    QueryBudgetExceeded,
+    QueryBudgetMiddleware,
+    QueryRecorder,
+    repeated_statements,
+)
+
+
+def run_queries(engine, ids):
+    with engine.connect() as conn:
+        for row_id in ids:
+            conn.execute(text("SELECT :id"), {"id": row_id})
+
+
+def test_repeated_statements_counts_shapes():
+    statements = {"SELECT a": 3, "SELECT b": 1, "SELECT c": 5}
+    assert repeated_statements(statements, 3) == {"SELECT c": 5, "SELECT a": 3}
+
+
+def test_recorder_within_budget():
+    engine = create_engine("sqlite://")
+    with QueryRecorder([engine]) as recorder:
+        run_queries(engine, [1])
+    recorder.check(max_queries=1)
+
+
+def test_recorder_fails_on_repeated_statement():
+    engine = create_engine("sqlite://")
+    with QueryRecorder([engine]) as recorder:
+        run_queries(engine, [1, 2, 3])
+    recorder.check(max_queries=5, max_repeats=3)
+    with pytest.raises(QueryBudgetExceeded, match="ran 3 times"):
+        recorder.check(max_queries=5)
+    with pytest.raises(QueryBudgetExceeded, match="3 statements, budget is 2"):
+        recorder.check(max_queries=2, max_repeats=3)
+
+
+def test_middleware_counts_requests_with_repeats():
+    app = FastAPI()
+    app.add_middleware(QueryBudgetMiddleware, threshold=3)
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/lazy")
+    async def lazy():
+        for _ in range(3):
+            record_db_query(0.001, 1, "SELECT * FROM bands WHERE satellite_id = %(id)s")
+        return {}
+
+    TestClient(app).get("/lazy")
+    assert query_budget.REPEATED_STATEMENTS._values[("/lazy",)] == 1
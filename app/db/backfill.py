@@ -0,0 +1,36 @@
+"""Background backfills of data derived by triggers, for rows written
+before the triggers existed."""
+
+import logging
+import threading
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+
+class Backfill(threading.Thread):
+    """Calls `step` until it reports no work left (0), then exits.
+
+    Every step commits its own batch, so stopping midway loses nothing.
+    """
+
+    def __init__(self, name: str, step: Callable[[], int]):
+        super().__init__(name=f"{name}-backfill", daemon=True)
+        self.step = step
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        done = 0
+        try:
+            while not self._stop_event.is_set():
+                count = self.step()
+                if not count:
+                    break
+                done += count
+        except Exception:
+            logger.exception("Backfill %s failed", self.name)
+        if done:
+            logger.info("Backfill %s: %s rows done", self.name, done)
@@ -1,11 +1,186 @@
-from sqlalchemy import create_engine
+import random
+import time
+
+from sqlalchemy import Delete, Insert, Update, create_engine, event
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.orm import Session as OrmSession
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool, QueuePool
+
+from app.config.config import (
+    DATABASE_URL,
+    DB_MAX_OVERFLOW,
+    DB_PGBOUNCER,
+    DB_POOL_PRE_PING,
+    DB_POOL_RECYCLE,
+    DB_POOL_SIZE,
+    DB_POOL_TIMEOUT,
+    DB_REPLICA_URLS,
+    SLOW_QUERY_LOG_ENABLED,
+)
+from app.core.metrics import (
+    LATENCY_BUCKETS,
+    CallbackGauge,
+    Counter,
+    Histogram,
+    record_db_query,
+    registry,
+)
+from app.db import deadline, slow_query
+
+POOL_WAIT = registry.register(
+    Histogram(
+        "db_pool_checkout_wait_seconds",
+        "Time spent waiting for a pooled connection.",
+        ("pool",),
+        buckets=(0.0001, 0.001,) + LATENCY_BUCKETS,
+    )
+)
+POOL_TIMEOUTS = registry.register(
+    Counter(
+        "db_pool_checkout_timeouts_total",
+        "Checkouts that gave up after DB_POOL_TIMEOUT.",
+        ("pool",),
+    )
+)
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long checkouts wait for a connection."""
+
+    name = "primary"
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            POOL_TIMEOUTS.inc((self.name,))
+            raise
+        finally:
+            POOL_WAIT.observe((self.name,), time.perf_counter() - start)
+
+
+def _create_engine(url, name: str):
+    if DB_PGBOUNCER:
+        # PgBouncer does the pooling; a second pool in front of it only
+        # pins server connections.
+        new_engine = create_engine(url, poolclass=NullPool)
+    else:
+        new_engine = create_engine(
+            url,
+            poolclass=InstrumentedQueuePool,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_pre_ping=DB_POOL_PRE_PING,
+        )
+        new_engine.pool.name = name
+    _instrument(new_engine)
+    return new_engine
+
+
+def _instrument(target_engine):
+    @event.listens_for(target_engine, "before_cursor_execute")
+    def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(target_engine, "after_cursor_execute")
+    def _record_query(conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - conn.info["query_start_time"].pop()
+        # psycopg2 buffers SELECT results client side, so rowcount is the number
+        # of rows fetched; for DML it is the number of affected rows instead.
+        rows = cursor.rowcount if cursor.description is not None else None
+        record_db_query(duration, rows, statement)
+
+    @event.listens_for(target_engine, "handle_error")
+    def _discard_query_timer(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_start_time"):
+            conn.info["query_start_time"].pop()
+
+    deadline.install(target_engine)
+
+    if SLOW_QUERY_LOG_ENABLED:
+        slow_query.install(target_engine)
+
 
-from app.config.config import DATABASE_URL
+engine = _create_engine(DATABASE_URL, "primary")
+replica_engines = [
+    _create_engine(url, f"replica-{i}") for i, url in enumerate(DB_REPLICA_URLS)
+]
+# Each worker process sticks to one replica. The data version behind the
+# ETags and the data itself are then read from the same node, so a lagging
+# replica can never pair an older response with a newer version.
+replica_engine = random.choice(replica_engines) if replica_engines else engine
 
-engine = create_engine(DATABASE_URL)
-Session = sessionmaker(bind=engine)
+
+class RoutingSession(OrmSession):
+    """Sends read-only sessions to the replica and everything else to the primary."""
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if (
+            self.info.get("read_only")
+            and not self._flushing
+            and not isinstance(clause, (Insert, Update, Delete))
+        ):
+            return replica_engine
+        return engine
+
+
+Session = sessionmaker(bind=engine, class_=RoutingSession)
+ReadSession = sessionmaker(
+    bind=engine, class_=RoutingSession, info={"read_only": True}
+)
+
+
+def warm_pool():
+    """Open the pool_size connections of every pool now instead of on the
+    first requests; behind PgBouncer, check that one connection works."""
+    for target_engine in [engine] + replica_engines:
+        pool = target_engine.pool
+        size = pool.size() if isinstance(pool, QueuePool) else 1
+        connections = []
+        try:
+            # Held together, so the pool has to open size distinct ones.
+            for _ in range(size):
+                connection = target_engine.connect()
+                connections.append(connection)
+                connection.exec_driver_sql("SELECT 1")
+        finally:
+            for connection in connections:
+                connection.close()
+
+
+def pool_stats() -> dict:
+    stats = {}
+    for target_engine in [engine] + replica_engines:
+        pool = target_engine.pool
+        if not isinstance(pool, QueuePool):
+            continue
+        stats[pool.name] = {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "idle": pool.checkedin(),
+        }
+    return stats
+
+
+registry.register(
+    CallbackGauge(
+        "db_pool_connections",
+        "Pooled connections by state.",
+        ("pool", "state"),
+        lambda: {
+            (name, state): value
+            for name, values in pool_stats().items()
+            for state, value in values.items()
+        },
+    )
+)
 
 
 class DatabaseError(Exception):
@@ -34,3 +209,11 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def get_read_db():
+    db = ReadSession()
+    try:
+        yield db
+    finally:
+        db.close()
@@ -0,0 +1,154 @@
+"""Per-route query budgets and cancellation of abandoned queries.
+
+`start_deadline` sets a transaction-local statement_timeout on a session and
+registers its connection with the canceller of the current request, if
+any. `run_cancellable` runs blocking route work in the threadpool and, when
+the client disconnects first, cancels the running statement on the server
+through the driver (psycopg2 `connection.cancel()`, the same as
+pg_cancel_backend) instead of letting it finish for nobody.
+"""
+
+import asyncio
+import threading
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+from fastapi import HTTPException, Request
+from psycopg2.errors import QueryCanceled
+from sqlalchemy import event, text
+from sqlalchemy.exc import OperationalError
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse
+
+from app.config.config import QUERY_BUDGETS
+from app.core.metrics import Counter, registry
+from app.core.profiling import profiled
+
+DISCONNECT_POLL_SECONDS = 0.5
+CLIENT_CLOSED_REQUEST = 499
+_CANCELLER_KEY = "query_canceller"
+
+CANCELLED_QUERIES = registry.register(
+    Counter(
+        "db_queries_cancelled_total",
+        "Requests whose running statements were cancelled after every client left.",
+    )
+)
+
+
+class ClientDisconnected(Exception):
+    pass
+
+
+class QueryCanceller:
+    """Cancels the statements running on the connections registered with it.
+
+    Connections are released when they go back to the pool, so a late
+    cancel can never hit a statement of another request.
+    """
+
+    def __init__(self):
+        self.cancelled = False
+        self._connections = set()
+        self._lock = threading.Lock()
+
+    def register(self, dbapi_connection):
+        with self._lock:
+            if self.cancelled:
+                raise ClientDisconnected()
+            self._connections.add(dbapi_connection)
+
+    def release(self, dbapi_connection):
+        with self._lock:
+            self._connections.discard(dbapi_connection)
+
+    def cancel(self):
+        with self._lock:
+            if self.cancelled:
+                return
+            self.cancelled = True
+            CANCELLED_QUERIES.inc()
+            for dbapi_connection in self._connections:
+                dbapi_connection.cancel()
+
+
+_current_canceller: ContextVar[Optional[QueryCanceller]] = ContextVar(
+    "query_canceller", default=None
+)
+
+
+def budget_for(route: str) -> float:
+    return QUERY_BUDGETS.get(route, QUERY_BUDGETS["default"])
+
+
+def start_deadline(session, route: str):
+    """Bound every statement of the session's transaction by the route budget."""
+    session.execute(
+        text("SELECT set_config('statement_timeout', :timeout, true)"),
+        {"timeout": str(int(budget_for(route) * 1000))},
+    )
+    canceller = _current_canceller.get()
+    if canceller is not None:
+        pooled = session.connection().connection
+        canceller.register(pooled.dbapi_connection)
+        pooled.info[_CANCELLER_KEY] = canceller
+
+
+def install(engine):
+    @event.listens_for(engine, "checkin")
+    def _release(dbapi_connection, connection_record):
+        canceller = connection_record.info.pop(_CANCELLER_KEY, None)
+        if canceller is not None:
+            canceller.release(dbapi_connection)
+
+
+def start_cancellable(fn: Callable, *args) -> tuple[asyncio.Future, QueryCanceller]:
+    """Run fn in the threadpool with a canceller its sessions register with."""
+    canceller = QueryCanceller()
+    token = _current_canceller.set(canceller)
+    try:
+        # The task copies the current context, canceller included.
+        task = asyncio.ensure_future(run_in_threadpool(profiled(fn), *args))
+    finally:
+        _current_canceller.reset(token)
+    return task, canceller
+
+
+async def wait_for_client(request: Request, future: asyncio.Future):
+    """Await future, raising ClientDisconnected if the client goes away first.
+
+    The future itself is never cancelled here; that is up to the caller.
+    """
+    while True:
+        done, _ = await asyncio.wait({future}, timeout=DISCONNECT_POLL_SECONDS)
+        if done:
+            return future.result()
+        if await request.is_disconnected():
+            raise ClientDisconnected()
+
+
+def client_closed_request() -> HTTPException:
+    return HTTPException(
+        status_code=CLIENT_CLOSED_REQUEST, detail="Client closed request"
+    )
+
+
+async def run_cancellable(request: Request, fn: Callable, *args):
+    task, canceller = start_cancellable(fn, *args)
+    try:
+        return await wait_for_client(request, task)
+    except ClientDisconnected:
+        canceller.cancel()
+        # Let the worker thread unwind and return its connection.
+        await asyncio.wait({task})
+        if not task.cancelled():
+            task.exception()
+        raise client_closed_request()
+
+
+async def query_timeout_handler(request: Request, exc: OperationalError):
+    if isinstance(exc.orig, QueryCanceled):
+        return JSONResponse(
+            status_code=504, content={"detail": "Query exceeded its time budget"}
+        )
+    raise exc
@@ -4,16 +4,21 @@ import enum
 from geoalchemy2 import Geometry
 from geoalchemy2.elements import WKBElement
 from sqlalchemy import (
+    BigInteger,
     Boolean,
     Column,
+    Date,
     DateTime,
     Enum,
     Float,
     ForeignKey,
     Integer,
+    PrimaryKeyConstraint,
     String,
     UniqueConstraint,
+    text,
 )
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.orm import declarative_base, relationship  # type: ignore
 
 from app.types.helpers import IMAGE_DTYPES
@@ -35,6 +40,17 @@ class ModelType(enum.Enum):
     CLASSIFICATION = "CLASSIFICATION"
 
 
+class PurgeTarget(enum.Enum):
+    JOB = "JOB"
+    AOI = "AOI"
+
+
+class PurgeStatus(enum.Enum):
+    PENDING = "PENDING"
+    COMPLETED = "COMPLETED"
+    FAILED = "FAILED"
+
+
 class Satellite(Base):
     __tablename__ = "satellites"
 
@@ -277,6 +293,14 @@ class PredictionRaster(Base):
     image_width = Column(Integer, nullable=False)
     image_height = Column(Integer, nullable=False)
     bbox = Column(Geometry(geometry_type="POLYGON", srid=4326), nullable=False)
+    # Kept up to date by the triggers in db/raster_stats.py
+    pixel_histogram = Column(
+        ARRAY(BigInteger), server_default=text("array_fill(0::bigint, ARRAY[256])")
+    )
+    decile_bboxes = Column(
+        ARRAY(Float),
+        server_default=text("array_fill(NULL::double precision, ARRAY[40])"),
+    )
 
     image_id = Column(Integer, ForeignKey("images.id"), nullable=False, unique=True)
     prediction_vectors = relationship(
@@ -321,6 +345,65 @@ class PredictionVector(Base):
         self.prediction_raster_id = prediction_raster_id
 
 
+class PredictionFact(Base):
+    """A prediction vector inside its job's AOI, denormalized for reads by
+    AOI, model and day. Written by the triggers in db/prediction_facts.py.
+
+    The primary key starts with the columns reads filter on and ends with
+    the columns the joined queries grouped by to drop duplicate points, so
+    duplicates are dropped at write time instead.
+    """
+
+    __tablename__ = "prediction_facts"
+    __table_args__ = (
+        PrimaryKeyConstraint(
+            "aoi_id", "model_id", "day", "image_id", "pixel_value", "geometry"
+        ),
+        {"postgresql_partition_by": "RANGE (day)"},
+    )
+
+    aoi_id = Column(Integer, nullable=False)
+    model_id = Column(Integer, nullable=False)
+    day = Column(Date, nullable=False)
+    image_id = Column(Integer, nullable=False)
+    pixel_value = Column(Integer, nullable=False)
+    geometry = Column(
+        Geometry(geometry_type="POINT", srid=4326, spatial_index=False),
+        nullable=False,
+    )
+    image_timestamp = Column(DateTime, nullable=False)
+    job_id = Column(Integer, nullable=False)
+
+
+class PredictionFactBackfill(Base):
+    """Progress of loading the rasters written before the prediction_facts
+    triggers existed."""
+
+    __tablename__ = "prediction_fact_backfill"
+
+    id = Column(Integer, primary_key=True)
+    next_raster_id = Column(Integer, nullable=False)
+    last_raster_id = Column(Integer, nullable=False)
+
+
+class PredictionArchive(Base):
+    """Predictions of an AOI and month moved to a Parquet file in object
+    storage, see services/prediction_archive.py."""
+
+    __tablename__ = "prediction_archives"
+
+    id = Column(Integer, primary_key=True)
+    aoi_id = Column(Integer, ForeignKey("aois.id"), nullable=False, index=True)
+    month = Column(Date, nullable=False)
+    storage_key = Column(CONSTRAINT_STR, nullable=False, unique=True)
+    image_ids = Column(ARRAY(Integer), nullable=False)
+    row_count = Column(BigInteger, nullable=False)
+    size_bytes = Column(BigInteger, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.datetime.now)
+    # Set once the archived rows are deleted from the tables.
+    purged_at = Column(DateTime)
+
+
 class SceneClassificationVector(Base):
     __tablename__ = "scene_classification_vectors"
 
@@ -333,3 +416,50 @@ class SceneClassificationVector(Base):
         self.pixel_value = pixel_value
         self.geometry = geometry
         self.image_id = image_id
+
+
+class DataChange(Base):
+    """One row per write statement on the served tables, see db/versioning.py."""
+
+    __tablename__ = "data_changes"
+
+    id = Column(BigInteger, primary_key=True)
+    weight = Column(BigInteger, nullable=False, default=1, server_default="1")
+
+
+class TileArchive(Base):
+    """A PMTiles archive of a completed job, see services/tile_archive.py."""
+
+    __tablename__ = "tile_archives"
+
+    job_id = Column(Integer, ForeignKey("jobs.id"), primary_key=True)
+    storage_key = Column(CONSTRAINT_STR, nullable=False)
+    include_scl = Column(Boolean, nullable=False, default=False)
+    tile_count = Column(Integer, nullable=False)
+    size_bytes = Column(BigInteger, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.datetime.now)
+
+
+class Purge(Base):
+    """Removal of a soft-deleted job or AOI and everything below it, see
+    services/purge.py."""
+
+    __tablename__ = "purges"
+
+    id = Column(Integer, primary_key=True)
+    target = Column(Enum(PurgeTarget, name="purge_target"), nullable=False)
+    # Not a foreign key: the target row is the last one the purge deletes.
+    target_id = Column(Integer, nullable=False)
+    status = Column(
+        Enum(PurgeStatus, name="purge_status"),
+        nullable=False,
+        default=PurgeStatus.PENDING,
+    )
+    rows_deleted = Column(BigInteger, nullable=False, default=0)
+    created_at = Column(DateTime, nullable=False, default=datetime.datetime.now)
+    finished_at = Column(DateTime)
+    # Last failure, the number of failed batches in a row, and when the
+    # next batch may run; FAILED after PURGE_MAX_FAILURES.
+    error = Column(String)
+    failures = Column(Integer, nullable=False, default=0)
+    retry_at = Column(DateTime)
@@ -0,0 +1,158 @@
+"""Triggers that NOTIFY the id of every AOI whose served data changed, and
+the job id of every tile archive that was built, rebuilt or deleted.
+
+Notifications are delivered when the writing transaction commits and
+identical payloads within one transaction are sent once, so a job writing
+millions of prediction vectors produces a single message per AOI.
+"""
+
+from sqlalchemy import text
+
+from app.db.versioning import SKIP_SILENT_DELETES
+
+AOI_CHANGED_CHANNEL = "aoi_changed"
+TILE_ARCHIVE_CHANGED_CHANNEL = "tile_archive_changed"
+
+_FUNCTIONS_DDL = [
+    f"""
+    CREATE OR REPLACE FUNCTION notify_aoi_row_change() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            PERFORM pg_notify('{AOI_CHANGED_CHANNEL}', OLD.id::text);
+        ELSE
+            PERFORM pg_notify('{AOI_CHANGED_CHANNEL}', NEW.id::text);
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    f"""
+    CREATE OR REPLACE FUNCTION notify_job_row_change() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            PERFORM pg_notify('{AOI_CHANGED_CHANNEL}', OLD.aoi_id::text);
+        ELSE
+            PERFORM pg_notify('{AOI_CHANGED_CHANNEL}', NEW.aoi_id::text);
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    f"""
+    CREATE OR REPLACE FUNCTION notify_tile_archive_change() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            PERFORM pg_notify('{TILE_ARCHIVE_CHANGED_CHANNEL}', OLD.job_id::text);
+        ELSE
+            PERFORM pg_notify('{TILE_ARCHIVE_CHANGED_CHANNEL}', NEW.job_id::text);
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    f"""
+    CREATE OR REPLACE FUNCTION notify_image_changes() RETURNS trigger AS $$
+    BEGIN
+        {SKIP_SILENT_DELETES}
+        PERFORM pg_notify('{AOI_CHANGED_CHANNEL}', aoi_id::text)
+        FROM (
+            SELECT DISTINCT jobs.aoi_id
+            FROM changed_rows
+            JOIN jobs ON jobs.id = changed_rows.job_id
+        ) changed_aois;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    f"""
+    CREATE OR REPLACE FUNCTION notify_prediction_raster_changes() RETURNS trigger AS $$
+    BEGIN
+        {SKIP_SILENT_DELETES}
+        PERFORM pg_notify('{AOI_CHANGED_CHANNEL}', aoi_id::text)
+        FROM (
+            SELECT DISTINCT jobs.aoi_id
+            FROM changed_rows
+            JOIN images ON images.id = changed_rows.image_id
+            JOIN jobs ON jobs.id = images.job_id
+        ) changed_aois;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    f"""
+    CREATE OR REPLACE FUNCTION notify_prediction_vector_changes() RETURNS trigger AS $$
+    BEGIN
+        {SKIP_SILENT_DELETES}
+        PERFORM pg_notify('{AOI_CHANGED_CHANNEL}', aoi_id::text)
+        FROM (
+            SELECT DISTINCT jobs.aoi_id
+            FROM (SELECT DISTINCT prediction_raster_id FROM changed_rows) rasters
+            JOIN prediction_rasters ON prediction_rasters.id = rasters.prediction_raster_id
+            JOIN images ON images.id = prediction_rasters.image_id
+            JOIN jobs ON jobs.id = images.job_id
+        ) changed_aois;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+]
+
+_TRIGGERS_DDL = [
+    """
+    CREATE OR REPLACE TRIGGER aois_notify_change
+        AFTER INSERT OR UPDATE OR DELETE ON aois
+        FOR EACH ROW EXECUTE FUNCTION notify_aoi_row_change()
+    """,
+    """
+    CREATE OR REPLACE TRIGGER jobs_notify_status_change
+        AFTER UPDATE OF status, is_deleted ON jobs
+        FOR EACH ROW
+        WHEN (
+            OLD.status IS DISTINCT FROM NEW.status
+            OR OLD.is_deleted IS DISTINCT FROM NEW.is_deleted
+        )
+        EXECUTE FUNCTION notify_job_row_change()
+    """,
+    """
+    CREATE OR REPLACE TRIGGER jobs_notify_delete
+        AFTER DELETE ON jobs
+        FOR EACH ROW EXECUTE FUNCTION notify_job_row_change()
+    """,
+    """
+    CREATE OR REPLACE TRIGGER tile_archives_notify_change
+        AFTER INSERT OR UPDATE OR DELETE ON tile_archives
+        FOR EACH ROW EXECUTE FUNCTION notify_tile_archive_change()
+    """,
+]
+
+# Statement-level triggers with transition tables; PostgreSQL allows only
+# one event per trigger when transition tables are used.
+_STATEMENT_TRIGGERS = {
+    "images": "notify_image_changes",
+    "prediction_rasters": "notify_prediction_raster_changes",
+    "prediction_vectors": "notify_prediction_vector_changes",
+}
+_STATEMENT_TRIGGER_DDL = """
+    CREATE OR REPLACE TRIGGER {table}_notify_{event}
+        AFTER {event} ON {table}
+        REFERENCING {transition} TABLE AS changed_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION {function}()
+"""
+
+
+def install_notify_triggers(engine):
+    with engine.begin() as conn:
+        for statement in _FUNCTIONS_DDL + _TRIGGERS_DDL:
+            conn.execute(text(statement))
+        for table, function in _STATEMENT_TRIGGERS.items():
+            for event, transition in (("insert", "NEW"), ("delete", "OLD")):
+                conn.execute(
+                    text(
+                        _STATEMENT_TRIGGER_DDL.format(
+                            table=table,
+                            event=event,
+                            transition=transition,
+                            function=function,
+                        )
+                    )
+                )
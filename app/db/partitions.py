@@ -0,0 +1,87 @@
+"""Monthly partitions of prediction_facts and BRIN indexes on time-ordered data.
+
+The insert trigger creates a missing partition on demand, but that takes an
+exclusive lock on prediction_facts inside an ingest transaction. The
+maintenance task creates the partitions of the coming months ahead of
+time instead. Old facts leave the table with their prediction vectors,
+through the prediction archive (services/prediction_archive.py).
+
+Rows of images and scene_classification_vectors are written in roughly
+time (and image) order, so BRIN indexes cover their range filters at a
+fraction of a B-tree's size.
+"""
+
+import datetime
+import logging
+import threading
+
+from sqlalchemy import text
+
+from app.config.config import PARTITION_MAINTENANCE_SECONDS, PARTITION_PREMAKE_MONTHS
+from app.db.connect import Session
+
+logger = logging.getLogger(__name__)
+
+PARTITION_PREFIX = "prediction_facts_"
+
+_BRIN_DDL = [
+    "CREATE INDEX IF NOT EXISTS images_timestamp_brin "
+    "ON images USING brin (timestamp)",
+    "CREATE INDEX IF NOT EXISTS scene_classification_vectors_image_id_brin "
+    "ON scene_classification_vectors USING brin (image_id)",
+    "CREATE INDEX IF NOT EXISTS prediction_facts_image_timestamp_brin "
+    "ON prediction_facts USING brin (image_timestamp)",
+]
+
+def month_start(day: datetime.date) -> datetime.date:
+    return day.replace(day=1)
+
+
+def add_months(month: datetime.date, count: int) -> datetime.date:
+    index = month.year * 12 + month.month - 1 + count
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: datetime.date) -> str:
+    return f"{PARTITION_PREFIX}{month:%Y%m}"
+
+
+def install_partitioning(engine):
+    # Indexes on the partitioned parent are created on every partition.
+    with engine.begin() as conn:
+        for statement in _BRIN_DDL:
+            conn.execute(text(statement))
+
+
+def create_partitions(months_ahead: int = PARTITION_PREMAKE_MONTHS) -> list:
+    """Make sure the current and the next months_ahead months have a partition."""
+    first = month_start(datetime.date.today())
+    months = [add_months(first, i) for i in range(months_ahead + 1)]
+    session = Session()
+    try:
+        for month in months:
+            session.execute(
+                text("SELECT create_prediction_facts_partition(:month)"),
+                {"month": month},
+            )
+        session.commit()
+    finally:
+        session.close()
+    return months
+
+
+class PartitionMaintenance(threading.Thread):
+    def __init__(self):
+        super().__init__(name="partition-maintenance", daemon=True)
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                create_partitions()
+            except Exception:
+                logger.exception("Creating prediction_facts partitions failed")
+            self._stop_event.wait(PARTITION_MAINTENANCE_SECONDS)
@@ -0,0 +1,173 @@
+"""prediction_facts: prediction vectors flattened for reads by AOI, model and day.
+
+A statement-level trigger on prediction_vectors copies every new vector
+that lies inside its job's AOI into prediction_facts, together with the
+AOI, model, job, image and image timestamp. Reads then scan one primary
+key range (aoi_id, model_id, day) without joins or point-in-polygon tests.
+
+The table is range-partitioned on `day`, one partition per month, created
+on demand as facts for a new month arrive. Vector deletes do not touch it:
+facts of a soft-deleted job are hidden by live_facts() until the purge
+worker (services/purge.py) removes them with the rest of the job.
+
+Rasters written before the trigger existed are loaded by
+backfill_prediction_facts; until that is done, reads keep using the joined
+tables (facts_ready).
+"""
+
+from sqlalchemy import select, text
+
+from app.db.connect import Session
+from app.db.models import Job, PredictionFact, PredictionFactBackfill
+
+BACKFILL_BATCH = 50
+
+# Vectors in {source} inside their AOI; duplicates hit the primary key.
+_INSERT_FACTS = """
+    INSERT INTO prediction_facts (
+        aoi_id, model_id, day, image_id, pixel_value, geometry, image_timestamp, job_id
+    )
+    SELECT
+        jobs.aoi_id,
+        jobs.model_id,
+        images.timestamp::date,
+        images.id,
+        vectors.pixel_value,
+        vectors.geometry,
+        images.timestamp,
+        jobs.id
+    FROM {source} AS vectors
+    JOIN prediction_rasters ON prediction_rasters.id = vectors.prediction_raster_id
+    JOIN images ON images.id = prediction_rasters.image_id
+    JOIN jobs ON jobs.id = images.job_id
+    JOIN aois ON aois.id = jobs.aoi_id
+    WHERE ST_Intersects(vectors.geometry, aois.geometry)
+    ON CONFLICT DO NOTHING;
+"""
+
+_CREATE_PARTITIONS = """
+    PERFORM create_prediction_facts_partition(months.month)
+    FROM (
+        SELECT DISTINCT date_trunc('month', images.timestamp)::date AS month
+        FROM (SELECT DISTINCT prediction_raster_id FROM {source} AS vectors) rasters
+        JOIN prediction_rasters ON prediction_rasters.id = rasters.prediction_raster_id
+        JOIN images ON images.id = prediction_rasters.image_id
+    ) months;
+"""
+
+_BACKFILL_SOURCE = """(
+        SELECT * FROM prediction_vectors
+        WHERE prediction_raster_id BETWEEN first_id AND last_id
+    )"""
+
+_DDL = [
+    """
+    CREATE OR REPLACE FUNCTION create_prediction_facts_partition(partition_month date)
+    RETURNS void AS $$
+    DECLARE
+        partition_name text := 'prediction_facts_' || to_char(partition_month, 'YYYYMM');
+    BEGIN
+        IF to_regclass(partition_name) IS NULL THEN
+            -- Concurrent ingests of the same new month create it once.
+            PERFORM pg_advisory_xact_lock(hashtext('prediction_facts_partitions'));
+            EXECUTE format(
+                'CREATE TABLE IF NOT EXISTS %I PARTITION OF prediction_facts '
+                'FOR VALUES FROM (%L) TO (%L)',
+                partition_name,
+                partition_month,
+                (partition_month + interval '1 month')::date
+            );
+        END IF;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    f"""
+    CREATE OR REPLACE FUNCTION insert_prediction_facts() RETURNS trigger AS $$
+    BEGIN
+        {_CREATE_PARTITIONS.format(source="new_rows")}
+        {_INSERT_FACTS.format(source="new_rows")}
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE TRIGGER prediction_vectors_facts_insert
+        AFTER INSERT ON prediction_vectors
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION insert_prediction_facts()
+    """,
+    f"""
+    CREATE OR REPLACE FUNCTION backfill_prediction_facts(batch_size integer)
+    RETURNS integer AS $$
+    DECLARE
+        first_id integer;
+        last_id integer;
+    BEGIN
+        SELECT next_raster_id, least(next_raster_id + batch_size - 1, last_raster_id)
+        INTO first_id, last_id
+        FROM prediction_fact_backfill
+        WHERE id = 1
+        FOR UPDATE SKIP LOCKED;
+        IF first_id IS NULL OR first_id > last_id THEN
+            RETURN 0;
+        END IF;
+        {_CREATE_PARTITIONS.format(source=_BACKFILL_SOURCE)}
+        {_INSERT_FACTS.format(source=_BACKFILL_SOURCE)}
+        UPDATE prediction_fact_backfill SET next_raster_id = last_id + 1 WHERE id = 1;
+        RETURN last_id - first_id + 1;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    # Rasters that exist now may have vectors the trigger never saw.
+    """
+    INSERT INTO prediction_fact_backfill (id, next_raster_id, last_raster_id)
+    SELECT 1, 1, coalesce(max(id), 0) FROM prediction_rasters
+    ON CONFLICT (id) DO NOTHING
+    """,
+]
+
+_facts_ready = False
+
+
+def install_prediction_facts_triggers(engine):
+    with engine.begin() as conn:
+        for statement in _DDL:
+            conn.execute(text(statement))
+
+
+def backfill_prediction_facts(batch_size: int = BACKFILL_BATCH) -> int:
+    """Load the facts of the next batch_size rasters; returns how many
+    rasters were covered, 0 once the backfill is done."""
+    session = Session()
+    try:
+        count = session.execute(
+            text("SELECT backfill_prediction_facts(:batch_size)"),
+            {"batch_size": batch_size},
+        ).scalar_one()
+        session.commit()
+        return count
+    finally:
+        session.close()
+
+
+def facts_ready(session) -> bool:
+    """Whether prediction_facts holds every prediction; stays True once it does."""
+    global _facts_ready
+    if not _facts_ready:
+        _facts_ready = (
+            session.query(PredictionFactBackfill.id)
+            .filter(
+                PredictionFactBackfill.next_raster_id
+                <= PredictionFactBackfill.last_raster_id
+            )
+            .first()
+            is None
+        )
+    return _facts_ready
+
+
+def live_facts():
+    """SQL condition hiding the facts of soft-deleted jobs until they are purged."""
+    return PredictionFact.job_id.notin_(
+        select(Job.id).where(Job.is_deleted == True)  # noqa <E712>
+    )
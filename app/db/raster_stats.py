@@ -0,0 +1,245 @@
+"""Pixel-value histograms and decile bboxes of every prediction raster.
+
+prediction_rasters.pixel_histogram counts the raster's prediction vectors
+per pixel value (256 buckets). decile_bboxes holds, for each decile k, the
+bbox (xmin, ymin, xmax, ymax) of the vectors with a pixel value of at least
+DECILE_THRESHOLDS[k], flattened to 40 values; NULLs for an empty decile.
+
+Statement-level triggers on prediction_vectors keep both up to date as
+vectors are written, so threshold queries read two arrays instead of
+scanning vectors. Deletes subtract from the histogram but leave the bboxes
+as they were: a bbox that is too large only makes the pre-filter less
+selective, never wrong. A NULL histogram means "not computed yet" (rasters
+written before the triggers existed) and is filled by backfill_raster_stats.
+"""
+
+import math
+
+from sqlalchemy import and_, case, exists, func, or_, text
+
+from app.db.connect import Session
+from app.db.models import PredictionRaster, PredictionVector
+from app.db.versioning import SKIP_SILENT_DELETES
+
+HISTOGRAM_BUCKETS = 256
+DECILE_THRESHOLDS = [math.ceil(255 * k / 10) for k in range(10)]
+BACKFILL_BATCH = 100
+
+_DECILE_EXTENTS = ",\n            ".join(
+    f"{aggregate}(ST_{axis}(geometry)) FILTER (WHERE pixel_value >= {threshold})"
+    for threshold in DECILE_THRESHOLDS
+    for aggregate, axis in (("min", "X"), ("min", "Y"), ("max", "X"), ("max", "Y"))
+)
+
+# Per-raster histograms and decile bboxes of the vectors in {rows}.
+_STATS_CTES = f"""
+    counts AS (
+        SELECT prediction_raster_id, pixel_value, count(*) AS n
+        FROM {{rows}}
+        GROUP BY prediction_raster_id, pixel_value
+    ),
+    histograms AS (
+        SELECT rasters.id AS raster_id,
+            array_agg(coalesce(counts.n, 0) ORDER BY bucket) AS histogram
+        FROM (SELECT DISTINCT prediction_raster_id AS id FROM counts) rasters
+        CROSS JOIN generate_series(0, {HISTOGRAM_BUCKETS - 1}) AS bucket
+        LEFT JOIN counts
+            ON counts.prediction_raster_id = rasters.id
+            AND counts.pixel_value = bucket
+        GROUP BY rasters.id
+    ),
+    extents AS (
+        SELECT prediction_raster_id AS raster_id, ARRAY[{_DECILE_EXTENTS}] AS bboxes
+        FROM {{rows}}
+        GROUP BY prediction_raster_id
+    )
+"""
+
+_ADD_SQL = """
+    WITH {ctes}
+    UPDATE prediction_rasters SET
+        pixel_histogram = (
+            SELECT array_agg(stored + added ORDER BY i)
+            FROM unnest(prediction_rasters.pixel_histogram, histograms.histogram)
+                WITH ORDINALITY AS merged(stored, added, i)
+        ),
+        decile_bboxes = (
+            SELECT array_agg(
+                CASE WHEN i % 4 IN (1, 2) THEN least(stored, added)
+                ELSE greatest(stored, added) END
+                ORDER BY i
+            )
+            FROM unnest(prediction_rasters.decile_bboxes, extents.bboxes)
+                WITH ORDINALITY AS merged(stored, added, i)
+        )
+    FROM histograms
+    JOIN extents USING (raster_id)
+    WHERE prediction_rasters.id = histograms.raster_id
+        AND prediction_rasters.pixel_histogram IS NOT NULL;
+"""
+
+_SUBTRACT_SQL = """
+    WITH {ctes}
+    UPDATE prediction_rasters SET
+        pixel_histogram = (
+            SELECT array_agg(stored - removed ORDER BY i)
+            FROM unnest(prediction_rasters.pixel_histogram, histograms.histogram)
+                WITH ORDINALITY AS merged(stored, removed, i)
+        )
+    FROM histograms
+    WHERE prediction_rasters.id = histograms.raster_id
+        AND prediction_rasters.pixel_histogram IS NOT NULL;
+"""
+
+_EMPTY_HISTOGRAM = f"array_fill(0::bigint, ARRAY[{HISTOGRAM_BUCKETS}])"
+_EMPTY_BBOXES = f"array_fill(NULL::double precision, ARRAY[{4 * len(DECILE_THRESHOLDS)}])"
+
+_DDL = [
+    # Existing tables: new rasters start empty; NULL marks rasters to backfill.
+    "ALTER TABLE prediction_rasters ADD COLUMN IF NOT EXISTS pixel_histogram bigint[]",
+    "ALTER TABLE prediction_rasters ADD COLUMN IF NOT EXISTS decile_bboxes double precision[]",
+    f"ALTER TABLE prediction_rasters ALTER COLUMN pixel_histogram SET DEFAULT {_EMPTY_HISTOGRAM}",
+    f"ALTER TABLE prediction_rasters ALTER COLUMN decile_bboxes SET DEFAULT {_EMPTY_BBOXES}",
+    """
+    CREATE OR REPLACE FUNCTION histogram_count_from(histogram bigint[], bucket integer)
+    RETURNS bigint AS $$
+        SELECT coalesce(sum(n), 0)::bigint FROM unnest(histogram[bucket + 1:]) AS n
+    $$ LANGUAGE sql IMMUTABLE STRICT
+    """,
+    """
+    CREATE OR REPLACE FUNCTION decile_bbox(bboxes double precision[], decile integer)
+    RETURNS geometry AS $$
+        SELECT ST_SetSRID(ST_Envelope(ST_MakeLine(
+            ST_MakePoint(bboxes[4 * decile + 1], bboxes[4 * decile + 2]),
+            ST_MakePoint(bboxes[4 * decile + 3], bboxes[4 * decile + 4])
+        )), 4326)
+    $$ LANGUAGE sql IMMUTABLE STRICT
+    """,
+    f"""
+    CREATE OR REPLACE FUNCTION update_prediction_raster_stats() RETURNS trigger AS $$
+    BEGIN
+        -- The purge deletes the rasters right after their vectors.
+        {SKIP_SILENT_DELETES}
+        IF TG_OP IN ('DELETE', 'UPDATE') THEN
+            {_SUBTRACT_SQL.format(ctes=_STATS_CTES.format(rows="old_rows"))}
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            {_ADD_SQL.format(ctes=_STATS_CTES.format(rows="new_rows"))}
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+]
+
+# PostgreSQL allows only one event per trigger with transition tables.
+_TRIGGER_DDL = """
+    CREATE OR REPLACE TRIGGER prediction_vectors_raster_stats_{event}
+        AFTER {event} ON prediction_vectors
+        REFERENCING {transitions}
+        FOR EACH STATEMENT EXECUTE FUNCTION update_prediction_raster_stats()
+"""
+_TRIGGER_TRANSITIONS = {
+    "insert": "NEW TABLE AS new_rows",
+    "update": "OLD TABLE AS old_rows NEW TABLE AS new_rows",
+    "delete": "OLD TABLE AS old_rows",
+}
+
+_BACKFILL_SQL = text(
+    f"""
+    WITH batch AS (
+        SELECT id FROM prediction_rasters
+        WHERE pixel_histogram IS NULL
+        ORDER BY id
+        LIMIT :limit
+        FOR UPDATE SKIP LOCKED
+    ),
+    batch_rows AS (
+        SELECT prediction_vectors.*
+        FROM prediction_vectors
+        JOIN batch ON batch.id = prediction_vectors.prediction_raster_id
+    ),
+    {_STATS_CTES.format(rows="batch_rows")}
+    UPDATE prediction_rasters SET
+        pixel_histogram = coalesce(histograms.histogram, {_EMPTY_HISTOGRAM}),
+        decile_bboxes = coalesce(extents.bboxes, {_EMPTY_BBOXES})
+    FROM batch
+    LEFT JOIN histograms ON histograms.raster_id = batch.id
+    LEFT JOIN extents ON extents.raster_id = batch.id
+    WHERE prediction_rasters.id = batch.id
+    """
+)
+
+
+def install_raster_stats_triggers(engine):
+    with engine.begin() as conn:
+        for statement in _DDL:
+            conn.execute(text(statement))
+        for event, transitions in _TRIGGER_TRANSITIONS.items():
+            conn.execute(
+                text(_TRIGGER_DDL.format(event=event, transitions=transitions))
+            )
+
+
+def backfill_raster_stats(batch_size: int = BACKFILL_BATCH) -> int:
+    """Compute the stats of up to batch_size rasters that have none; returns
+    how many were filled."""
+    session = Session()
+    try:
+        count = session.execute(_BACKFILL_SQL, {"limit": batch_size}).rowcount
+        session.commit()
+        return count
+    finally:
+        session.close()
+
+
+def histogram_bucket(threshold: float, inclusive: bool = True) -> int:
+    """First bucket of pixel values `>= threshold` (or `> threshold`)."""
+    bucket = math.ceil(threshold) if inclusive else math.floor(threshold) + 1
+    return min(max(bucket, 0), HISTOGRAM_BUCKETS)
+
+
+def decile_for_bucket(bucket: int) -> int:
+    """The highest decile whose pixels include every pixel >= bucket."""
+    return max(k for k, threshold in enumerate(DECILE_THRESHOLDS) if threshold <= bucket)
+
+
+def pixels_from(bucket: int):
+    """SQL: vectors of the raster with a pixel value >= bucket, NULL if unknown."""
+    return func.histogram_count_from(PredictionRaster.pixel_histogram, bucket)
+
+
+def may_have_pixels_from(bucket: int, geometry=None):
+    """SQL condition that is false only for rasters known to have no vector
+    with a pixel value >= bucket (within `geometry`, if given)."""
+    condition = pixels_from(bucket) > 0
+    if geometry is not None:
+        condition = and_(
+            condition,
+            func.ST_Intersects(
+                func.decile_bbox(
+                    PredictionRaster.decile_bboxes, decile_for_bucket(bucket)
+                ),
+                geometry,
+            ),
+        )
+    return or_(PredictionRaster.pixel_histogram.is_(None), condition)
+
+
+def has_pixels(threshold: float, inclusive: bool = True):
+    """SQL: whether the raster has a vector with a pixel value >= threshold
+    (> if not inclusive). Reads the histogram, or the vectors of rasters
+    without one."""
+    if inclusive:
+        above = PredictionVector.pixel_value >= threshold
+    else:
+        above = PredictionVector.pixel_value > threshold
+    return case(
+        (
+            PredictionRaster.pixel_histogram.is_(None),
+            exists().where(
+                PredictionVector.prediction_raster_id == PredictionRaster.id, above
+            ),
+        ),
+        else_=pixels_from(histogram_bucket(threshold, inclusive)) > 0,
+    )
@@ -0,0 +1,117 @@
+import datetime
+import json
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from logging.handlers import RotatingFileHandler
+
+from sqlalchemy import event
+
+from app.config.config import (
+    SLOW_QUERY_EXPLAIN_SAMPLE_RATE,
+    SLOW_QUERY_LOG_FILE,
+    SLOW_QUERY_THRESHOLD_MS,
+)
+
+MAX_LOGGED_CHARS = 20_000
+RECENT_ENTRIES = 100
+# EXPLAIN ANALYZE runs the statement again, so cap how long it may take.
+EXPLAIN_TIMEOUT_FACTOR = 10
+
+logger = logging.getLogger("app.slow_query")
+_recent = deque(maxlen=RECENT_ENTRIES)
+_recent_lock = threading.Lock()
+# A single worker keeps EXPLAIN captures to at most one extra connection.
+_explain_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="explain")
+
+
+def _truncate(value: str) -> str:
+    if len(value) <= MAX_LOGGED_CHARS:
+        return value
+    return value[:MAX_LOGGED_CHARS] + "...<truncated>"
+
+
+def _render_sql(cursor, statement, parameters) -> str:
+    """Inline the bound parameters into the statement where the driver can."""
+    try:
+        rendered = cursor.mogrify(statement, parameters)
+    except Exception:
+        return statement
+    return rendered.decode() if isinstance(rendered, bytes) else rendered
+
+
+def _is_explainable(statement: str) -> bool:
+    # EXPLAIN ANALYZE executes the statement, and a WITH may hide a
+    # DELETE, UPDATE or INSERT, so only plain SELECTs are explained.
+    head = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    return head == "SELECT"
+
+
+def _store(entry: dict):
+    with _recent_lock:
+        _recent.append(entry)
+    logger.warning(json.dumps(entry, default=str))
+
+
+def _explain(engine, entry: dict, statement: str, parameters):
+    timeout_ms = int(SLOW_QUERY_THRESHOLD_MS * EXPLAIN_TIMEOUT_FACTOR)
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute(f"SET LOCAL statement_timeout = {timeout_ms}")
+        cursor.execute(
+            "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + statement, parameters
+        )
+        entry["plan"] = cursor.fetchone()[0]
+    except Exception as e:
+        entry["plan_error"] = str(e)
+    finally:
+        # Whatever the SELECT did (locks, volatile functions) is undone.
+        connection.rollback()
+        connection.close()
+    _store(entry)
+
+
+def recent_slow_queries() -> list[dict]:
+    with _recent_lock:
+        return list(_recent)
+
+
+def install(engine):
+    """Log statements slower than SLOW_QUERY_THRESHOLD_MS and sample their plans."""
+    if SLOW_QUERY_LOG_FILE and not logger.handlers:
+        handler = RotatingFileHandler(
+            SLOW_QUERY_LOG_FILE, maxBytes=10 * 1024 * 1024, backupCount=5
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.WARNING)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start_timer(conn, cursor, statement, parameters, context, executemany):
+        context._slow_query_start = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _check_duration(conn, cursor, statement, parameters, context, executemany):
+        duration_ms = (time.perf_counter() - context._slow_query_start) * 1000
+        if duration_ms < SLOW_QUERY_THRESHOLD_MS:
+            return
+
+        entry = {
+            "logged_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "duration_ms": round(duration_ms, 1),
+            "statement": _truncate(statement),
+            "parameters": _truncate(repr(parameters)),
+            "sql": _truncate(_render_sql(cursor, statement, parameters)),
+        }
+        if (
+            not executemany
+            and _is_explainable(statement)
+            and random.random() < SLOW_QUERY_EXPLAIN_SAMPLE_RATE
+        ):
+            _explain_executor.submit(_explain, engine, entry, statement, parameters)
+        else:
+            _store(entry)
@@ -0,0 +1,11 @@
+from app.db.slow_query import _is_explainable
+
+
+def test_only_plain_selects_are_explained():
+    assert _is_explainable("  select * from aois")
+    assert not _is_explainable(
+        "WITH removed AS (DELETE FROM data_changes RETURNING weight) "
+        "SELECT sum(weight) FROM removed"
+    )
+    assert not _is_explainable("UPDATE jobs SET is_deleted = true")
+    assert not _is_explainable("   ")
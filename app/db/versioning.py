@@ -0,0 +1,77 @@
+"""Data version derived from writes to the tables the read routes serve.
+
+Every write statement on those tables inserts a row into data_changes via a
+statement-level trigger. The version is the sum of the row weights, which
+only changes when a writing transaction commits, so a version read before a
+query never labels newer data with an older version. Inserting instead of
+updating one counter row keeps concurrent ingest transactions from
+serializing on a single lock. Old rows are folded into one row carrying
+their summed weight, which keeps the table (and the sum) small and stable.
+"""
+
+from sqlalchemy import text
+
+VERSIONED_TABLES = [
+    "aois",
+    "jobs",
+    "images",
+    "prediction_rasters",
+    "prediction_vectors",
+    "scene_classification_vectors",
+]
+COMPACT_EVERY = 1000
+
+# Set for their own transactions by the purge worker (services/purge.py) and
+# the prediction archiver (services/prediction_archive.py). They only remove
+# rows the read routes no longer serve from the table (hidden by a soft
+# delete, or served from an archive), so the change triggers skip them.
+SILENT_DELETES_SETTING = "app.silent_deletes"
+SKIP_SILENT_DELETES = (
+    f"IF current_setting('{SILENT_DELETES_SETTING}', true) = 'on' THEN RETURN NULL; END IF;"
+)
+
+_FUNCTION_DDL = f"""
+CREATE OR REPLACE FUNCTION record_data_change() RETURNS trigger AS $$
+DECLARE
+    new_id bigint;
+BEGIN
+    {SKIP_SILENT_DELETES}
+    INSERT INTO data_changes (weight) VALUES (1) RETURNING id INTO new_id;
+    IF new_id % {COMPACT_EVERY} = 0 THEN
+        WITH removed AS (
+            DELETE FROM data_changes WHERE id < new_id RETURNING weight
+        )
+        INSERT INTO data_changes (weight)
+        SELECT sum(weight) FROM removed HAVING count(*) > 0;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+_TRIGGER_DDL = """
+CREATE OR REPLACE TRIGGER {table}_data_change
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table}
+    FOR EACH STATEMENT EXECUTE FUNCTION record_data_change()
+"""
+
+
+def install_version_triggers(engine):
+    with engine.begin() as conn:
+        conn.execute(text(_FUNCTION_DDL))
+        for table in VERSIONED_TABLES:
+            conn.execute(text(_TRIGGER_DDL.format(table=table)))
+
+
+DATA_VERSION_SQL = "SELECT coalesce(sum(weight), 0) FROM data_changes"
+
+
+def get_data_version(session) -> int:
+    return session.execute(text(DATA_VERSION_SQL)).scalar_one()
+
+
+def silence_deletes(session):
+    """Make the change triggers skip the rest of the session's transaction."""
+    session.execute(
+        text("SELECT set_config(:name, 'on', true)"), {"name": SILENT_DELETES_SETTING}
+    )
@@ -1,11 +1,80 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
+from sqlalchemy.exc import OperationalError
+
+from app.config.config import (
+    ADMIN_ENDPOINTS_ENABLED,
+    COMPRESSION_ENABLED,
+    PREDICTION_ARCHIVE_ENABLED,
+    PROFILING_ENABLED,
+    QUERY_REPEAT_THRESHOLD,
+    RESPONSE_CACHE_ENABLED,
+    TILE_ARCHIVES_ENABLED,
+)
+from app.core.admission import AdmissionControlMiddleware
+from app.core.compression import CompressionMiddleware
+from app.core.conditional import ConditionalGetMiddleware
+from app.core.metrics import MetricsMiddleware, registry
+from app.core.profiling import ProfilingMiddleware
+from app.core.query_budget import QueryBudgetMiddleware
+from app.core.responses import TimedJSONResponse
+from app.db.backfill import Backfill
+from app.db.deadline import query_timeout_handler
+from app.db.partitions import PartitionMaintenance
+from app.db.prediction_facts import backfill_prediction_facts
+from app.db.raster_stats import backfill_raster_stats
+from app.routes import (
+    admin,
+    aoi,
+    export,
+    job,
+    model,
+    predictions,
+    purge,
+    satellite,
+    scl,
+    tiles,
+)
+from app.services.cache_invalidation import AOIChangeListener
+from app.services.prediction_archive import PredictionArchiver
+from app.services.purge import PurgeWorker
+from app.services.tile_archive import TileArchiveWorker
+from app.services.warmup import Warmup, readiness
 
-from app.routes import aoi, job, model, predictions, satellite, scl
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    workers = [
+        Warmup(),
+        Backfill("raster-stats", backfill_raster_stats),
+        Backfill("prediction-facts", backfill_prediction_facts),
+        PartitionMaintenance(),
+        PurgeWorker(),
+    ]
+    if RESPONSE_CACHE_ENABLED or TILE_ARCHIVES_ENABLED:
+        workers.append(AOIChangeListener())
+    if TILE_ARCHIVES_ENABLED:
+        workers.append(TileArchiveWorker())
+    if PREDICTION_ARCHIVE_ENABLED:
+        workers.append(PredictionArchiver())
+    for worker in workers:
+        worker.start()
+    yield
+    for worker in workers:
+        worker.stop()
 
 
+app = FastAPI(default_response_class=TimedJSONResponse, lifespan=lifespan)
+app.add_exception_handler(OperationalError, query_timeout_handler)
+
+# Added last, so it runs first: the data version read of conditional GETs
+# waits for admission like any other query.
+app.add_middleware(ConditionalGetMiddleware)
+app.add_middleware(AdmissionControlMiddleware)
+
 origins = ["*"]
 
 
@@ -18,14 +87,44 @@ app.add_middleware(
 )
 print("CORS-Middleware active for origins: ", origins)
 
+if COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
+
+if PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+
+if QUERY_REPEAT_THRESHOLD:
+    app.add_middleware(QueryBudgetMiddleware)
+
+app.add_middleware(MetricsMiddleware)
+
 app.include_router(predictions.router)
 app.include_router(aoi.router)
 app.include_router(job.router)
 app.include_router(scl.router)
 app.include_router(model.router)
 app.include_router(satellite.router)
+app.include_router(export.router)
+app.include_router(tiles.router)
+app.include_router(purge.router)
+if ADMIN_ENDPOINTS_ENABLED:
+    app.include_router(admin.router)
 
 
 @app.get("/health", tags=["Health Check"])
 async def health_status():
     return {"message": "Application running"}
+
+
+@app.get("/ready", tags=["Health Check"])
+async def ready_status():
+    """503 until the startup warm-up is done; for load balancer checks."""
+    status = readiness.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+
+@app.get("/metrics", tags=["Health Check"], response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(
+        registry.render(), media_type="text/plain; version=0.0.4"
+    )
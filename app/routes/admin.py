@@ -0,0 +1,47 @@
+from fastapi import APIRouter, HTTPException
+from starlette.concurrency import run_in_threadpool
+
+from app.core.profiling import get_profile, recent_profiles
+from app.db.connect import pool_stats
+from app.db.slow_query import recent_slow_queries
+from app.services.tile_archive import build_job_archive
+
+router = APIRouter(prefix="/admin")
+
+
+@router.get("/slow-queries", tags=["Admin"])
+async def get_slow_queries():
+    return {"slow_queries": recent_slow_queries()}
+
+
+@router.get("/pool", tags=["Admin"])
+async def get_pool_stats():
+    return {"pools": pool_stats()}
+
+
+@router.get("/profiles", tags=["Admin"])
+async def get_profiles():
+    return {"profiles": recent_profiles()}
+
+
+@router.get("/profiles/{profile_id}", tags=["Admin"])
+async def get_profile_by_id(profile_id: int):
+    profile = get_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile
+
+
+@router.post("/tile-archives/{job_id}", tags=["Admin"])
+async def rebuild_tile_archive(job_id: int, include_scl: bool = False):
+    archive = await run_in_threadpool(build_job_archive, job_id, include_scl)
+    if archive is None:
+        raise HTTPException(
+            status_code=409,
+            detail="Job is not completed or its archive is being built",
+        )
+    return {
+        "job_id": archive.job_id,
+        "tile_count": archive.tile_count,
+        "size_bytes": archive.size_bytes,
+    }
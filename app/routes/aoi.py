@@ -1,21 +1,37 @@
 import json
 
 import geopandas as gpd
-from fastapi import APIRouter, Body, Depends, HTTPException, Query
-from fastapi.responses import JSONResponse
+import shapely
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, Response
 from pydantic import BaseModel
 from shapely.geometry import shape
-from sqlalchemy import case, distinct, func
+from sqlalchemy import and_, case, distinct, func
 
 from app.constants.geo import STANDARD_CRS, WORLD_WIDE_BBOX
 from app.constants.spec import MAX_AOI_SQKM
+from app.core.metrics import serialization_timer
+from app.core.responses import render_json
 from app.db.connect import Session, get_db
-from app.db.models import AOI, Image, Job, PredictionRaster, PredictionVector
+from app.db.deadline import start_deadline
+from app.db.models import AOI, Image, Job, PredictionRaster
+from app.db.raster_stats import has_pixels
+from app.services.aoi_index import IndexedAOI, aoi_index
+from app.services.cache_invalidation import register_warmer
+from app.services.purge import delete_aoi, purge_status
+from app.services.response_cache import ALL_AOIS_TAG, aoi_tag, cached_response
+from app.services.single_flight import make_key
 from app.services.utils import determine_utm_epsg, parse_bbox
-from app.types.helpers import PolygonFeature, PolygonFeatureCollection, PolygonGeoJSON
+from app.services.warmup import register_warmup
+from app.types.helpers import (
+    BoundingBox,
+    PolygonFeature,
+    PolygonFeatureCollection,
+    PolygonGeoJSON,
+)
 from app.utils import percent_to_accuracy
 
 router = APIRouter()
+DEFAULT_PLASTIC_THRESHOLD = 80
 
 
 class AOICreate(BaseModel):
@@ -25,6 +41,7 @@ class AOICreate(BaseModel):
 
 @router.get("/aoi-centers", tags=["AOI"])
 async def get_aoi_centers_by_bbox(
+    request: Request,
     bbox: str | None = Query(
         WORLD_WIDE_BBOX["query_str"],
         description="Comma-separated bounding box coordinates minx,miny,maxx,maxy  - WGS84",
@@ -35,10 +52,46 @@ async def get_aoi_centers_by_bbox(
     except ValueError as e:
         raise HTTPException(status_code=400, detail=f"Bad Request. {e}")
 
+    body = await cached_response(
+        make_key("aoi-centers", bbox=parsed_bbox),
+        (ALL_AOIS_TAG,),
+        aoi_centers_payload,
+        parsed_bbox,
+        request=request,
+    )
+    return Response(content=body, media_type="application/json")
+
+
+def aoi_centers_payload(parsed_bbox: BoundingBox) -> bytes:
+    indexed = aoi_index.lookup(parsed_bbox)
+    if indexed is not None:
+        results_list = [_center_feature(aoi, aoi.area_km2, aoi.bbox) for aoi in indexed]
+    else:
+        results_list = []
+        for row in _query_aoi_centers(parsed_bbox):
+            area_km2, bounding_box = _area_and_bbox(shapely.from_wkt(row.aoi_as_wkt))
+            results_list.append(_center_feature(row, area_km2, bounding_box))
+
+    results_dict = {"type": "FeatureCollection", "features": results_list}
+    with serialization_timer():
+        results_json = json.dumps(results_dict, ensure_ascii=False)
+    return render_json(results_json)
+
+
+def _query_aoi_centers(parsed_bbox: BoundingBox) -> list:
+    # Cached payloads read from the primary: a lagging replica could refill
+    # the cache with data older than the change that just evicted it.
     session = Session()
+    try:
+        start_deadline(session, "aoi-centers")
+        return _aoi_centers_query(session, parsed_bbox).all()
+    finally:
+        session.close()
 
+
+def _aoi_centers_query(session, parsed_bbox: BoundingBox):
     # Query for geometries within the bounding box
-    query = (
+    return (
         session.query(
             AOI.id,
             AOI.name,
@@ -46,9 +99,9 @@ async def get_aoi_centers_by_bbox(
             func.max(Image.timestamp).label("end_date"),
             func.count(distinct(Image.timestamp)).label("image_count"),
             func.ST_AsGeoJSON(func.ST_Centroid(
-                AOI.geometry)).label("geometry"),
+                AOI.geometry)).label("centroid"),
             func.ST_AsText(AOI.geometry).label("aoi_as_wkt"),
-            func.ST_AsGeoJSON(AOI.geometry).label("aoi_geo"),
+            func.ST_AsGeoJSON(AOI.geometry).label("geometry"),
         )
         .filter(
             func.ST_Intersects(
@@ -63,67 +116,64 @@ async def get_aoi_centers_by_bbox(
             ),
             AOI.is_deleted == False,  # noqa <E712>
         )
-        .join(Job, AOI.id == Job.aoi_id, isouter=True)
+        .join(
+            Job,
+            and_(AOI.id == Job.aoi_id, Job.is_deleted == False),  # noqa <E712>
+            isouter=True,
+        )
         .join(Image, Job.id == Image.job_id, isouter=True)
     ).group_by(AOI.id)
 
-    results = query.all()
-    session.close()
-
-    results_list = []
-    for row in results:
-        # Convert WKT to GeoSeries and create GeoDataFrame
-        polygon = gpd.GeoSeries.from_wkt([row.aoi_as_wkt]).iloc[0]
-        gdf = gpd.GeoDataFrame(index=[0], crs="EPSG:4326", geometry=[polygon])
-
-        # Get bounding box
-        bbox = gdf.total_bounds
-        west_lon, south_lat, east_lon, north_lat = bbox[0], bbox[1], bbox[2], bbox[3]
-
-        # Determine local EPSG
-        local_epsg = determine_utm_epsg(
-            source_epsg=4326,
-            west_lon=west_lon,
-            south_lat=south_lat,
-            east_lon=east_lon,
-            north_lat=north_lat,
-            contains=True,
-        )
-        # Convert to local CRS
-        localized_gdf = gdf.to_crs(epsg=local_epsg)
-        localized_polygon = localized_gdf.iloc[0].geometry
-
-        # Calculate area in km^2
-        area_km2 = localized_polygon.area / 1e6  # Convert to km^2
-
-        # Create bounding box as array
-        bounding_box = [west_lon, south_lat, east_lon, north_lat]
-
-        results_list.append(
-            {
-                "type": "Feature",
-                "properties": {
-                    "name": row.name,
-                    "id": row.id,
-                    "start_date": row.start_date.timestamp(),
-                    "end_date": row.end_date.timestamp(),
-                    "unique_timestamp_count": row.image_count,
-                    "area_km2": area_km2,
-                    "polygon": json.loads(row.aoi_geo),
-                    "bbox": bounding_box,
-                },
-                # Ensuring row.geometry is treated as a JSON string
-                "geometry": json.loads(row.geometry),
-            }
-        )
 
-    results_dict = {"type": "FeatureCollection", "features": results_list}
-    results_json = json.dumps(results_dict, ensure_ascii=False)
-    return JSONResponse(content=results_json)
+def _area_and_bbox(polygon) -> tuple[float, list]:
+    """Area in km^2, measured in the polygon's UTM zone, and bounding box."""
+    gdf = gpd.GeoDataFrame(index=[0], crs="EPSG:4326", geometry=[polygon])
+
+    # Get bounding box
+    bbox = gdf.total_bounds
+    west_lon, south_lat, east_lon, north_lat = bbox[0], bbox[1], bbox[2], bbox[3]
+
+    # Determine local EPSG
+    local_epsg = determine_utm_epsg(
+        source_epsg=4326,
+        west_lon=west_lon,
+        south_lat=south_lat,
+        east_lon=east_lon,
+        north_lat=north_lat,
+        contains=True,
+    )
+    # Convert to local CRS
+    localized_gdf = gdf.to_crs(epsg=local_epsg)
+    localized_polygon = localized_gdf.iloc[0].geometry
+
+    # Calculate area in km^2
+    area_km2 = localized_polygon.area / 1e6  # Convert to km^2
+
+    # Create bounding box as array
+    return area_km2, [west_lon, south_lat, east_lon, north_lat]
+
+
+def _center_feature(row, area_km2: float, bounding_box: list) -> dict:
+    return {
+        "type": "Feature",
+        "properties": {
+            "name": row.name,
+            "id": row.id,
+            "start_date": row.start_date.timestamp(),
+            "end_date": row.end_date.timestamp(),
+            "unique_timestamp_count": row.image_count,
+            "area_km2": area_km2,
+            "polygon": json.loads(row.geometry),
+            "bbox": bounding_box,
+        },
+        # Ensuring row.centroid is treated as a JSON string
+        "geometry": json.loads(row.centroid),
+    }
 
 
 @router.get("/aoi", tags=["AOI"])
 async def get_aoi_by_bbox(
+    request: Request,
     bbox: str | None = Query(
         None,
         description="Comma-separated bounding box coordinates minx,miny,maxx,maxy - WGS84",
@@ -133,23 +183,78 @@ async def get_aoi_by_bbox(
         description="Id of the aoi"
     ),
     threshold: int = Query(
-        80,
+        DEFAULT_PLASTIC_THRESHOLD,
         description="Minimum probability threshold for plastic detection (0-100)",
     ),
-    db: Session = Depends(get_db),
 ):
     if bbox is None and id is None:
         raise HTTPException(
             status_code=400, detail="Either 'bbox' or 'id' must be provided.")
 
+    parsed_bbox = None
     if bbox is not None:
         try:
             parsed_bbox = parse_bbox(bbox)
         except ValueError as e:
             raise HTTPException(status_code=400, detail=f"Bad Request. {e}")
 
-    # Query for geometries within the bounding box
+    body = await cached_response(
+        make_key("aoi", bbox=parsed_bbox, id=id, threshold=threshold),
+        (ALL_AOIS_TAG,) if id is None else (aoi_tag(id),),
+        aoi_payload,
+        parsed_bbox,
+        id,
+        threshold,
+        request=request,
+    )
+    return Response(content=body, media_type="application/json")
 
+
+def aoi_payload(
+    parsed_bbox: BoundingBox | None, id: int | None, threshold: int
+) -> bytes:
+    results = None
+    if id is None and threshold == DEFAULT_PLASTIC_THRESHOLD:
+        results = aoi_index.lookup(parsed_bbox)
+    if results is None:
+        db = Session()
+        try:
+            start_deadline(db, "aoi")
+            results = _query_aois(db, parsed_bbox, id, threshold).all()
+        finally:
+            db.close()
+
+    results_list = [_aoi_feature(row) for row in results]
+
+    results_dict = {"type": "FeatureCollection", "features": results_list}
+    with serialization_timer():
+        results_json = json.dumps(results_dict, ensure_ascii=False)
+    return render_json(results_json)
+
+
+def _aoi_feature(row) -> dict:
+    return {
+        "type": "Feature",
+        "properties": {
+            "id": row.id,
+            "name": row.name,
+            "created_at": row.created_at.isoformat(),
+            "start_date": row.start_date.timestamp(),
+            "end_date": row.end_date.timestamp(),
+            "unique_timestamp_count": row.image_count,
+            "timestamp_with_plastic_count": row.plastic_timestamp_count,
+        },
+        "geometry": json.loads(row.geometry),
+    }
+
+
+def _query_aois(
+    db,
+    parsed_bbox: BoundingBox | None,
+    id: int | None,
+    threshold: int,
+    aoi_ids: list | None = None,
+):
     query = (
         db.query(
             AOI.id,
@@ -162,8 +267,7 @@ async def get_aoi_by_bbox(
                 distinct(
                     case(
                         (
-                            PredictionVector.pixel_value
-                            > percent_to_accuracy(threshold),
+                            has_pixels(percent_to_accuracy(threshold), inclusive=False),
                             Image.timestamp,
                         )
                     )
@@ -173,7 +277,14 @@ async def get_aoi_by_bbox(
         )
     )
 
-    if id is None:
+    if aoi_ids is not None:
+        query = query.filter(
+            AOI.id.in_(aoi_ids),
+            AOI.is_deleted == False,  # noqa <E712>
+        )
+    elif id is None and parsed_bbox is None:
+        query = query.filter(AOI.is_deleted == False)  # noqa <E712>
+    elif id is None:
         query = query.filter(
             func.ST_Intersects(
                 AOI.geometry,
@@ -193,34 +304,77 @@ async def get_aoi_by_bbox(
             AOI.is_deleted == False,  # noqa <E712>
         )
 
-    query = query.join(Job, AOI.id == Job.aoi_id, isouter=True) \
+    live_job = and_(AOI.id == Job.aoi_id, Job.is_deleted == False)  # noqa <E712>
+    query = query.join(Job, live_job, isouter=True) \
         .join(Image, Job.id == Image.job_id, isouter=True) \
         .join(PredictionRaster, Image.id == PredictionRaster.image_id, isouter=True) \
-        .join(PredictionVector, PredictionRaster.id == PredictionVector.prediction_raster_id, isouter=True) \
         .group_by(AOI.id, AOI.name, AOI.created_at, AOI.geometry)
+    return query
 
-    results = query.all()
 
-    results_list = [
-        {
-            "type": "Feature",
-            "properties": {
-                "id": row.id,
-                "name": row.name,
-                "created_at": row.created_at.isoformat(),
-                "start_date": row.start_date.timestamp(),
-                "end_date": row.end_date.timestamp(),
-                "unique_timestamp_count": row.image_count,
-                "timestamp_with_plastic_count": row.plastic_timestamp_count,
-            },
-            "geometry": json.loads(row.geometry),
-        }
-        for row in results
-    ]
+@aoi_index.loader
+def _load_indexed_aois(aoi_ids: list | None) -> list[IndexedAOI]:
+    session = Session()
+    try:
+        start_deadline(session, "aoi-index")
+        rows = _query_aois(
+            session, None, None, DEFAULT_PLASTIC_THRESHOLD, aoi_ids
+        ).add_columns(
+            func.ST_AsGeoJSON(func.ST_Centroid(AOI.geometry)).label("centroid"),
+            func.ST_AsBinary(AOI.geometry).label("wkb"),
+        ).all()
+    finally:
+        session.close()
+
+    entries = []
+    for row in rows:
+        polygon = shapely.from_wkb(bytes(row.wkb))
+        area_km2, bounding_box = _area_and_bbox(polygon)
+        entries.append(
+            IndexedAOI(
+                id=row.id,
+                name=row.name,
+                created_at=row.created_at,
+                start_date=row.start_date,
+                end_date=row.end_date,
+                image_count=row.image_count,
+                plastic_timestamp_count=row.plastic_timestamp_count,
+                geometry=row.geometry,
+                centroid=row.centroid,
+                bbox=bounding_box,
+                area_km2=area_km2,
+                shape=polygon,
+            )
+        )
+    return entries
 
-    results_dict = {"type": "FeatureCollection", "features": results_list}
-    results_json = json.dumps(results_dict, ensure_ascii=False)
-    return results_json
+
+@register_warmer
+def _warm_aoi_responses(aoi_id: int):
+    world_bbox = parse_bbox(WORLD_WIDE_BBOX["query_str"])
+    yield (
+        make_key("aoi-centers", bbox=world_bbox),
+        (ALL_AOIS_TAG,),
+        aoi_centers_payload,
+        (world_bbox,),
+    )
+    yield (
+        make_key("aoi", bbox=None, id=aoi_id, threshold=DEFAULT_PLASTIC_THRESHOLD),
+        (aoi_tag(aoi_id),),
+        aoi_payload,
+        (None, aoi_id, DEFAULT_PLASTIC_THRESHOLD),
+    )
+
+
+@register_warmup
+def _warm_aoi_queries():
+    nowhere = BoundingBox(0, 0, 0, 0)
+    session = Session()
+    try:
+        _aoi_centers_query(session, nowhere).all()
+        _query_aois(session, nowhere, None, DEFAULT_PLASTIC_THRESHOLD).all()
+    finally:
+        session.close()
 
 
 def enforce_max_aoi_area(area_km2: float):
@@ -271,6 +425,7 @@ async def create_aoi(
     db.add(aoi)
     db.commit()
     db.refresh(aoi)
+    aoi_index.mark_changed([aoi.id])
 
     json_aoi = json.dumps(
         {
@@ -281,3 +436,16 @@ async def create_aoi(
     )
 
     return json_aoi
+
+
+@router.delete("/aoi/{aoi_id}", status_code=202, tags=["AOI"])
+async def delete_aoi_by_id(
+    aoi_id: int, response: Response, db: Session = Depends(get_db)
+):
+    """Hide the AOI and its jobs from all read routes now; their data is
+    removed in the background. Poll the Location for progress."""
+    purge = delete_aoi(db, aoi_id)
+    if purge is None:
+        raise HTTPException(status_code=404, detail="AOI not found")
+    response.headers["Location"] = f"/purges/{purge.id}"
+    return purge_status(purge)
@@ -0,0 +1,201 @@
+import datetime
+from itertools import chain
+
+import pyarrow as pa
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, select
+from starlette.concurrency import run_in_threadpool
+
+from app.db.connect import ReadSession
+from app.db.deadline import start_deadline
+from app.db.models import (
+    AOI,
+    Image,
+    Job,
+    Model,
+    PredictionFact,
+    PredictionRaster,
+    PredictionVector,
+)
+from app.db.prediction_facts import facts_ready, live_facts
+from app.services.export import (
+    BATCH_ROWS,
+    FILE_EXTENSIONS,
+    MEDIA_TYPES,
+    PREDICTION_SCHEMA,
+    ExportFormat,
+    encode_batches,
+    record_batches,
+)
+from app.services.prediction_archive import (
+    archived_image_ids,
+    archives_covering,
+    live_job_ids,
+    read_archived,
+)
+
+router = APIRouter(prefix="/export")
+
+
+@router.get("/predictions", tags=["Export"])
+async def export_predictions(
+    aoi_id: int = Query(..., description="Id of the AOI"),
+    model_id: str = Query(..., description="Model id, as in /predictions-by-day-and-aoi"),
+    start: datetime.datetime = Query(..., description="Start of the time range"),
+    end: datetime.datetime = Query(..., description="End of the time range"),
+    format: ExportFormat = Query(
+        ExportFormat.GEOPARQUET,
+        description="geoparquet (zstd-compressed Parquet with GeoParquet metadata) or arrow (Arrow IPC stream)",
+    ),
+):
+    if start >= end:
+        raise HTTPException(
+            status_code=400, detail="The start must be before the end"
+        )
+    # Fail with a status code before the stream (and its 200) starts.
+    await run_in_threadpool(_check_exists, aoi_id, model_id)
+
+    filename = (
+        f"predictions_aoi{aoi_id}_{start:%Y%m%d}_{end:%Y%m%d}."
+        f"{FILE_EXTENSIONS[format]}"
+    )
+    return StreamingResponse(
+        _export_chunks(aoi_id, model_id, start, end, format),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+def _check_exists(aoi_id: int, model_id: str):
+    session = ReadSession()
+    try:
+        aoi = (
+            session.query(AOI.id)
+            .filter(AOI.id == aoi_id, AOI.is_deleted == False)  # noqa <E712>
+            .one_or_none()
+        )
+        if aoi is None:
+            raise HTTPException(status_code=404, detail="AOI not found")
+        if (
+            session.query(Model.id).filter(Model.model_id == model_id).one_or_none()
+            is None
+        ):
+            raise HTTPException(status_code=404, detail="Model not found")
+    finally:
+        session.close()
+
+
+def _export_query(
+    aoi_id: int,
+    model_id: str,
+    start: datetime.datetime,
+    end: datetime.datetime,
+    use_facts: bool,
+    archived_images: list[int],
+):
+    if use_facts:
+        query = _export_facts_query(aoi_id, model_id, start, end)
+        if archived_images:
+            query = query.where(PredictionFact.image_id.notin_(archived_images))
+        return query
+    # Same selection as /predictions-by-day-and-aoi, over a time range.
+    query = (
+        select(
+            func.ST_X(PredictionVector.geometry),
+            func.ST_Y(PredictionVector.geometry),
+            PredictionVector.pixel_value,
+            Image.timestamp,
+            Image.id,
+            func.ST_AsBinary(PredictionVector.geometry),
+        )
+        .select_from(AOI)
+        .join(Job, Job.aoi_id == AOI.id)
+        .join(Image, Image.job_id == Job.id)
+        .join(PredictionRaster, PredictionRaster.image_id == Image.id)
+        .join(
+            PredictionVector,
+            PredictionVector.prediction_raster_id == PredictionRaster.id,
+        )
+        .join(Model, Model.id == Job.model_id)
+        .where(
+            AOI.id == aoi_id,
+            Model.model_id == model_id,
+            Job.is_deleted == False,  # noqa <E712>
+            Image.timestamp >= start,
+            Image.timestamp < end,
+            func.ST_Intersects(PredictionVector.geometry, AOI.geometry),
+        )
+        .order_by(Image.timestamp, Image.id)
+    )
+    if archived_images:
+        query = query.where(Image.id.notin_(archived_images))
+    return query
+
+
+def _export_facts_query(
+    aoi_id: int, model_id: str, start: datetime.datetime, end: datetime.datetime
+):
+    return (
+        select(
+            func.ST_X(PredictionFact.geometry),
+            func.ST_Y(PredictionFact.geometry),
+            PredictionFact.pixel_value,
+            PredictionFact.image_timestamp,
+            PredictionFact.image_id,
+            func.ST_AsBinary(PredictionFact.geometry),
+        )
+        .where(
+            PredictionFact.aoi_id == aoi_id,
+            PredictionFact.model_id
+            == select(Model.id).where(Model.model_id == model_id).scalar_subquery(),
+            PredictionFact.day >= start.date(),
+            PredictionFact.day <= end.date(),
+            PredictionFact.image_timestamp >= start,
+            PredictionFact.image_timestamp < end,
+            live_facts(),
+        )
+        .order_by(PredictionFact.image_timestamp, PredictionFact.image_id)
+    )
+
+
+def _export_chunks(
+    aoi_id: int,
+    model_id: str,
+    start: datetime.datetime,
+    end: datetime.datetime,
+    export_format: ExportFormat,
+):
+    session = ReadSession()
+    try:
+        start_deadline(session, "export")
+        archives = archives_covering(session, aoi_id, start, end)
+        model_pk = session.query(Model.id).filter(Model.model_id == model_id).scalar()
+        # Cold storage first: it holds the oldest predictions.
+        archived = (
+            pa.RecordBatch.from_arrays(batch.columns, schema=PREDICTION_SCHEMA)
+            for batch in read_archived(
+                archives,
+                live_job_ids(session, aoi_id, model_pk) if archives else [],
+                start,
+                end,
+                PREDICTION_SCHEMA.names,
+            )
+        )
+        # yield_per fetches through a server-side cursor, one batch at a time.
+        result = session.execute(
+            _export_query(
+                aoi_id,
+                model_id,
+                start,
+                end,
+                facts_ready(session),
+                archived_image_ids(archives),
+            ),
+            execution_options={"yield_per": BATCH_ROWS},
+        )
+        yield from encode_batches(
+            chain(archived, record_batches(result.partitions())), export_format
+        )
+    finally:
+        session.close()
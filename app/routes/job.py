@@ -1,11 +1,15 @@
 import datetime
+import heapq
 import json
+from typing import NamedTuple
 
-from fastapi import APIRouter, Body, Depends, HTTPException, Query
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, Response
 from sqlalchemy import func
 
 from app.constants.spec import MAX_JOB_TIME_RANGE_DAYS
-from app.db.connect import Session, get_db
+from app.core.metrics import serialization_timer
+from app.db.connect import ReadSession, Session, get_db, get_read_db
+from app.db.deadline import run_cancellable, start_deadline
 from app.db.models import (
     AOI,
     Image,
@@ -15,12 +19,23 @@ from app.db.models import (
     PredictionRaster,
     PredictionVector,
 )
+from app.services.prediction_archive import (
+    all_archives,
+    archived_image_ids,
+    batch_rows,
+    point_geometry,
+    read_archived,
+    unpurged_image_ids,
+)
+from app.services.purge import delete_job, purge_status
+from app.services.warmup import register_warmup
 
 router = APIRouter()
 
 
 @router.get("/jobs", tags=["Jobs"])
 async def get_job_by_aoi(
+    request: Request,
     aoiId: int = Query(
         description="The id of the AOI",
     ),
@@ -28,44 +43,17 @@ async def get_job_by_aoi(
         default=None,
         description="The id of the model",
     ),
-    db: Session = Depends(get_db),
 ):
-    aoi = db.query(AOI).filter(AOI.id == aoiId).one_or_none()
-    if not aoi:
-        raise HTTPException(status_code=404, detail="AOI not found")
-    query = (
-        db.query(
-            Job.id.label("Job_id"),
-            Job.status,
-            Job.created_at,
-            Job.aoi_id,
-            Model.model_id,
-            Image.id.label("Image_id"),
-            Image.image_url,
-            Image.timestamp,
-            PredictionVector.pixel_value,
-            func.ST_AsGeoJSON(PredictionVector.geometry).label(
-                "PredictionVector_geometry"
-            ),
-        )
-        .join(Model, Job.model_id == Model.id)
-        .join(Image, Job.id == Image.job_id)
-        .join(PredictionRaster, Image.id == PredictionRaster.image_id)
-        .join(
-            PredictionVector,
-            PredictionRaster.id == PredictionVector.prediction_raster_id,
-        )
-        .filter(
-            Job.aoi_id == aoiId,
-            Job.is_deleted == False,  # noqa <E712>
-            Job.status == JobStatus.COMPLETED,
-        )
-        .order_by(Job.id.desc(), Image.id.desc())
-    )
+    return await run_cancellable(request, jobs_by_aoi_payload, aoiId, model_id)
 
-    if model_id:
-        query = query.filter(Job.model_id == model_id)
-    results = query.all()
+
+def jobs_by_aoi_payload(aoiId: int, model_id: str | None) -> str:
+    db = ReadSession()
+    try:
+        start_deadline(db, "jobs")
+        results = _query_jobs_by_aoi(db, aoiId, model_id)
+    finally:
+        db.close()
 
     jobs = []
 
@@ -112,7 +100,145 @@ async def get_job_by_aoi(
 
     response = {"jobs": jobs}
 
-    return json.dumps(response, ensure_ascii=False)
+    with serialization_timer():
+        return json.dumps(response, ensure_ascii=False)
+
+
+def _query_jobs_by_aoi(db, aoiId: int, model_id: str | None):
+    aoi = (
+        db.query(AOI)
+        .filter(AOI.id == aoiId, AOI.is_deleted == False)  # noqa <E712>
+        .one_or_none()
+    )
+    if not aoi:
+        raise HTTPException(status_code=404, detail="AOI not found")
+    archives = all_archives(db, aoiId)
+    live = _jobs_by_aoi_query(
+        db, aoiId, model_id, unpurged_image_ids(archives)
+    ).all()
+    if not archives:
+        return live
+    # The live and archived images are disjoint and both sorted by
+    # (job, image) descending, which the payload loop groups on.
+    return list(
+        heapq.merge(
+            live,
+            _archived_job_predictions(db, archives, model_id),
+            key=_job_image_order,
+        )
+    )
+
+
+def _job_image_order(row) -> tuple[int, int]:
+    return -row.Job_id, -row.Image_id
+
+
+class _ArchivedJobPrediction(NamedTuple):
+    """An archived point, shaped like a _jobs_by_aoi_query row."""
+
+    Job_id: int
+    status: JobStatus
+    created_at: datetime.datetime
+    aoi_id: int
+    model_id: str
+    Image_id: int
+    image_url: str
+    timestamp: datetime.datetime
+    pixel_value: int
+    lon: float
+    lat: float
+
+    @property
+    def PredictionVector_geometry(self) -> str:
+        return json.dumps(point_geometry(self.lon, self.lat))
+
+
+def _archived_job_predictions(
+    db, archives: list, model_id: str | None
+) -> list[_ArchivedJobPrediction]:
+    """The archived points of the AOI's listed jobs. /jobs lists every
+    point of an image, so the archives are read without the AOI filter."""
+    images = {
+        row.Image_id: row._asdict()
+        for row in _job_images_query(db, archives[0].aoi_id, model_id)
+        .filter(Image.id.in_(archived_image_ids(archives)))
+        .all()
+    }
+    job_ids = sorted({image["Job_id"] for image in images.values()})
+    columns = ["image_id", "pixel_value", "lon", "lat"]
+    predictions = [
+        _ArchivedJobPrediction(
+            **images[image_id], pixel_value=pixel_value, lon=lon, lat=lat
+        )
+        for batch in read_archived(
+            archives, job_ids, None, None, columns, inside_aoi=False
+        )
+        for image_id, pixel_value, lon, lat in batch_rows(batch)
+    ]
+    predictions.sort(key=_job_image_order)
+    return predictions
+
+
+def _job_images_query(db, aoiId: int, model_id: str | None):
+    """The completed jobs of the AOI with their images, newest first."""
+    query = (
+        db.query(
+            Job.id.label("Job_id"),
+            Job.status,
+            Job.created_at,
+            Job.aoi_id,
+            Model.model_id,
+            Image.id.label("Image_id"),
+            Image.image_url,
+            Image.timestamp,
+        )
+        .join(Model, Job.model_id == Model.id)
+        .join(Image, Job.id == Image.job_id)
+        .filter(
+            Job.aoi_id == aoiId,
+            Job.is_deleted == False,  # noqa <E712>
+            Job.status == JobStatus.COMPLETED,
+        )
+        .order_by(Job.id.desc(), Image.id.desc())
+    )
+
+    if model_id:
+        query = query.filter(Job.model_id == model_id)
+    return query
+
+
+def _jobs_by_aoi_query(
+    db, aoiId: int, model_id: str | None, archived_images: list[int] = ()
+):
+    """The live predictions of _job_images_query, less those of the given
+    archived images, which the archive serves."""
+    query = (
+        _job_images_query(db, aoiId, model_id)
+        .add_columns(
+            PredictionVector.pixel_value,
+            func.ST_AsGeoJSON(PredictionVector.geometry).label(
+                "PredictionVector_geometry"
+            ),
+        )
+        .join(PredictionRaster, Image.id == PredictionRaster.image_id)
+        .join(
+            PredictionVector,
+            PredictionRaster.id == PredictionVector.prediction_raster_id,
+        )
+    )
+
+    if archived_images:
+        query = query.filter(Image.id.notin_(archived_images))
+    return query
+
+
+@register_warmup
+def _warm_job_queries():
+    db = ReadSession()
+    try:
+        _jobs_by_aoi_query(db, -1, None).all()
+    finally:
+        db.close()
 
 
 def enforce_time_range(start_date: datetime.datetime, end_date: datetime.datetime):
@@ -177,7 +303,12 @@ async def create_job(
     json_jobs = []
     if db.query(Model).filter(Model.id == model_id).count() == 0:
         raise HTTPException(status_code=404, detail="Model not found")
-    if db.query(AOI).filter(AOI.id == aoi_id).count() == 0:
+    if (
+        db.query(AOI)
+        .filter(AOI.id == aoi_id, AOI.is_deleted == False)  # noqa <E712>
+        .count()
+        == 0
+    ):
         raise HTTPException(status_code=404, detail="AOI not found")
     for start, end in date_ranges:
         job = Job(
@@ -207,8 +338,12 @@ async def create_job(
 
 
 @router.get("/jobs/{job_id}", tags=["Jobs"])
-async def get_job_by_id(job_id: int, db: Session = Depends(get_db)):
-    job = db.query(Job).filter(Job.id == job_id).one_or_none()
+async def get_job_by_id(job_id: int, db: Session = Depends(get_read_db)):
+    job = (
+        db.query(Job)
+        .filter(Job.id == job_id, Job.is_deleted == False)  # noqa <E712>
+        .one_or_none()
+    )
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
 
@@ -221,3 +356,16 @@ async def get_job_by_id(job_id: int, db: Session = Depends(get_db)):
         "maxcc": job.maxcc,
         "model_id": job.model_id,
     }
+
+
+@router.delete("/jobs/{job_id}", status_code=202, tags=["Jobs"])
+async def delete_job_by_id(
+    job_id: int, response: Response, db: Session = Depends(get_db)
+):
+    """Hide the job from all read routes now; its images and predictions are
+    removed in the background. Poll the Location for progress."""
+    purge = delete_job(db, job_id)
+    if purge is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    response.headers["Location"] = f"/purges/{purge.id}"
+    return purge_status(purge)
@@ -5,7 +5,7 @@ import json
 from fastapi import APIRouter, Depends, HTTPException, Query
 from pydantic import BaseModel, Field
 
-from app.db.connect import Session, get_db
+from app.db.connect import Session, get_db, get_read_db
 from app.db.models import (
     Band,
     ClassificationClass,
@@ -41,9 +41,18 @@ async def get_model(
     model_url: str | None = Query(None, description="Model URL"),
     version: int | None = Query(None, description="Model Version"),
     model_type: ModelType | None = Query(None, description="Model Type"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
-    models = db.query(Model)
+    # Only the served columns, in one round trip.
+    models = db.query(
+        Model.model_id,
+        Model.model_url,
+        Model.expected_image_height,
+        Model.expected_image_width,
+        Model.output_dtype,
+        Model.type,
+        Model.version,
+    )
     if model_id:
         models = models.filter(Model.model_id == model_id)
     if model_url:
@@ -63,7 +72,7 @@ async def get_model(
             "type": model.type,
             "version": model.version,
         }
-        for model in models
+        for model in models.all()
     ]
 
     return json_models
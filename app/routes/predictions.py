@@ -1,13 +1,19 @@
+import heapq
 import json
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from itertools import chain, islice
+from operator import attrgetter
+from typing import Callable, NamedTuple
 
 import requests
-from fastapi import APIRouter, HTTPException, Query
-from fastapi.responses import JSONResponse
-from sqlalchemy import func
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from sqlalchemy import func, select
 
 from app.config.config import DEFAULT_MAX_ROW_LIMIT, GITHUB_TOKEN
-from app.db.connect import Session
+from app.core.metrics import serialization_timer
+from app.core.responses import TimedJSONResponse, render_json
+from app.db.connect import ReadSession, Session
+from app.db.deadline import run_cancellable, start_deadline
 from app.db.models import (
     AOI,
     Image,
@@ -15,9 +21,39 @@ from app.db.models import (
     JobStatus,
     Model,
     ModelType,
+    PredictionFact,
     PredictionRaster,
     PredictionVector,
 )
+from app.db.prediction_facts import facts_ready, live_facts
+from app.db.raster_stats import histogram_bucket, may_have_pixels_from
+from app.services.binary_points import MEDIA_TYPE as BINARY_MEDIA_TYPE
+from app.services.binary_points import PointFormat, encode_points
+from app.services.cache_invalidation import register_warmer
+from app.services.heatmap import (
+    BATCH_ROWS as HEATMAP_BATCH_ROWS,
+    MAX_RESOLUTION as HEATMAP_MAX_RESOLUTION,
+    MEDIA_TYPES as HEATMAP_MEDIA_TYPES,
+    PNG_SUPPORTED as HEATMAP_PNG_SUPPORTED,
+    HeatmapFormat,
+    accumulate,
+    encode_grid,
+    grid_shape,
+    render_png,
+)
+from app.services.prediction_archive import (
+    all_archives,
+    archived_image_ids,
+    archives_covering,
+    batch_rows,
+    live_job_ids,
+    point_geometry,
+    read_archived,
+    unpurged_image_ids,
+)
+from app.services.response_cache import aoi_tag, cached_response
+from app.services.single_flight import make_key
+from app.services.warmup import register_warmup
 from app.utils import (
     accuracy_limit_to_percent,
     get_start_of_day_unix_timestamp,
@@ -32,25 +68,11 @@ CLASSIFICATION_PIXEL_VALUE_CONSTANT = 99
 async def get_aoi_images_grouped_by_day(
     aoiId: int = Query(..., description="Id of the AOI in question"),
 ):
-    session = Session()
-    query = (
-        session.query(
-            Image.id,
-            Image.timestamp,
-            func.ST_AsGeoJSON(Image.bbox).label("geometry"),
-        )
-        .join(
-            Job,
-            Image.job_id == Job.id,
-        )
-        .filter(
-            Job.aoi_id == aoiId,
-        )
-        .order_by(Image.timestamp)
-    )
-
-    results = query.all()
-    session.close()
+    session = ReadSession()
+    try:
+        results = _images_by_day_query(session, aoiId).all()
+    finally:
+        session.close()
 
     days = {}
     for row in results:
@@ -64,11 +86,31 @@ async def get_aoi_images_grouped_by_day(
             days[start_of_day] = [row_data]
         else:
             days[start_of_day].append(row_data)
-    return JSONResponse(content=days)
+    return TimedJSONResponse(content=days)
+
+
+def _images_by_day_query(session, aoi_id: int):
+    return (
+        session.query(
+            Image.id,
+            Image.timestamp,
+            func.ST_AsGeoJSON(Image.bbox).label("geometry"),
+        )
+        .join(
+            Job,
+            Image.job_id == Job.id,
+        )
+        .filter(
+            Job.aoi_id == aoi_id,
+            Job.is_deleted == False,  # noqa <E712>
+        )
+        .order_by(Image.timestamp)
+    )
 
 
 @router.get("/predictions-by-day-and-aoi", tags=["Predictions"])
 async def get_predictions_by_day(
+    request: Request,
     day: int = Query(
         ...,
         description="Unix Timestamp of the day in question. The timestamp will set the beginning of a 24hr time range. The endpoint will return all predictions for the area of the aoi in this timeframe.",
@@ -79,103 +121,604 @@ async def get_predictions_by_day(
         default=None,
         description="The minimum accuracy of the prediction to be included in the results lowest value: 0 (returning all data) | highest value: 100 (returning minimal data). For example: 50. Only for SEGMENTATION models",
     ),
+    format: PointFormat = Query(
+        PointFormat.JSON,
+        description="json (GeoJSON FeatureCollection) or binary (packed typed arrays, see app/services/binary_points.py)",
+    ),
+):
+    if format == PointFormat.BINARY:
+        name, payload, media_type = (
+            "predictions-by-day-and-aoi-binary",
+            predictions_by_day_binary_payload,
+            BINARY_MEDIA_TYPE,
+        )
+    else:
+        name, payload, media_type = (
+            "predictions-by-day-and-aoi",
+            predictions_by_day_payload,
+            "application/json",
+        )
+    body = await cached_response(
+        make_key(
+            name,
+            day=day,
+            aoi_id=aoi_id,
+            model_id=model_id,
+            accuracy_limit=accuracy_limit,
+        ),
+        (aoi_tag(aoi_id),),
+        payload,
+        day,
+        aoi_id,
+        model_id,
+        accuracy_limit,
+        request=request,
+    )
+    return Response(content=body, media_type=media_type)
+
+
+def _query_predictions_by_day(
+    session,
+    day: int,
+    aoi_id: int,
+    model_id: str,
+    accuracy_limit: int | None,
+    geometry_columns: Callable,
+):
+    """The model and the day's predictions in the AOI; geometry_columns maps
+    the geometry column to the columns to select."""
+    aoi = (
+        session.query(AOI)
+        .filter(AOI.id == aoi_id, AOI.is_deleted == False)  # noqa <E712>
+        .one_or_none()
+    )
+    if not aoi:
+        raise HTTPException(status_code=404, detail="AOI not found")
+
+    model = session.query(Model).filter(
+        Model.model_id == model_id).one_or_none()
+    if not model:
+        raise HTTPException(status_code=404, detail="Model not found")
+
+    if accuracy_limit is not None and model.type != ModelType.SEGMENTATION:
+        raise HTTPException(
+            status_code=400,
+            detail="Accuracy limit only applicable for segmentation models",
+        )
+
+    start_date = datetime.fromtimestamp(day)
+    end_date = start_date + timedelta(days=1)
+    archives = archives_covering(session, aoi_id, start_date, end_date)
+    archived_images = archived_image_ids(archives)
+
+    if facts_ready(session):
+        query = _prediction_facts_by_day(
+            session, model, aoi_id, start_date, end_date, accuracy_limit, geometry_columns
+        )
+        if archived_images:
+            query = query.filter(PredictionFact.image_id.notin_(archived_images))
+    else:
+        query = _joined_predictions_by_day(
+            session, model, aoi_id, start_date, end_date, accuracy_limit, geometry_columns
+        )
+        if archived_images:
+            query = query.filter(Image.id.notin_(archived_images))
+    # print("Generated SQL query:", str(query))
+    results = query.limit(DEFAULT_MAX_ROW_LIMIT).all()
+    if not archives:
+        return model, results
+
+    archived = sorted(
+        (
+            _ArchivedPrediction(*row)
+            for batch in read_archived(
+                archives,
+                live_job_ids(session, aoi_id, model.id),
+                start_date,
+                end_date,
+                list(_ArchivedPrediction._fields),
+                *_pixel_value_bounds(model, accuracy_limit),
+            )
+            for row in batch_rows(batch)
+        ),
+        key=attrgetter("timestamp"),
+    )
+    merged = heapq.merge(archived, results, key=attrgetter("timestamp"))
+    return model, list(islice(merged, DEFAULT_MAX_ROW_LIMIT))
+
+
+class _ArchivedPrediction(NamedTuple):
+    """A row from cold storage, with the attributes of the live rows."""
+
+    timestamp: datetime
+    lon: float
+    lat: float
+    pixel_value: int
+
+    @property
+    def geometry(self) -> str:
+        return json.dumps(point_geometry(self.lon, self.lat))
+
+
+def _pixel_value_bounds(model: Model, accuracy_limit: int | None) -> tuple:
+    """(min, max) pixel value the prediction routes serve; None is open."""
+    if model.type == ModelType.CLASSIFICATION:
+        # Only Marine Debris
+        return 1, 1
+    if accuracy_limit is not None:
+        return percent_to_accuracy(accuracy_limit), None
+    return None, None
+
+
+def _prediction_facts_by_day(
+    session,
+    model: Model,
+    aoi_id: int,
+    start_date: datetime,
+    end_date: datetime,
+    accuracy_limit: int | None,
+    geometry_columns: Callable,
+):
+    # One primary key range; facts are already clipped to the AOI and unique.
+    query = session.query(
+        PredictionFact.image_timestamp.label("timestamp"),
+        *geometry_columns(PredictionFact.geometry),
+        PredictionFact.pixel_value,
+    ).filter(
+        PredictionFact.aoi_id == aoi_id,
+        PredictionFact.model_id == model.id,
+        PredictionFact.day >= start_date.date(),
+        PredictionFact.day <= end_date.date(),
+        PredictionFact.image_timestamp >= start_date,
+        PredictionFact.image_timestamp < end_date,
+        live_facts(),
+    )
+
+    if accuracy_limit is not None:
+        query = query.filter(
+            PredictionFact.pixel_value >= percent_to_accuracy(accuracy_limit)
+        )
+
+    if model.type == ModelType.CLASSIFICATION:
+        # Only return Marine Debris
+        query = query.filter(PredictionFact.pixel_value == 1)
+
+    return query.order_by(PredictionFact.image_timestamp)
+
+
+def _joined_predictions_by_day(
+    session,
+    model: Model,
+    aoi_id: int,
+    start_date: datetime,
+    end_date: datetime,
+    accuracy_limit: int | None,
+    geometry_columns: Callable,
 ):
+    query = (
+        session.query(
+            AOI.id,
+            Image.timestamp,
+            Image.id,
+            *geometry_columns(PredictionVector.geometry),
+            PredictionVector.pixel_value,
+        )
+        .join(Job, Job.aoi_id == AOI.id)
+        .join(Image, Image.job_id == Job.id)
+        .join(PredictionRaster, PredictionRaster.image_id == Image.id)
+        .join(PredictionVector, PredictionVector.prediction_raster_id == PredictionRaster.id)
+        .filter(
+            Image.timestamp >= start_date,
+            Image.timestamp < end_date,
+            func.ST_Intersects(PredictionVector.geometry, AOI.geometry),
+            AOI.id == aoi_id,
+            Job.model_id == model.id,
+            Job.is_deleted == False,  # noqa <E712>
+        )
+        .group_by(
+            AOI.id,
+            Image.timestamp,
+            Image.id,
+            PredictionVector.geometry,
+            PredictionVector.pixel_value,
+        )
+    )
+
+    if accuracy_limit is not None:
+        max_pixel_value = percent_to_accuracy(accuracy_limit)
+        query = query.filter(
+            PredictionVector.pixel_value >= max_pixel_value,
+            # Skips rasters with no such pixel in the AOI before the vectors.
+            may_have_pixels_from(histogram_bucket(max_pixel_value), AOI.geometry),
+        )
+
+    if model.type == ModelType.CLASSIFICATION:
+        # Only return Marine Debris
+        query = query.filter(
+            PredictionVector.pixel_value == 1,
+            may_have_pixels_from(1, AOI.geometry),
+        )
+
+    return query.order_by(Image.timestamp)
+
+
+def _geojson_columns(geometry) -> tuple:
+    return (func.ST_AsGeoJSON(geometry).label("geometry"),)
+
+
+def predictions_by_day_payload(
+    day: int, aoi_id: int, model_id: str, accuracy_limit: int | None
+) -> bytes:
     session = Session()
     try:
-        aoi = session.query(AOI).filter(AOI.id == aoi_id).one_or_none()
-        if not aoi:
-            raise HTTPException(status_code=404, detail="AOI not found")
+        start_deadline(session, "predictions-by-day-and-aoi")
+        model, results = _query_predictions_by_day(
+            session,
+            day,
+            aoi_id,
+            model_id,
+            accuracy_limit,
+            _geojson_columns,
+        )
+    finally:
+        session.close()
 
-        model = session.query(Model).filter(
-            Model.model_id == model_id).one_or_none()
-        if not model:
-            raise HTTPException(status_code=404, detail="Model not found")
+    results_list = [
+        {
+            "type": "Feature",
+            "properties": {
+                "pixelValue": accuracy_limit_to_percent(row.pixel_value) if model.type == ModelType.SEGMENTATION else CLASSIFICATION_PIXEL_VALUE_CONSTANT,
+                "timestamp": row.timestamp.timestamp(),
+                "modelId": model.model_id,
+                "modelType": model.type.value,
+            },
+            "geometry": json.loads(row.geometry),
+        }
+        for row in results
+    ]
 
-        start_date = datetime.fromtimestamp(day)
-        end_date = start_date + timedelta(days=1)
+    results_dict = {"type": "FeatureCollection", "features": results_list}
+    return render_json(results_dict)
 
-        query = (
-            session.query(
-                AOI.id,
-                Image.timestamp,
-                Image.id,
-                Model.model_id,
-                Model.type.label("model_type"),
-                func.ST_AsGeoJSON(PredictionVector.geometry).label("geometry"),
-                PredictionVector.pixel_value,
-            )
-            .join(Job, Job.aoi_id == AOI.id)
+
+def predictions_by_day_binary_payload(
+    day: int, aoi_id: int, model_id: str, accuracy_limit: int | None
+) -> bytes:
+    session = Session()
+    try:
+        start_deadline(session, "predictions-by-day-and-aoi")
+        model, results = _query_predictions_by_day(
+            session,
+            day,
+            aoi_id,
+            model_id,
+            accuracy_limit,
+            lambda geometry: (
+                func.ST_X(geometry).label("lon"),
+                func.ST_Y(geometry).label("lat"),
+            ),
+        )
+    finally:
+        session.close()
+
+    with serialization_timer():
+        if model.type == ModelType.SEGMENTATION:
+            # Raw 0-255 values; value * value_scale is the JSON pixelValue.
+            values = [row.pixel_value for row in results]
+            value_scale = accuracy_limit_to_percent(1)
+        else:
+            values = [CLASSIFICATION_PIXEL_VALUE_CONSTANT] * len(results)
+            value_scale = 1.0
+        return encode_points(
+            [row.lon for row in results],
+            [row.lat for row in results],
+            values,
+            timestamps=[row.timestamp for row in results],
+            value_scale=value_scale,
+            properties={"modelId": model.model_id, "modelType": model.type.value},
+        )
+
+
+@register_warmer
+def _warm_latest_predictions(aoi_id: int):
+    """The newest day of every model for the AOI: what users open after a
+    job-completed notification."""
+    session = Session()
+    try:
+        latest_per_model = (
+            session.query(Model.model_id, func.max(Image.timestamp))
+            .join(Job, Job.model_id == Model.id)
             .join(Image, Image.job_id == Job.id)
-            .join(PredictionRaster, PredictionRaster.image_id == Image.id)
-            .join(PredictionVector, PredictionVector.prediction_raster_id == PredictionRaster.id)
-            .join(Model, Model.id == Job.model_id)
             .filter(
-                Image.timestamp >= start_date,
-                Image.timestamp < end_date,
-                func.ST_Intersects(PredictionVector.geometry, AOI.geometry),
-                AOI.id == aoi_id,
-                Model.model_id == model_id,
+                Job.aoi_id == aoi_id,
+                Job.is_deleted == False,  # noqa <E712>
             )
-            .group_by(
-                AOI.id,
-                Image.timestamp,
-                Image.id,
-                Model.model_id,
-                Model.type,
-                PredictionVector.geometry,
-                PredictionVector.pixel_value,
+            .group_by(Model.model_id)
+            .all()
+        )
+    finally:
+        session.close()
+
+    for model_id, latest in latest_per_model:
+        # Same day key the frontend takes from /images-by-day.
+        utc = latest.astimezone(timezone.utc)
+        day = int(datetime(utc.year, utc.month, utc.day, tzinfo=timezone.utc).timestamp())
+        args = (day, aoi_id, model_id, None)
+        yield (
+            make_key(
+                "predictions-by-day-and-aoi",
+                day=day,
+                aoi_id=aoi_id,
+                model_id=model_id,
+                accuracy_limit=None,
+            ),
+            (aoi_tag(aoi_id),),
+            predictions_by_day_payload,
+            args,
+        )
+
+
+@register_warmup
+def _warm_prediction_queries():
+    session = ReadSession()
+    try:
+        _images_by_day_query(session, -1).all()
+        _predictions_query(session, 0).all()
+    finally:
+        session.close()
+
+    session = Session()
+    try:
+        model = session.query(Model).first()
+        if model is None:
+            return
+        start_date = datetime.now()
+        end_date = start_date + timedelta(days=1)
+        by_day = _joined_predictions_by_day
+        if facts_ready(session):
+            by_day = _prediction_facts_by_day
+        by_day(
+            session, model, -1, start_date, end_date, None, _geojson_columns
+        ).limit(DEFAULT_MAX_ROW_LIMIT).all()
+    finally:
+        session.close()
+
+
+@router.get("/predictions/heatmap", tags=["Predictions"])
+async def get_predictions_heatmap(
+    request: Request,
+    aoi_id: int = Query(..., description="Id of the AOI"),
+    model_id: str = Query(..., description="Filter predictions based on model"),
+    start: datetime = Query(..., description="Start of the time range"),
+    end: datetime = Query(..., description="End of the time range"),
+    resolution: int = Query(
+        256,
+        ge=1,
+        le=HEATMAP_MAX_RESOLUTION,
+        description="Cells along the longer side of the AOI bbox",
+    ),
+    format: HeatmapFormat = Query(
+        HeatmapFormat.PNG,
+        description="png (colormapped image of the AOI bbox) or grid (float32 cell sums, packed as in app/services/binary_points.py)",
+    ),
+):
+    """Pixel values of all predictions in the time range, summed per cell."""
+    if start >= end:
+        raise HTTPException(
+            status_code=400, detail="The start must be before the end"
+        )
+    if format == HeatmapFormat.PNG and not HEATMAP_PNG_SUPPORTED:
+        raise HTTPException(
+            status_code=501, detail="PNG heatmaps need rio-tiler; use format=grid"
+        )
+    body = await cached_response(
+        make_key(
+            "predictions-heatmap",
+            aoi_id=aoi_id,
+            model_id=model_id,
+            start=start.isoformat(),
+            end=end.isoformat(),
+            resolution=resolution,
+            format=format.value,
+        ),
+        (aoi_tag(aoi_id),),
+        heatmap_payload,
+        aoi_id,
+        model_id,
+        start,
+        end,
+        resolution,
+        format,
+        request=request,
+    )
+    return Response(content=body, media_type=HEATMAP_MEDIA_TYPES[format])
+
+
+def heatmap_payload(
+    aoi_id: int,
+    model_id: str,
+    start: datetime,
+    end: datetime,
+    resolution: int,
+    heatmap_format: HeatmapFormat,
+) -> bytes:
+    session = ReadSession()
+    try:
+        start_deadline(session, "predictions-heatmap")
+        bbox = (
+            session.query(
+                func.ST_XMin(AOI.geometry),
+                func.ST_YMin(AOI.geometry),
+                func.ST_XMax(AOI.geometry),
+                func.ST_YMax(AOI.geometry),
             )
+            .filter(AOI.id == aoi_id, AOI.is_deleted == False)  # noqa <E712>
+            .one_or_none()
         )
+        if bbox is None:
+            raise HTTPException(status_code=404, detail="AOI not found")
+        model = session.query(Model).filter(Model.model_id == model_id).one_or_none()
+        if not model:
+            raise HTTPException(status_code=404, detail="Model not found")
+        bbox = tuple(bbox)
+        archives = archives_covering(session, aoi_id, start, end)
+        archived_images = archived_image_ids(archives)
 
-        if accuracy_limit is not None:
-            if model.type != ModelType.SEGMENTATION:
-                raise HTTPException(
-                    status_code=400,
-                    detail="Accuracy limit only applicable for segmentation models",
+        if facts_ready(session):
+            query = (
+                session.query(
+                    func.ST_X(PredictionFact.geometry),
+                    func.ST_Y(PredictionFact.geometry),
+                    PredictionFact.pixel_value,
                 )
-            max_pixel_value = percent_to_accuracy(accuracy_limit)
-            query = query.filter(
-                PredictionVector.pixel_value >= max_pixel_value)
-
+                .filter(
+                    PredictionFact.aoi_id == aoi_id,
+                    PredictionFact.model_id == model.id,
+                    PredictionFact.day >= start.date(),
+                    PredictionFact.day <= end.date(),
+                    PredictionFact.image_timestamp >= start,
+                    PredictionFact.image_timestamp < end,
+                    live_facts(),
+                )
+            )
+            pixel_value = PredictionFact.pixel_value
+            image_id = PredictionFact.image_id
+        else:
+            query = (
+                session.query(
+                    func.ST_X(PredictionVector.geometry),
+                    func.ST_Y(PredictionVector.geometry),
+                    PredictionVector.pixel_value,
+                )
+                .select_from(Job)
+                .join(Image, Image.job_id == Job.id)
+                .join(PredictionRaster, PredictionRaster.image_id == Image.id)
+                .join(
+                    PredictionVector,
+                    PredictionVector.prediction_raster_id == PredictionRaster.id,
+                )
+                .join(AOI, AOI.id == Job.aoi_id)
+                .filter(
+                    Job.aoi_id == aoi_id,
+                    Job.model_id == model.id,
+                    Job.is_deleted == False,  # noqa <E712>
+                    Image.timestamp >= start,
+                    Image.timestamp < end,
+                    func.ST_Intersects(PredictionVector.geometry, AOI.geometry),
+                )
+            )
+            pixel_value = PredictionVector.pixel_value
+            image_id = Image.id
         if model.type == ModelType.CLASSIFICATION:
-            # Only return Marine Debris
-            query = query.filter(PredictionVector.pixel_value == 1)
-
-        query = query.order_by(Image.timestamp).limit(DEFAULT_MAX_ROW_LIMIT)
-        # print("Generated SQL query:", str(query))
-        results = query.all()
-
-        results_list = [
-            {
-                "type": "Feature",
-                "properties": {
-                    "pixelValue": accuracy_limit_to_percent(row.pixel_value) if row.model_type == ModelType.SEGMENTATION else CLASSIFICATION_PIXEL_VALUE_CONSTANT,
-                    "timestamp": row.timestamp.timestamp(),
-                    "modelId": row.model_id,
-                    "modelType": row.model_type.value,
-                },
-                "geometry": json.loads(row.geometry),
-            }
-            for row in results
-        ]
+            # Only Marine Debris, as in /predictions-by-day-and-aoi
+            query = query.filter(pixel_value == 1)
+        if archived_images:
+            query = query.filter(image_id.notin_(archived_images))
 
-        results_dict = {"type": "FeatureCollection", "features": results_list}
-        return JSONResponse(content=results_dict)
+        archived = (
+            batch_rows(batch)
+            for batch in read_archived(
+                archives,
+                live_job_ids(session, aoi_id, model.id) if archives else [],
+                start,
+                end,
+                ["lon", "lat", "pixel_value"],
+                *_pixel_value_bounds(model, None),
+            )
+        )
+        # yield_per fetches through a server-side cursor, one batch at a time.
+        result = session.execute(
+            query.statement, execution_options={"yield_per": HEATMAP_BATCH_ROWS}
+        )
+        grid = accumulate(
+            chain(archived, result.partitions()), bbox, grid_shape(bbox, resolution)
+        )
     finally:
         session.close()
 
+    with serialization_timer():
+        if heatmap_format == HeatmapFormat.PNG:
+            return render_png(grid)
+        return encode_grid(
+            grid,
+            bbox,
+            properties={"modelId": model.model_id, "modelType": model.type.value},
+        )
+
 
 @router.get("/predictions", tags=["Predictions"])
-async def get_predictions(limit: int = DEFAULT_MAX_ROW_LIMIT):
+async def get_predictions(
+    request: Request,
+    limit: int = DEFAULT_MAX_ROW_LIMIT,
+    format: PointFormat = Query(
+        PointFormat.JSON,
+        description="json (GeoJSON FeatureCollection) or binary (packed typed arrays, see app/services/binary_points.py)",
+    ),
+):
     limit = min(
         limit, DEFAULT_MAX_ROW_LIMIT
     )  # DEFAULT_MAX_ROW_LIMIT will always be the max limit
-    session = Session()
-    query = session.query(
-        func.ST_AsGeoJSON(PredictionVector.geometry),
-        PredictionVector.pixel_value,
-    ).limit(limit)
-    results = query.all()
+    if format == PointFormat.BINARY:
+        body = await run_cancellable(request, predictions_binary_payload, limit)
+        return Response(content=body, media_type=BINARY_MEDIA_TYPE)
+    return await run_cancellable(request, predictions_payload, limit)
+
+
+def _served_vectors(archived_images: list[int]):
+    """SQL condition excluding the vectors of soft-deleted jobs and of the
+    given archived images, which the archive serves."""
+    hidden = Job.is_deleted == True  # noqa <E712>
+    if archived_images:
+        hidden = hidden | Image.id.in_(archived_images)
+    return PredictionVector.prediction_raster_id.notin_(
+        select(PredictionRaster.id)
+        .join(Image, Image.id == PredictionRaster.image_id)
+        .join(Job, Job.id == Image.job_id)
+        .where(hidden)
+    )
+
+
+def _predictions_query(session, limit: int, archived_images: list[int] = ()):
+    return (
+        session.query(
+            func.ST_AsGeoJSON(PredictionVector.geometry),
+            PredictionVector.pixel_value,
+        )
+        .filter(_served_vectors(archived_images))
+        .limit(limit)
+    )
+
+
+def _archived_points(session, archives: list, limit: int) -> list[tuple]:
+    """Up to `limit` archived (lon, lat, pixel_value) rows of jobs that are
+    not deleted, which fill /predictions up once the live rows run out."""
+    if limit <= 0 or not archives:
+        return []
+    job_ids = session.scalars(
+        select(Job.id).where(
+            Job.aoi_id.in_(sorted({archive.aoi_id for archive in archives})),
+            Job.is_deleted == False,  # noqa <E712>
+        )
+    ).all()
+    points = []
+    for batch in read_archived(
+        archives, job_ids, None, None, ["lon", "lat", "pixel_value"], inside_aoi=False
+    ):
+        points.extend(batch_rows(batch.slice(0, limit - len(points))))
+        if len(points) >= limit:
+            break
+    return points
+
+
+def predictions_payload(limit: int) -> str:
+    session = ReadSession()
+    try:
+        start_deadline(session, "predictions")
+        archives = all_archives(session)
+        results = _predictions_query(session, limit, unpurged_image_ids(archives)).all()
+        archived = _archived_points(session, archives, limit - len(results))
+    finally:
+        session.close()
 
     results_list = [
         {
@@ -185,15 +728,46 @@ async def get_predictions(limit: int = DEFAULT_MAX_ROW_LIMIT):
             "geometry": json.loads(row[0]),
         }
         for row in results
+    ] + [
+        {
+            "type": "Feature",
+            "properties": {"pixelValue": pixel_value},
+            "geometry": point_geometry(lon, lat),
+        }
+        for lon, lat, pixel_value in archived
     ]
 
     results_dict = {"type": "FeatureCollection", "features": results_list}
 
-    results_json = json.dumps(results_dict, ensure_ascii=False)
-    session.close()
+    with serialization_timer():
+        results_json = json.dumps(results_dict, ensure_ascii=False)
     return results_json
 
 
+def predictions_binary_payload(limit: int) -> bytes:
+    session = ReadSession()
+    try:
+        start_deadline(session, "predictions")
+        archives = all_archives(session)
+        results = (
+            session.query(
+                func.ST_X(PredictionVector.geometry),
+                func.ST_Y(PredictionVector.geometry),
+                PredictionVector.pixel_value,
+            )
+            .filter(_served_vectors(unpurged_image_ids(archives)))
+            .limit(limit)
+            .all()
+        )
+        results += _archived_points(session, archives, limit - len(results))
+    finally:
+        session.close()
+
+    with serialization_timer():
+        lon, lat, values = zip(*results) if results else ((), (), ())
+        return encode_points(lon, lat, values)
+
+
 @router.post("/predictions", tags=["Predictions"])
 async def run_prediction_jobs(
     job_ids: list[int] = Query(
@@ -209,7 +783,11 @@ async def run_prediction_jobs(
     try:
         results = []
         for job_id in job_ids:
-            job = session.query(Job).filter(Job.id == job_id).one_or_none()
+            job = (
+                session.query(Job)
+                .filter(Job.id == job_id, Job.is_deleted == False)  # noqa <E712>
+                .one_or_none()
+            )
             if not job:
                 raise HTTPException(
                     status_code=404, detail=f"Job with ID {job_id} not found"
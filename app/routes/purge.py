@@ -0,0 +1,16 @@
+from fastapi import APIRouter, Depends, HTTPException
+
+from app.db.connect import Session, get_db
+from app.db.models import Purge
+from app.services.purge import purge_status
+
+router = APIRouter()
+
+
+@router.get("/purges/{purge_id}", tags=["Purges"])
+async def get_purge(purge_id: int, db: Session = Depends(get_db)):
+    """Progress of a DELETE /jobs/{id} or DELETE /aoi/{id}."""
+    purge = db.get(Purge, purge_id)
+    if purge is None:
+        raise HTTPException(status_code=404, detail="Purge not found")
+    return purge_status(purge)
@@ -118,11 +118,10 @@ class SatelliteCreate(BaseModel):
 def create_satellite(satellite: SatelliteCreate, db: Session = Depends(get_db)):
     db_satellite = Satellite(name=satellite.name)
     db.add(db_satellite)
-    db.commit()
-    db.refresh(db_satellite)
+    db.flush()
 
-    for band in satellite.bands:
-        db_band = Band(
+    db_bands = [
+        Band(
             satellite_id=db_satellite.id,
             index=band.index,
             name=band.name,
@@ -130,10 +129,14 @@ def create_satellite(satellite: SatelliteCreate, db: Session = Depends(get_db)):
             resolution=band.resolution,
             wavelength=band.wavelength,
         )
-        db.add(db_band)
+        for band in satellite.bands
+    ]
+    db.add_all(db_bands)
+    db.flush()
 
-    db.commit()
-    return json.dumps(
+    # Serialized before the commit expires the objects: reading them after
+    # it would reload the satellite and lazy-load its bands.
+    json_satellite = json.dumps(
         {
             "id": db_satellite.id,
             "name": db_satellite.name,
@@ -145,8 +148,10 @@ def create_satellite(satellite: SatelliteCreate, db: Session = Depends(get_db)):
                     "resolution": band.resolution,
                     "wavelength": band.wavelength,
                 }
-                for band in db_satellite.bands
+                for band in db_bands
             ],
         },
         ensure_ascii=False,
     )
+    db.commit()
+    return json_satellite
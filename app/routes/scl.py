@@ -1,11 +1,14 @@
 import json
 from datetime import datetime, timedelta, timezone
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request
 from sqlalchemy import and_, func
 
-from app.db.connect import Session
+from app.core.metrics import serialization_timer
+from app.db.connect import ReadSession
+from app.db.deadline import run_cancellable, start_deadline
 from app.db.models import AOI, Image, Job, SceneClassificationVector
+from app.services.warmup import register_warmup
 from app.types.helpers import SCL
 
 router = APIRouter()
@@ -16,6 +19,7 @@ scl_description = "Classification values to filter by:\n" + "\n".join(
 
 @router.get("/scl", tags=["SCL"])
 async def scl(
+    request: Request,
     classification: list[SCL] = Query(
         default=None,
         description=scl_description,
@@ -25,8 +29,6 @@ async def scl(
         default=None, description="Timestamp to filter by (ISO format)"
     ),
 ):
-    session = Session()
-
     try:
         if timestamp:
             timestamp_dt = datetime.fromisoformat(timestamp)
@@ -40,10 +42,70 @@ async def scl(
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid timestamp format")
 
-    aoi_in_db = session.query(AOI).filter_by(id=aoi_id).first()
+    return await run_cancellable(
+        request, scl_payload, classification, aoi_id, start_of_day, end_of_day
+    )
+
+
+def scl_payload(
+    classification: list[SCL] | None,
+    aoi_id: int | None,
+    start_of_day: datetime | None,
+    end_of_day: datetime | None,
+) -> str:
+    session = ReadSession()
+    try:
+        start_deadline(session, "scl")
+        results = _query_scl(session, classification, aoi_id, start_of_day, end_of_day)
+    finally:
+        session.close()
+
+    if not results:
+        raise HTTPException(status_code=404, detail="No SCL data found for query")
+
+    results_list = [
+        {
+            "type": "Feature",
+            "geometry": json.loads(result[0]),
+            "properties": {
+                "classification": SCL(
+                    result.pixel_value
+                ).name,  # Converting pixel value to enum name
+                "image_id": result.image_id,
+                "timestamp": result.timestamp.isoformat(),
+                "aoi_id": result.aoi_id,
+            },
+        }
+        for result in results
+    ]
+
+    results_dict = {"type": "FeatureCollection", "features": results_list}
+
+    with serialization_timer():
+        results_json = json.dumps(results_dict, ensure_ascii=False)
+    return results_json
+
+
+def _query_scl(
+    session,
+    classification: list[SCL] | None,
+    aoi_id: int | None,
+    start_of_day: datetime | None,
+    end_of_day: datetime | None,
+):
+    aoi_in_db = session.query(AOI).filter_by(id=aoi_id, is_deleted=False).first()
     if not aoi_in_db:
         raise HTTPException(status_code=404, detail=f"No AOI found for ID: {aoi_id}")
+    return _scl_query(session, classification, aoi_id, start_of_day, end_of_day).all()
+
 
+def _scl_query(
+    session,
+    classification: list[SCL] | None,
+    aoi_id: int,
+    start_of_day: datetime | None,
+    end_of_day: datetime | None,
+):
     query = (
         session.query(
             func.ST_AsGeoJSON(SceneClassificationVector.geometry),
@@ -55,7 +117,10 @@ async def scl(
         .select_from(SceneClassificationVector)
         .join(Image)
         .join(Job)
-        .filter(Job.aoi_id == aoi_id)
+        .filter(
+            Job.aoi_id == aoi_id,
+            Job.is_deleted == False,  # noqa <E712>
+        )
     )
 
     if start_of_day and end_of_day:
@@ -66,28 +131,16 @@ async def scl(
     if classification:
         query = query.filter(SceneClassificationVector.pixel_value.in_(classification))
 
-    results = query.all()
+    return query
 
-    if not results:
-        raise HTTPException(status_code=404, detail="No SCL data found for query")
-    results_list = [
-        {
-            "type": "Feature",
-            "geometry": json.loads(result[0]),
-            "properties": {
-                "classification": SCL(
-                    result.pixel_value
-                ).name,  # Converting pixel value to enum name
-                "image_id": result.image_id,
-                "timestamp": result.timestamp.isoformat(),
-                "aoi_id": result.aoi_id,
-            },
-        }
-        for result in results
-    ]
-
-    results_dict = {"type": "FeatureCollection", "features": results_list}
 
-    results_json = json.dumps(results_dict, ensure_ascii=False)
-    session.close()
-    return results_json
+@register_warmup
+def _warm_scl_queries():
+    start_of_day = datetime.now(timezone.utc)
+    session = ReadSession()
+    try:
+        _scl_query(
+            session, None, -1, start_of_day, start_of_day + timedelta(days=1)
+        ).all()
+    finally:
+        session.close()
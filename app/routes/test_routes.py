@@ -2,11 +2,26 @@ import json
 
 from fastapi.testclient import TestClient
 
+from app.db.connect import Session
+from app.db.models import AOI, Satellite
 from app.main import app
 
 client = TestClient(app)
 
 
+def _any_aoi_id() -> int:
+    db = Session()
+    try:
+        return (
+            db.query(AOI.id)
+            .filter(AOI.is_deleted == False)  # noqa <E712>
+            .limit(1)
+            .scalar()
+        )
+    finally:
+        db.close()
+
+
 def test_get_predictions_with_invalid_query():
     response = client.get("/predictions?limit=Hello")
     assert response.status_code == 422
@@ -43,3 +58,67 @@ def test_get_predictions():
             assert len(coordinate) == 2
             assert isinstance(coordinate[0], float)
             assert isinstance(coordinate[1], float)
+
+
+def test_delete_unknown_job_and_aoi():
+    missing_id = 2**31 - 1
+    assert client.delete(f"/jobs/{missing_id}").status_code == 404
+    assert client.delete(f"/aoi/{missing_id}").status_code == 404
+    assert client.get(f"/purges/{missing_id}").status_code == 404
+
+
+def test_get_model_runs_one_query(query_budget):
+    with query_budget(max_queries=1):
+        response = client.get("/model")
+    assert response.status_code == 200
+
+
+def test_create_satellite_queries(query_budget):
+    satellite = {
+        "name": "query-budget-test",
+        "bands": [
+            {
+                "index": index,
+                "name": f"B{index}",
+                "description": "",
+                "resolution": 10.0,
+                "wavelength": "",
+            }
+            for index in range(1, 4)
+        ],
+    }
+    try:
+        # One INSERT for the satellite and one for all of its bands.
+        with query_budget(max_queries=2):
+            response = client.post("/satellites/", json=satellite)
+        assert response.status_code == 200
+        created = json.loads(response.json())
+        assert [band["index"] for band in created["bands"]] == [1, 2, 3]
+    finally:
+        db = Session()
+        try:
+            for row in db.query(Satellite).filter(Satellite.name == satellite["name"]):
+                db.delete(row)
+            db.commit()
+        finally:
+            db.close()
+
+
+def test_get_jobs_queries(query_budget):
+    # Data version, deadline, AOI, archives, live rows and archived images.
+    with query_budget(max_queries=6):
+        response = client.get(f"/jobs?aoiId={_any_aoi_id()}")
+    assert response.status_code == 200
+
+
+def test_get_aoi_queries(query_budget):
+    # Data version, deadline and the AOI query.
+    with query_budget(max_queries=3):
+        response = client.get(f"/aoi?id={_any_aoi_id()}")
+    assert response.status_code == 200
+
+
+def test_not_ready_before_warm_up():
+    # The lifespan, and with it the warm-up, only runs inside `with client`.
+    assert client.get("/health").status_code == 200
+    assert client.get("/ready").status_code == 503
@@ -0,0 +1,88 @@
+import re
+
+from fastapi import APIRouter, Header, HTTPException, Response
+from starlette.concurrency import run_in_threadpool
+
+from app.services.storage import ObjectNotFound
+from app.services.tile_archive import MAX_ZOOM, read_archive_range, read_tile
+
+try:
+    from app.services.raster_tiles import RasterNotFound, render_tile
+except ImportError:  # pragma: no cover - optional dependency
+    render_tile = None
+
+router = APIRouter(prefix="/tiles")
+
+# Archives and rasters of completed jobs only change if the job is deleted.
+TILE_CACHE_CONTROL = "public, max-age=86400"
+RASTER_MAX_ZOOM = 22
+_RANGE = re.compile(r"bytes=(\d+)-(\d*)$")
+
+
+def _check_tile_coords(z: int, x: int, y: int, max_zoom: int):
+    if not 0 <= z <= max_zoom or not (0 <= x < 2**z and 0 <= y < 2**z):
+        raise HTTPException(status_code=404, detail="Tile out of range")
+
+
+@router.get("/jobs/{job_id}/{z}/{x}/{y}.mvt", tags=["Tiles"])
+async def get_job_tile(job_id: int, z: int, x: int, y: int):
+    """Vector tile of a completed job, read from its PMTiles archive."""
+    _check_tile_coords(z, x, y, MAX_ZOOM)
+    try:
+        tile = await run_in_threadpool(read_tile, job_id, z, x, y)
+    except ObjectNotFound:
+        raise HTTPException(status_code=404, detail="No tile archive for this job")
+    if tile is None:
+        return Response(status_code=204, headers={"Cache-Control": TILE_CACHE_CONTROL})
+    return Response(
+        content=tile,
+        media_type="application/vnd.mapbox-vector-tile",
+        headers={"Content-Encoding": "gzip", "Cache-Control": TILE_CACHE_CONTROL},
+    )
+
+
+@router.get("/rasters/{prediction_raster_id}/{z}/{x}/{y}.png", tags=["Tiles"])
+async def get_raster_tile(prediction_raster_id: int, z: int, x: int, y: int):
+    """Colormapped PNG tile of a prediction raster."""
+    if render_tile is None:
+        raise HTTPException(status_code=501, detail="Raster tiles need rio-tiler")
+    _check_tile_coords(z, x, y, RASTER_MAX_ZOOM)
+    try:
+        png = await run_in_threadpool(render_tile, prediction_raster_id, z, x, y)
+    except RasterNotFound:
+        raise HTTPException(status_code=404, detail="Prediction raster not found")
+    if png is None:
+        return Response(status_code=204, headers={"Cache-Control": TILE_CACHE_CONTROL})
+    return Response(
+        content=png,
+        media_type="image/png",
+        headers={"Cache-Control": TILE_CACHE_CONTROL},
+    )
+
+
+@router.get("/jobs/{job_id}.pmtiles", tags=["Tiles"])
+async def get_job_archive(job_id: int, range: str | None = Header(default=None)):
+    """The archive itself, with HTTP range requests for PMTiles clients."""
+    match = _RANGE.match(range.strip()) if range else None
+    start = int(match.group(1)) if match else 0
+    end = int(match.group(2)) if match and match.group(2) else None
+    if end is not None and end < start:
+        raise HTTPException(status_code=416, detail="Invalid range")
+    try:
+        body, size = await run_in_threadpool(read_archive_range, job_id, start, end)
+    except ObjectNotFound:
+        raise HTTPException(status_code=404, detail="No tile archive for this job")
+    if start >= size:
+        raise HTTPException(
+            status_code=416,
+            detail="Range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+
+    headers = {"Accept-Ranges": "bytes", "Cache-Control": TILE_CACHE_CONTROL}
+    if match is None:
+        return Response(body, media_type="application/vnd.pmtiles", headers=headers)
+    headers["Content-Range"] = f"bytes {start}-{start + len(body) - 1}/{size}"
+    return Response(
+        body, status_code=206, media_type="application/vnd.pmtiles", headers=headers
+    )
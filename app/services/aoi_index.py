@@ -0,0 +1,195 @@
+"""In-memory spatial index of the AOIs for the viewport routes.
+
+/aoi-centers and /aoi?bbox run on every map pan, and each call used to
+intersect the bbox with every AOI in PostGIS, aggregate the AOI's images
+and reproject its polygon to compute the area. There are few AOIs and
+they rarely change, so the index keeps each one with its precomputed
+stats and answers the bbox with a shapely STRtree instead.
+
+The route module registers a loader (see routes/aoi.py) that reads the
+entries of the given AOIs, or of all of them. While the AOI change
+listener is connected, notified AOIs are reloaded on the next lookup.
+Without it, a lookup compares the data version with the one the index was
+built at; when they differ the index is rebuilt in the background and
+lookup returns None, meaning the caller has to query the database.
+"""
+
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Callable, Iterable
+
+import shapely
+from shapely.geometry import box
+
+from app.config.config import AOI_INDEX_ENABLED
+from app.db.connect import Session
+from app.db.versioning import get_data_version
+from app.types.helpers import BoundingBox
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class IndexedAOI:
+    id: int
+    name: str
+    created_at: object
+    start_date: object
+    end_date: object
+    image_count: int
+    # At the default plastic threshold of /aoi
+    plastic_timestamp_count: int
+    geometry: str  # GeoJSON
+    centroid: str  # GeoJSON
+    bbox: list
+    area_km2: float
+    shape: shapely.Geometry
+
+
+# Loads the entries of the given AOI ids, or of all AOIs for None; deleted
+# AOIs are left out.
+Loader = Callable[[list | None], list[IndexedAOI]]
+
+
+def _read_data_version() -> int:
+    session = Session()
+    try:
+        return get_data_version(session)
+    finally:
+        session.close()
+
+
+class AOIIndex:
+    def __init__(self):
+        self._load: Loader | None = None
+        self._lock = threading.Lock()
+        self._entries: dict[int, IndexedAOI] = {}
+        self._order: list[IndexedAOI] = []
+        self._tree: shapely.STRtree | None = None
+        self._version: int | None = None
+        self._changed: set[int] = set()
+        self._listening = False
+        self._reloading = False
+        # Bumped whenever a load in flight may miss changes.
+        self._generation = 0
+
+    def loader(self, load: Loader) -> Loader:
+        self._load = load
+        return load
+
+    def listen(self):
+        """Called when the change listener (re)connects: trust its
+        notifications from now on, after a full reload since some may have
+        been missed."""
+        with self._lock:
+            self._listening = True
+            self._version = None
+            self._generation += 1
+
+    def stop_listening(self):
+        with self._lock:
+            self._listening = False
+
+    def mark_changed(self, aoi_ids: Iterable[int]):
+        """Reload these AOIs on the next lookup."""
+        with self._lock:
+            self._changed.update(aoi_ids)
+
+    def reset(self):
+        with self._lock:
+            self._entries = {}
+            self._order = []
+            self._tree = None
+            self._version = None
+            self._changed = set()
+            self._generation += 1
+
+    def lookup(self, bbox: BoundingBox) -> list[IndexedAOI] | None:
+        """The AOIs intersecting bbox ordered by id, or None when the index
+        cannot answer and the caller should query the database."""
+        if not AOI_INDEX_ENABLED or self._load is None:
+            return None
+        try:
+            with self._lock:
+                listening = self._listening
+                loaded = self._version is not None
+            if listening and loaded:
+                self._refresh_changed()
+            elif not loaded or _read_data_version() != self._version:
+                self._reload_in_background()
+                return None
+        except Exception:
+            logger.exception("AOI index lookup failed")
+            self.reset()
+            return None
+        return self._search(bbox)
+
+    def reload(self):
+        """Rebuild the index from all AOIs."""
+        with self._lock:
+            self._changed = set()
+            generation = self._generation
+        # Read first: a change committed during the load makes it stale again.
+        version = _read_data_version()
+        entries = self._load(None)
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries = {entry.id: entry for entry in entries}
+            self._rebuild()
+            self._version = version
+        logger.info("AOI index loaded %s AOIs", len(entries))
+
+    def _refresh_changed(self):
+        with self._lock:
+            changed, self._changed = self._changed, set()
+        if not changed:
+            return
+        try:
+            entries = self._load(sorted(changed))
+        except Exception:
+            self.mark_changed(changed)
+            raise
+        with self._lock:
+            for aoi_id in changed:
+                self._entries.pop(aoi_id, None)
+            self._entries.update((entry.id, entry) for entry in entries)
+            self._rebuild()
+
+    def _reload_in_background(self):
+        with self._lock:
+            if self._reloading:
+                return
+            self._reloading = True
+        threading.Thread(
+            target=self._background_reload, name="aoi-index-reload", daemon=True
+        ).start()
+
+    def _background_reload(self):
+        try:
+            self.reload()
+        except Exception:
+            logger.exception("Loading the AOI index failed")
+        finally:
+            with self._lock:
+                self._reloading = False
+
+    def _rebuild(self):
+        self._order = sorted(self._entries.values(), key=lambda entry: entry.id)
+        self._tree = (
+            shapely.STRtree([entry.shape for entry in self._order])
+            if self._order
+            else None
+        )
+
+    def _search(self, bbox: BoundingBox) -> list[IndexedAOI]:
+        area = box(bbox.min_x, bbox.min_y, bbox.max_x, bbox.max_y)
+        with self._lock:
+            if self._tree is None:
+                return []
+            hits = self._tree.query(area, predicate="intersects")
+            return [self._order[i] for i in sorted(hits)]
+
+
+aoi_index = AOIIndex()
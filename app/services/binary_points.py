@@ -0,0 +1,117 @@
+"""Packed typed-array encoding of prediction points for WebGL clients.
+
+Layout, all little-endian:
+
+    uint32 header_length
+    header            UTF-8 JSON, space-padded to a multiple of 4 bytes
+    data              the arrays listed in header["arrays"]
+
+Every array entry gives its name, type (a JS typed-array element type),
+offset in bytes from the start of `data` and its length in elements, so a
+client can view the buffer without copying, e.g.
+`new Float32Array(buffer, dataStart + offset, length)`. Offsets are 4-byte
+aligned.
+"""
+
+import enum
+import json
+import struct
+
+import numpy as np
+
+MEDIA_TYPE = "application/octet-stream"
+FORMAT_VERSION = 1
+
+_TYPE_NAMES = {
+    np.dtype("<f4"): "float32",
+    np.dtype("<u4"): "uint32",
+    np.dtype("u1"): "uint8",
+}
+
+
+class PointFormat(str, enum.Enum):
+    JSON = "json"
+    BINARY = "binary"
+
+
+def _pad(data: bytes, filler: bytes = b"\0") -> bytes:
+    return data + filler * (-len(data) % 4)
+
+
+def encode_points(
+    lon,
+    lat,
+    values,
+    timestamps=None,
+    value_scale: float = 1.0,
+    properties: dict | None = None,
+) -> bytes:
+    """Pack point columns; timestamps are datetimes, sent as uint32 offsets.
+
+    `values` must already fit a uint8; `value * value_scale` gives the value
+    the JSON format reports.
+    """
+    arrays = [
+        ("lon", np.asarray(lon, dtype="<f4")),
+        ("lat", np.asarray(lat, dtype="<f4")),
+    ]
+    header = {
+        "version": FORMAT_VERSION,
+        "count": len(arrays[0][1]),
+        "value_scale": value_scale,
+        "properties": properties or {},
+    }
+    if timestamps is not None:
+        seconds = np.fromiter(
+            (timestamp.timestamp() for timestamp in timestamps),
+            dtype=np.int64,
+            count=len(timestamps),
+        )
+        base = int(seconds.min()) if len(seconds) else 0
+        header["timestamp_base"] = base
+        arrays.append(("timestamp_offset", (seconds - base).astype("<u4")))
+    # uint8 last, so no padding is needed between arrays.
+    arrays.append(("value", np.asarray(values, dtype="u1")))
+    return pack_arrays(header, arrays)
+
+
+def pack_arrays(header: dict, arrays: list[tuple[str, np.ndarray]]) -> bytes:
+    """Header plus arrays in the layout above; decode with decode_points.
+
+    Arrays must have 4-byte element types, except for a last uint8 one.
+    """
+    offset = 0
+    header["arrays"] = []
+    for name, array in arrays:
+        header["arrays"].append(
+            {
+                "name": name,
+                "type": _TYPE_NAMES[array.dtype],
+                "offset": offset,
+                "length": len(array),
+            }
+        )
+        offset += array.nbytes
+
+    header_bytes = _pad(json.dumps(header).encode(), b" ")
+    return b"".join(
+        [struct.pack("<I", len(header_bytes)), header_bytes]
+        + [array.tobytes() for _, array in arrays]
+    )
+
+
+def decode_points(data: bytes) -> tuple[dict, dict]:
+    """Inverse of encode_points: (header, {name: numpy array})."""
+    (header_length,) = struct.unpack_from("<I", data)
+    header = json.loads(data[4 : 4 + header_length])
+    data_start = 4 + header_length
+    arrays = {
+        entry["name"]: np.frombuffer(
+            data,
+            dtype=np.dtype(entry["type"]).newbyteorder("<"),
+            count=entry["length"],
+            offset=data_start + entry["offset"],
+        )
+        for entry in header["arrays"]
+    }
+    return header, arrays
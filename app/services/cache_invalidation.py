@@ -0,0 +1,159 @@
+import logging
+import select
+import threading
+from typing import Callable, Iterable
+
+from fastapi import HTTPException
+
+from app.config.config import RESPONSE_CACHE_ENABLED
+from app.core.conditional import read_data_version
+from app.db.connect import engine
+from app.db.notifications import AOI_CHANGED_CHANNEL, TILE_ARCHIVE_CHANGED_CHANNEL
+from app.db.versioning import DATA_VERSION_SQL
+from app.services.aoi_index import aoi_index
+from app.services.response_cache import (
+    ALL_AOIS_TAG,
+    aoi_tag,
+    compute_and_store,
+    response_cache,
+)
+from app.services.tile_archive import archive_heads
+
+logger = logging.getLogger(__name__)
+
+POLL_SECONDS = 5
+RECONNECT_SECONDS = 10
+
+# A warmer yields (key, tags, payload function, args) for one AOI.
+Warmer = Callable[[int], Iterable[tuple]]
+_warmers: list[Warmer] = []
+
+
+def register_warmer(warmer: Warmer) -> Warmer:
+    _warmers.append(warmer)
+    return warmer
+
+
+# In-process caches of optional modules (raster tiles) that may only cache
+# while the listener runs: they provide listen(), stop_listening() and
+# mark_changed(aoi_ids), like the AOI index.
+_aoi_caches: list = []
+
+
+def register_aoi_cache(cache):
+    _aoi_caches.append(cache)
+    return cache
+
+
+def warm_aois(aoi_ids: Iterable[int]):
+    """Recompute the expensive responses for the given AOIs into the cache."""
+    done = set()
+    # Read before any of the computations, so no entry claims a newer version.
+    version = read_data_version()
+    for aoi_id in aoi_ids:
+        for warmer in _warmers:
+            try:
+                entries = list(warmer(aoi_id))
+            except Exception:
+                logger.exception("Listing warm-up entries for AOI %s failed", aoi_id)
+                continue
+            for key, tags, fn, args in entries:
+                if key in done:
+                    continue
+                done.add(key)
+                try:
+                    compute_and_store(key, tags, fn, *args, version=version)
+                except HTTPException:
+                    # e.g. the AOI was deleted; nothing to warm
+                    pass
+                except Exception:
+                    logger.exception("Warming %s failed", key)
+
+
+class AOIChangeListener(threading.Thread):
+    """LISTENs for AOI change notifications, evicts and re-warms the cache.
+
+    Also drops the cached heads of rebuilt or deleted tile archives, and the
+    entries of changed AOIs in the registered in-process caches.
+    """
+
+    def __init__(self):
+        super().__init__(name="aoi-change-listener", daemon=True)
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                self._listen()
+            except Exception:
+                logger.exception("AOI change listener lost its connection")
+            response_cache.disable()
+            aoi_index.stop_listening()
+            archive_heads.stop_listening()
+            for cache in _aoi_caches:
+                cache.stop_listening()
+            self._stop_event.wait(RECONNECT_SECONDS)
+
+    def _listen(self):
+        # A dedicated connection, detached so it does not count against the pool.
+        connection = engine.raw_connection()
+        connection.detach()
+        dbapi_connection = connection.dbapi_connection
+        try:
+            dbapi_connection.autocommit = True
+            with dbapi_connection.cursor() as cursor:
+                cursor.execute(f"LISTEN {AOI_CHANGED_CHANNEL}")
+                cursor.execute(f"LISTEN {TILE_ARCHIVE_CHANGED_CHANNEL}")
+            # Anything cached before this point may have missed a notification.
+            response_cache.disable()
+            if RESPONSE_CACHE_ENABLED:
+                response_cache.enable()
+            archive_heads.stop_listening()
+            archive_heads.listen()
+            aoi_index.listen()
+            for cache in _aoi_caches:
+                cache.stop_listening()
+                cache.listen()
+            logger.info(
+                "Listening for %s and %s notifications",
+                AOI_CHANGED_CHANNEL,
+                TILE_ARCHIVE_CHANGED_CHANNEL,
+            )
+
+            while not self._stop_event.is_set():
+                readable, _, _ = select.select([dbapi_connection], [], [], POLL_SECONDS)
+                if readable:
+                    dbapi_connection.poll()
+                # Read on this connection, the notifications of all changes
+                # up to the version have arrived once the query returns.
+                with dbapi_connection.cursor() as cursor:
+                    cursor.execute(DATA_VERSION_SQL)
+                    (version,) = cursor.fetchone()
+                aoi_ids, job_ids = set(), set()
+                while dbapi_connection.notifies:
+                    notification = dbapi_connection.notifies.pop(0)
+                    try:
+                        changed_id = int(notification.payload)
+                    except ValueError:
+                        continue
+                    if notification.channel == TILE_ARCHIVE_CHANGED_CHANNEL:
+                        job_ids.add(changed_id)
+                    else:
+                        aoi_ids.add(changed_id)
+                if job_ids:
+                    archive_heads.forget(job_ids)
+                if aoi_ids:
+                    aoi_index.mark_changed(aoi_ids)
+                    for cache in _aoi_caches:
+                        cache.mark_changed(aoi_ids)
+                    response_cache.invalidate(
+                        {ALL_AOIS_TAG} | {aoi_tag(aoi_id) for aoi_id in aoi_ids}
+                    )
+                response_cache.mark_covered(version)
+                if aoi_ids:
+                    warm_aois(sorted(aoi_ids))
+        finally:
+            dbapi_connection.close()
@@ -0,0 +1,120 @@
+"""Columnar (Arrow IPC / GeoParquet) encoding of streamed prediction rows.
+
+Rows come from a server-side cursor in partitions and are turned into
+record batches column by column; each batch is encoded and handed to the
+client before the next partition is fetched.
+"""
+
+import enum
+import json
+from typing import Iterable, Iterator
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+BATCH_ROWS = 50_000
+
+
+class ExportFormat(str, enum.Enum):
+    GEOPARQUET = "geoparquet"
+    ARROW = "arrow"
+
+
+MEDIA_TYPES = {
+    ExportFormat.GEOPARQUET: "application/vnd.apache.parquet",
+    ExportFormat.ARROW: "application/vnd.apache.arrow.stream",
+}
+FILE_EXTENSIONS = {
+    ExportFormat.GEOPARQUET: "parquet",
+    ExportFormat.ARROW: "arrows",
+}
+
+# Column order matches the SELECT list of the export query.
+PREDICTION_SCHEMA = pa.schema(
+    [
+        ("lon", pa.float64()),
+        ("lat", pa.float64()),
+        ("pixel_value", pa.int32()),
+        ("timestamp", pa.timestamp("us")),
+        ("image_id", pa.int32()),
+        ("geometry", pa.binary()),
+    ]
+)
+
+# GeoParquet 1.0 column metadata; no "crs" means OGC:CRS84 (lon/lat WGS84).
+GEO_METADATA = {
+    "version": "1.0.0",
+    "primary_column": "geometry",
+    "columns": {"geometry": {"encoding": "WKB", "geometry_types": ["Point"]}},
+}
+
+
+class _ChunkSink:
+    """Write-only file that hands out what was written since the last take."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def record_batches(partitions: Iterable[list]) -> Iterator[pa.RecordBatch]:
+    for rows in partitions:
+        columns = zip(*rows)
+        yield pa.RecordBatch.from_arrays(
+            [
+                pa.array(column, type=field.type)
+                for column, field in zip(columns, PREDICTION_SCHEMA)
+            ],
+            schema=PREDICTION_SCHEMA,
+        )
+
+
+def encode_batches(
+    batches: Iterable[pa.RecordBatch], export_format: ExportFormat
+) -> Iterator[bytes]:
+    """Encode batches into one file, yielding its bytes as they are produced."""
+    sink = _ChunkSink()
+    if export_format == ExportFormat.GEOPARQUET:
+        schema = PREDICTION_SCHEMA.with_metadata(
+            {b"geo": json.dumps(GEO_METADATA).encode()}
+        )
+        writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    else:
+        schema = PREDICTION_SCHEMA
+        writer = pa.ipc.new_stream(
+            sink, schema, options=pa.ipc.IpcWriteOptions(compression="zstd")
+        )
+
+    for batch in batches:
+        if export_format == ExportFormat.GEOPARQUET:
+            # One row group per batch, so every batch is flushed to the client.
+            writer.write_table(pa.Table.from_batches([batch], schema=schema))
+        else:
+            writer.write_batch(batch)
+        chunk = sink.take()
+        if chunk:
+            yield chunk
+
+    writer.close()
+    yield sink.take()
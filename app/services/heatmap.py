@@ -0,0 +1,88 @@
+"""Prediction density heatmaps, binned with NumPy.
+
+Points are read through a server-side cursor and added batch by batch to a
+single histogram over the AOI bbox, weighted by pixel value. A heatmap
+over months of predictions therefore costs one pass and a fixed-size grid,
+not one feature per point.
+"""
+
+import enum
+
+import numpy as np
+
+from app.services.binary_points import MEDIA_TYPE as BINARY_MEDIA_TYPE
+from app.services.binary_points import pack_arrays
+
+try:
+    from rio_tiler.utils import render
+
+    from app.services.raster_tiles import prediction_colormap
+except ImportError:  # pragma: no cover - optional dependency
+    render = None
+
+MAX_RESOLUTION = 1024
+BATCH_ROWS = 50_000
+
+
+class HeatmapFormat(str, enum.Enum):
+    PNG = "png"
+    GRID = "grid"
+
+
+MEDIA_TYPES = {
+    HeatmapFormat.PNG: "image/png",
+    HeatmapFormat.GRID: BINARY_MEDIA_TYPE,
+}
+# PNGs are rendered with rio-tiler, like the raster tiles.
+PNG_SUPPORTED = render is not None
+
+
+def grid_shape(bbox: tuple, resolution: int) -> tuple[int, int]:
+    """(height, width) with `resolution` cells along the longer side of the
+    bbox and roughly square cells."""
+    min_lon, min_lat, max_lon, max_lat = bbox
+    width = max(max_lon - min_lon, 1e-9)
+    height = max(max_lat - min_lat, 1e-9)
+    if width >= height:
+        return max(1, round(resolution * height / width)), resolution
+    return resolution, max(1, round(resolution * width / height))
+
+
+def accumulate(partitions, bbox: tuple, shape: tuple[int, int]) -> np.ndarray:
+    """Sum the weights of (lon, lat, weight) rows per cell; row 0 is north."""
+    min_lon, min_lat, max_lon, max_lat = bbox
+    lat_range = (min_lat, max(max_lat, min_lat + 1e-9))
+    lon_range = (min_lon, max(max_lon, min_lon + 1e-9))
+    grid = np.zeros(shape, dtype=np.float64)
+    for rows in partitions:
+        lon, lat, weights = (np.asarray(column, dtype=np.float64) for column in zip(*rows))
+        counts, _, _ = np.histogram2d(
+            lat, lon, bins=shape, range=(lat_range, lon_range), weights=weights
+        )
+        grid += counts
+    return grid[::-1]
+
+
+def render_png(grid: np.ndarray) -> bytes:
+    """Colormapped PNG of the grid; empty cells are transparent."""
+    peak = grid.max()
+    scaled = np.zeros(grid.shape, dtype=np.uint8)
+    if peak > 0:
+        # Every cell with data gets at least 1, which the colormap shows.
+        scaled = np.where(
+            grid > 0, np.clip(np.round(grid / peak * 255), 1, 255), 0
+        ).astype(np.uint8)
+    return render(scaled[np.newaxis], img_format="PNG", colormap=prediction_colormap())
+
+
+def encode_grid(grid: np.ndarray, bbox: tuple, properties: dict | None = None) -> bytes:
+    """The grid as one float32 array, row-major from the north-west corner,
+    in the packed layout of app/services/binary_points.py."""
+    header = {
+        "bbox": list(bbox),
+        "width": grid.shape[1],
+        "height": grid.shape[0],
+        "max": float(grid.max()),
+        "properties": properties or {},
+    }
+    return pack_arrays(header, [("value", grid.astype("<f4").ravel())])
@@ -0,0 +1,458 @@
+"""Cold storage of old predictions: one Parquet file per AOI and month.
+
+Predictions of completed jobs' images older than
+PREDICTION_ARCHIVE_AFTER_DAYS (whole months only) are written to
+`predictions/aoi=<id>/<YYYY-MM>/<first image id>.parquet` in object storage
+and recorded in prediction_archives. Their prediction_vectors and
+prediction_facts rows are then deleted in batches. Images, rasters and
+raster statistics stay, so AOI listings and image lists are unchanged.
+
+Reads of an AOI and time range look up the archives of the months they
+cover (archives_covering), leave the archived images out of their live
+query and add the archived rows (read_archived). Files are sorted by
+image timestamp; row groups outside the requested range are skipped by
+their statistics and only the byte ranges needed are fetched. /jobs and
+/predictions, which have no time range, read all archives of the AOI (or
+of all AOIs) and leave out the images of archives not purged yet.
+
+Since every route serving predictions merges the archives in, archiving
+does not change any response, and its deletes skip the data version and
+change notifications (silence_deletes).
+"""
+
+
+import datetime
+import io
+import logging
+import os
+import tempfile
+import threading
+from typing import Iterable, Iterator
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from sqlalchemy import exists, func, literal_column, select, text
+
+from app.config.config import (
+    PREDICTION_ARCHIVE_AFTER_DAYS,
+    PREDICTION_ARCHIVE_POLL_SECONDS,
+    PURGE_BATCH_ROWS,
+)
+from app.db.connect import Session
+from app.db.models import (
+    AOI,
+    Image,
+    Job,
+    JobStatus,
+    PredictionArchive,
+    PredictionRaster,
+    PredictionVector,
+)
+from app.db.partitions import add_months, month_start
+from app.db.versioning import silence_deletes
+from app.services.purge import delete_image_predictions
+from app.services.storage import storage
+
+logger = logging.getLogger(__name__)
+
+ROW_GROUP_ROWS = 65_536
+# First key of pg_try_advisory_xact_lock(key, aoi_id) while archiving.
+_ARCHIVE_LOCK_CLASS = 7302
+
+# Column order matches the SELECT list of _archive_rows.
+ARCHIVE_SCHEMA = pa.schema(
+    [
+        ("job_id", pa.int32()),
+        ("image_id", pa.int32()),
+        ("timestamp", pa.timestamp("us")),
+        ("pixel_value", pa.int32()),
+        ("lon", pa.float64()),
+        ("lat", pa.float64()),
+        ("geometry", pa.binary()),
+        # Whether the point lies inside the AOI, which the map reads serve.
+        ("in_aoi", pa.bool_()),
+    ]
+)
+_TIMESTAMP_COLUMN = ARCHIVE_SCHEMA.get_field_index("timestamp")
+
+
+def archive_key(aoi_id: int, month: datetime.date, first_image_id: int) -> str:
+    return f"predictions/aoi={aoi_id}/{month:%Y-%m}/{first_image_id}.parquet"
+
+
+def archive_cutoff(today: datetime.date | None = None) -> datetime.datetime:
+    """Images before this instant are archived: the start of the month
+    PREDICTION_ARCHIVE_AFTER_DAYS ago."""
+    today = today or datetime.date.today()
+    month = month_start(today - datetime.timedelta(days=PREDICTION_ARCHIVE_AFTER_DAYS))
+    return datetime.datetime.combine(month, datetime.time())
+
+
+def _archivable_images(cutoff: datetime.datetime):
+    """Images before the cutoff whose predictions are still in the tables."""
+    return (
+        select(Image.id)
+        .join(Job, Job.id == Image.job_id)
+        .join(PredictionRaster, PredictionRaster.image_id == Image.id)
+        .where(
+            Image.timestamp < cutoff,
+            Job.status == JobStatus.COMPLETED,
+            Job.is_deleted == False,  # noqa <E712>
+            # Threshold counts keep reading the statistics of archived rasters.
+            PredictionRaster.pixel_histogram.is_not(None),
+            exists().where(PredictionVector.prediction_raster_id == PredictionRaster.id),
+            ~exists().where(PredictionArchive.image_ids.any(Image.id)),
+        )
+    )
+
+
+def next_archive_month(session, cutoff: datetime.datetime) -> tuple | None:
+    """(aoi_id, month) of the oldest month with predictions to archive."""
+    # A literal unit, so the grouped and the selected expression are the same.
+    month = func.date_trunc(literal_column("'month'"), Image.timestamp)
+    return session.execute(
+        _archivable_images(cutoff)
+        .with_only_columns(Job.aoi_id, month.label("month"))
+        .group_by(Job.aoi_id, month)
+        .order_by(month, Job.aoi_id)
+        .limit(1)
+    ).first()
+
+
+def _archive_rows(image_ids: list[int]):
+    # Exact duplicates of a point are dropped, as the read queries do.
+    return (
+        select(
+            Job.id,
+            Image.id,
+            Image.timestamp,
+            PredictionVector.pixel_value,
+            func.ST_X(PredictionVector.geometry),
+            func.ST_Y(PredictionVector.geometry),
+            func.ST_AsBinary(PredictionVector.geometry),
+            func.ST_Intersects(PredictionVector.geometry, AOI.geometry),
+        )
+        .distinct()
+        .select_from(Image)
+        .join(Job, Job.id == Image.job_id)
+        .join(AOI, AOI.id == Job.aoi_id)
+        .join(PredictionRaster, PredictionRaster.image_id == Image.id)
+        .join(
+            PredictionVector,
+            PredictionVector.prediction_raster_id == PredictionRaster.id,
+        )
+        .where(Image.id.in_(image_ids))
+        .order_by(Image.timestamp, Image.id)
+    )
+
+
+def _record_batch(rows: list) -> pa.RecordBatch:
+    return pa.RecordBatch.from_arrays(
+        [
+            pa.array(column, type=field.type)
+            for column, field in zip(zip(*rows), ARCHIVE_SCHEMA)
+        ],
+        schema=ARCHIVE_SCHEMA,
+    )
+
+
+def archive_month(
+    aoi_id: int, month: datetime.date, cutoff: datetime.datetime
+) -> PredictionArchive | None:
+    """Write the AOI's archivable predictions of the month to storage and
+    record them. Their rows are deleted later by purge_archived_step.
+
+    Returns None if there is nothing to archive or another process is
+    archiving the AOI right now.
+    """
+    month = month_start(month)
+    end = min(datetime.datetime.combine(add_months(month, 1), datetime.time()), cutoff)
+    session = Session()
+    try:
+        locked = session.execute(
+            text("SELECT pg_try_advisory_xact_lock(:lock_class, :aoi_id)"),
+            {"lock_class": _ARCHIVE_LOCK_CLASS, "aoi_id": aoi_id},
+        ).scalar()
+        if not locked:
+            return None
+        image_ids = session.scalars(
+            _archivable_images(end).where(
+                Job.aoi_id == aoi_id,
+                Image.timestamp >= datetime.datetime.combine(month, datetime.time()),
+            )
+        ).all()
+        if not image_ids:
+            return None
+
+        key = archive_key(aoi_id, month, min(image_ids))
+        row_count = 0
+        with tempfile.NamedTemporaryFile(suffix=".parquet") as archive_file:
+            writer = pq.ParquetWriter(archive_file, ARCHIVE_SCHEMA, compression="zstd")
+            result = session.execute(
+                _archive_rows(image_ids),
+                execution_options={"yield_per": ROW_GROUP_ROWS},
+            )
+            for rows in result.partitions():
+                writer.write_batch(_record_batch(rows))
+                row_count += len(rows)
+            writer.close()
+            archive_file.flush()
+            size = os.path.getsize(archive_file.name)
+            storage.put_file(key, archive_file.name)
+
+        archive = PredictionArchive(
+            aoi_id=aoi_id,
+            month=month,
+            storage_key=key,
+            image_ids=image_ids,
+            row_count=row_count,
+            size_bytes=size,
+        )
+        session.add(archive)
+        session.commit()
+        logger.info(
+            "Archived %s predictions of AOI %s for %s", row_count, aoi_id, f"{month:%Y-%m}"
+        )
+        return archive
+    finally:
+        session.close()
+
+
+def purge_archived_step(limit: int = PURGE_BATCH_ROWS) -> int | None:
+    """Delete one batch of rows that are archived but still in the tables.
+
+    Returns the rows deleted, or None if every archive is purged.
+    """
+    session = Session()
+    try:
+        archive = (
+            session.query(PredictionArchive)
+            .filter(PredictionArchive.purged_at.is_(None))
+            .order_by(PredictionArchive.id)
+            .with_for_update(skip_locked=True)
+            .first()
+        )
+        if archive is None:
+            return None
+        silence_deletes(session)
+        deleted = 0
+        for image_id in archive.image_ids:
+            deleted = delete_image_predictions(session, image_id, limit)
+            if deleted:
+                break
+        else:
+            archive.purged_at = datetime.datetime.now()
+        session.commit()
+        return deleted
+    finally:
+        session.close()
+
+
+def archive_step(cutoff: datetime.datetime | None = None) -> bool:
+    """Purge one batch or archive one AOI-month; False if there was nothing
+    to do (or the next AOI is locked by another process)."""
+    if purge_archived_step() is not None:
+        return True
+    cutoff = cutoff or archive_cutoff()
+    session = Session()
+    try:
+        candidate = next_archive_month(session, cutoff)
+    finally:
+        session.close()
+    if candidate is None:
+        return False
+    return archive_month(candidate.aoi_id, candidate.month.date(), cutoff) is not None
+
+
+class PredictionArchiver(threading.Thread):
+    """Moves old predictions to cold storage."""
+
+    def __init__(self):
+        super().__init__(name="prediction-archiver", daemon=True)
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                while not self._stop_event.is_set() and archive_step():
+                    pass
+            except Exception:
+                logger.exception("Archiving predictions failed")
+            self._stop_event.wait(PREDICTION_ARCHIVE_POLL_SECONDS)
+
+
+def _naive_utc(value: datetime.datetime | None) -> datetime.datetime | None:
+    """Query datetimes may carry an offset; image timestamps, and with them
+    the archived ones and their statistics, are naive UTC."""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+
+
+def archives_covering(
+    session, aoi_id: int, start: datetime.datetime, end: datetime.datetime
+) -> list[PredictionArchive]:
+    """Archives of the AOI with predictions in start <= timestamp < end."""
+    start, end = _naive_utc(start), _naive_utc(end)
+    return (
+        session.query(PredictionArchive)
+        .filter(
+            PredictionArchive.aoi_id == aoi_id,
+            PredictionArchive.month >= month_start(start.date()),
+            PredictionArchive.month <= month_start(end.date()),
+        )
+        .order_by(PredictionArchive.month, PredictionArchive.id)
+        .all()
+    )
+
+
+def all_archives(session, aoi_id: int | None = None) -> list[PredictionArchive]:
+    """Every archive, or every archive of the AOI."""
+    query = session.query(PredictionArchive)
+    if aoi_id is not None:
+        query = query.filter(PredictionArchive.aoi_id == aoi_id)
+    return query.order_by(PredictionArchive.month, PredictionArchive.id).all()
+
+
+def archived_image_ids(archives: Iterable[PredictionArchive]) -> list[int]:
+    """Images whose predictions the live queries must leave out: the
+    archive serves them, also while their rows are being deleted."""
+    return [image_id for archive in archives for image_id in archive.image_ids]
+
+
+def unpurged_image_ids(archives: Iterable[PredictionArchive]) -> list[int]:
+    """archived_image_ids, less the images already purged from the tables;
+    a shorter exclusion list for reads over all of an AOI's archives."""
+    return archived_image_ids(
+        archive for archive in archives if archive.purged_at is None
+    )
+
+
+def live_job_ids(session, aoi_id: int, model_id: int) -> list[int]:
+    """Jobs whose archived rows are served: archives keep the rows of jobs
+    deleted later."""
+    return session.scalars(
+        select(Job.id).where(
+            Job.aoi_id == aoi_id,
+            Job.model_id == model_id,
+            Job.is_deleted == False,  # noqa <E712>
+        )
+    ).all()
+
+
+class _StorageFile(io.RawIOBase):
+    """Read-only file over storage.read_range, for pyarrow."""
+
+    def __init__(self, key: str):
+        self.key = key
+        self._size = storage.size(key)
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self._size
+        self._position = max(offset, 0)
+        return self._position
+
+    def readinto(self, buffer) -> int:
+        length = min(len(buffer), self._size - self._position)
+        if length <= 0:
+            return 0
+        data = storage.read_range(self.key, self._position, length)
+        buffer[: len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+
+def _row_groups(
+    metadata, start: datetime.datetime | None, end: datetime.datetime | None
+) -> list:
+    groups = []
+    for index in range(metadata.num_row_groups):
+        stats = metadata.row_group(index).column(_TIMESTAMP_COLUMN).statistics
+        if stats is not None and stats.has_min_max and (
+            (start is not None and stats.max < start)
+            or (end is not None and stats.min >= end)
+        ):
+            continue
+        groups.append(index)
+    return groups
+
+
+def read_archived(
+    archives: Iterable[PredictionArchive],
+    job_ids: list[int],
+    start: datetime.datetime | None,
+    end: datetime.datetime | None,
+    columns: list[str],
+    min_pixel_value: int | None = None,
+    max_pixel_value: int | None = None,
+    inside_aoi: bool = True,
+) -> Iterator[pa.RecordBatch]:
+    """Non-empty batches of `columns` of the archived points of the given
+    jobs, with start <= timestamp < end (None is open) and a pixel value in
+    the given bounds; ordered by timestamp within each archive. Only points
+    inside the AOI, unless inside_aoi is False."""
+    if not job_ids:
+        return
+    start, end = _naive_utc(start), _naive_utc(end)
+    # Only the column chunks of the filters and the result are fetched.
+    read_columns = sorted(set(columns) | {"job_id", "in_aoi", "timestamp", "pixel_value"})
+    jobs = pa.array(job_ids, type=pa.int32())
+    bounds = [
+        (compare, pa.scalar(bound, type=pa.timestamp("us")))
+        for compare, bound in ((pc.greater_equal, start), (pc.less, end))
+        if bound is not None
+    ]
+    for archive in archives:
+        # pre_buffer coalesces the column chunks into a few ranged reads.
+        parquet_file = pq.ParquetFile(
+            _StorageFile(archive.storage_key), pre_buffer=True
+        )
+        row_groups = _row_groups(parquet_file.metadata, start, end)
+        if not row_groups:
+            continue
+        for batch in parquet_file.iter_batches(
+            row_groups=row_groups, columns=read_columns
+        ):
+            mask = pc.is_in(batch.column("job_id"), jobs)
+            if inside_aoi:
+                mask = pc.and_(mask, batch.column("in_aoi"))
+            for compare, bound in bounds:
+                mask = pc.and_(mask, compare(batch.column("timestamp"), bound))
+            if min_pixel_value is not None:
+                mask = pc.and_(
+                    mask, pc.greater_equal(batch.column("pixel_value"), min_pixel_value)
+                )
+            if max_pixel_value is not None:
+                mask = pc.and_(
+                    mask, pc.less_equal(batch.column("pixel_value"), max_pixel_value)
+                )
+            selected = batch.filter(mask).select(columns)
+            if selected.num_rows:
+                yield selected
+
+
+def batch_rows(batch: pa.RecordBatch) -> list[tuple]:
+    return list(zip(*(column.to_pylist() for column in batch.columns)))
+
+
+def point_geometry(lon: float, lat: float) -> dict:
+    """An archived point as the live queries' ST_AsGeoJSON writes it, which
+    keeps at most 9 decimal digits."""
+    return {"type": "Point", "coordinates": [round(lon, 9), round(lat, 9)]}
@@ -0,0 +1,350 @@
+"""Deleting jobs and AOIs: a soft delete now, the data in the background.
+
+DELETE /jobs/{id} and DELETE /aoi/{id} only set is_deleted (which every
+read route filters on) and queue a Purge. The purge worker then removes
+the target image by image, one bounded batch per transaction:
+
+    DELETE FROM prediction_vectors WHERE id IN (SELECT ... LIMIT n)
+
+so no statement holds locks on, or writes WAL for, millions of rows at
+once, and ingest keeps running alongside. Progress (rows_deleted, status)
+is stored on the purge row and served by GET /purges/{id}.
+
+A failed batch is retried with exponential backoff while the worker moves
+on to other purges. After PURGE_MAX_FAILURES failures in a row the purge is
+FAILED; deleting its job or AOI again queues it once more.
+"""
+
+import datetime
+import logging
+import threading
+
+from sqlalchemy import text
+
+from app.config.config import (
+    PURGE_BATCH_ROWS,
+    PURGE_MAX_FAILURES,
+    PURGE_POLL_SECONDS,
+)
+from app.db.connect import Session
+from app.db.models import (
+    AOI,
+    Image,
+    Job,
+    PredictionArchive,
+    Purge,
+    PurgeStatus,
+    PurgeTarget,
+)
+from app.db.versioning import silence_deletes
+from app.services.storage import storage
+from app.services.tile_archive import delete_job_archive
+
+logger = logging.getLogger(__name__)
+
+_FACTS_KEY = "aoi_id, model_id, day, image_id, pixel_value, geometry"
+
+_DELETE_IMAGE_FACTS = text(
+    f"""
+    DELETE FROM prediction_facts
+    WHERE ({_FACTS_KEY}) IN (
+        SELECT {_FACTS_KEY} FROM prediction_facts
+        WHERE aoi_id = :aoi_id
+            AND model_id = :model_id
+            AND day = :day
+            AND image_id = :image_id
+        LIMIT :limit
+    )
+    """
+)
+
+_DELETE_AOI_FACTS = text(
+    f"""
+    DELETE FROM prediction_facts
+    WHERE ({_FACTS_KEY}) IN (
+        SELECT {_FACTS_KEY} FROM prediction_facts WHERE aoi_id = :aoi_id LIMIT :limit
+    )
+    """
+)
+
+_DELETE_PREDICTION_VECTORS = text(
+    """
+    DELETE FROM prediction_vectors
+    WHERE id IN (
+        SELECT prediction_vectors.id
+        FROM prediction_vectors
+        JOIN prediction_rasters
+            ON prediction_rasters.id = prediction_vectors.prediction_raster_id
+        WHERE prediction_rasters.image_id = :image_id
+        LIMIT :limit
+    )
+    """
+)
+
+_DELETE_SCL_VECTORS = text(
+    """
+    DELETE FROM scene_classification_vectors
+    WHERE id IN (
+        SELECT id FROM scene_classification_vectors
+        WHERE image_id = :image_id
+        LIMIT :limit
+    )
+    """
+)
+
+# Children first: each statement runs until it finds nothing left.
+_PREDICTION_BATCHES = [_DELETE_IMAGE_FACTS, _DELETE_PREDICTION_VECTORS]
+
+
+def _find_purge(session, target: PurgeTarget, target_id: int) -> Purge | None:
+    """The target's latest purge, queued again if it FAILED."""
+    purge = (
+        session.query(Purge)
+        .filter(Purge.target == target, Purge.target_id == target_id)
+        .order_by(Purge.id.desc())
+        .first()
+    )
+    if purge is not None and purge.status == PurgeStatus.FAILED:
+        purge.status = PurgeStatus.PENDING
+        purge.failures = 0
+        purge.retry_at = None
+    return purge
+
+
+def retry_delay(failures: int) -> datetime.timedelta:
+    """How long a purge waits after its `failures`-th failed batch in a row."""
+    return datetime.timedelta(seconds=PURGE_POLL_SECONDS * 2 ** min(failures, 16))
+
+
+def delete_job(session, job_id: int) -> Purge | None:
+    """Soft-delete the job and queue its purge; None if there is no such job.
+
+    Deleting a job again returns the purge queued the first time, which is
+    its AOI's purge if the job went with its AOI, and queues it again if it
+    FAILED.
+    """
+    job = session.query(Job).filter(Job.id == job_id).with_for_update().one_or_none()
+    if job is None:
+        return None
+    purge = _find_purge(session, PurgeTarget.JOB, job.id)
+    if purge is None and job.is_deleted:
+        purge = _find_purge(session, PurgeTarget.AOI, job.aoi_id)
+    if purge is None:
+        purge = Purge(target=PurgeTarget.JOB, target_id=job.id)
+        session.add(purge)
+    job.is_deleted = True
+    delete_job_archive(session, job.id)
+    session.commit()
+    return purge
+
+
+def delete_aoi(session, aoi_id: int) -> Purge | None:
+    """Soft-delete the AOI and all its jobs and queue their purge; None if
+    there is no such AOI."""
+    aoi = session.query(AOI).filter(AOI.id == aoi_id).with_for_update().one_or_none()
+    if aoi is None:
+        return None
+    purge = _find_purge(session, PurgeTarget.AOI, aoi.id)
+    if purge is None:
+        purge = Purge(target=PurgeTarget.AOI, target_id=aoi.id)
+        session.add(purge)
+    aoi.is_deleted = True
+    job_ids = [row.id for row in session.query(Job.id).filter(Job.aoi_id == aoi.id)]
+    session.query(Job).filter(
+        Job.aoi_id == aoi.id,
+        Job.is_deleted == False,  # noqa <E712>
+    ).update({Job.is_deleted: True}, synchronize_session=False)
+    for job_id in job_ids:
+        delete_job_archive(session, job_id)
+    session.commit()
+    return purge
+
+
+def purge_status(purge: Purge) -> dict:
+    return {
+        "purge_id": purge.id,
+        "target": purge.target.value,
+        "target_id": purge.target_id,
+        "status": purge.status.value,
+        "rows_deleted": purge.rows_deleted or 0,
+        "created_at": purge.created_at.isoformat(),
+        "finished_at": purge.finished_at.isoformat() if purge.finished_at else None,
+        "error": purge.error,
+        "failures": purge.failures or 0,
+        "retry_at": purge.retry_at.isoformat() if purge.retry_at else None,
+    }
+
+
+def delete_image_predictions(session, image_id: int, limit: int) -> int:
+    """Delete up to `limit` of the image's prediction facts or vectors;
+    returns how many, 0 once none are left. The caller commits."""
+    image = (
+        session.query(Job.aoi_id, Job.model_id, Image.timestamp)
+        .join(Job, Job.id == Image.job_id)
+        .filter(Image.id == image_id)
+        .one_or_none()
+    )
+    if image is None:
+        return 0
+    params = {
+        "aoi_id": image.aoi_id,
+        "model_id": image.model_id,
+        "day": image.timestamp.date(),
+        "image_id": image_id,
+        "limit": limit,
+    }
+    for statement in _PREDICTION_BATCHES:
+        deleted = session.execute(statement, params).rowcount
+        if deleted:
+            return deleted
+    return 0
+
+
+def _purge_image_batch(session, image_id: int, limit: int) -> int:
+    params = {"image_id": image_id, "limit": limit}
+    deleted = delete_image_predictions(session, image_id, limit)
+    if deleted:
+        return deleted
+    deleted = session.execute(_DELETE_SCL_VECTORS, params).rowcount
+    if deleted:
+        return deleted
+    deleted = session.execute(
+        text("DELETE FROM prediction_rasters WHERE image_id = :image_id"), params
+    ).rowcount
+    return deleted + session.execute(
+        text("DELETE FROM images WHERE id = :image_id"), params
+    ).rowcount
+
+
+def _purge_job_batch(session, job_id: int, limit: int) -> tuple[int, bool]:
+    """One batch of the job's rows; returns (rows deleted, job gone)."""
+    if session.query(Job.id).filter(Job.id == job_id).one_or_none() is None:
+        return 0, True
+    image_id = (
+        session.query(Image.id)
+        .filter(Image.job_id == job_id)
+        .order_by(Image.id)
+        .limit(1)
+        .scalar()
+    )
+    if image_id is not None:
+        return _purge_image_batch(session, image_id, limit), False
+    # A tile archive built while the delete was in flight.
+    delete_job_archive(session, job_id)
+    session.flush()
+    deleted = session.query(Job).filter(Job.id == job_id).delete(
+        synchronize_session=False
+    )
+    return deleted, True
+
+
+def _purge_aoi_batch(session, aoi_id: int, limit: int) -> tuple[int, bool]:
+    job_id = (
+        session.query(Job.id).filter(Job.aoi_id == aoi_id).order_by(Job.id).limit(1).scalar()
+    )
+    if job_id is not None:
+        deleted, _ = _purge_job_batch(session, job_id, limit)
+        return deleted, False
+    # Facts whose image rows were gone before the purge started.
+    deleted = session.execute(
+        _DELETE_AOI_FACTS, {"aoi_id": aoi_id, "limit": limit}
+    ).rowcount
+    if deleted:
+        return deleted, False
+    # Predictions moved to cold storage, see services/prediction_archive.py.
+    for archive in session.query(PredictionArchive).filter(
+        PredictionArchive.aoi_id == aoi_id
+    ):
+        storage.delete(archive.storage_key)
+        session.delete(archive)
+        deleted += archive.row_count
+    session.flush()
+    deleted += session.query(AOI).filter(AOI.id == aoi_id).delete(
+        synchronize_session=False
+    )
+    return deleted, True
+
+
+def purge_step(limit: int = PURGE_BATCH_ROWS) -> int | None:
+    """Run one batch of the oldest pending purge that is not backing off, in
+    its own transaction.
+
+    Returns the rows deleted, or None if no purge is waiting. Concurrent
+    workers skip purges locked by another one.
+    """
+    session = Session()
+    try:
+        now = datetime.datetime.now()
+        purge = (
+            session.query(Purge)
+            .filter(
+                Purge.status == PurgeStatus.PENDING,
+                Purge.retry_at.is_(None) | (Purge.retry_at <= now),
+            )
+            .order_by(Purge.id)
+            .with_for_update(skip_locked=True)
+            .first()
+        )
+        if purge is None:
+            return None
+        purge_id, failures = purge.id, (purge.failures or 0) + 1
+        silence_deletes(session)
+        try:
+            if purge.target == PurgeTarget.JOB:
+                deleted, done = _purge_job_batch(session, purge.target_id, limit)
+            else:
+                deleted, done = _purge_aoi_batch(session, purge.target_id, limit)
+        except Exception as error:
+            session.rollback()
+            failed = failures >= PURGE_MAX_FAILURES
+            session.query(Purge).filter(Purge.id == purge_id).update(
+                {
+                    Purge.error: str(error)[:1000],
+                    Purge.failures: failures,
+                    Purge.status: PurgeStatus.FAILED if failed else Purge.status,
+                    Purge.retry_at: None if failed else now + retry_delay(failures),
+                },
+                synchronize_session=False,
+            )
+            session.commit()
+            if failed:
+                logger.error("Purge %s failed %s times, giving up", purge_id, failures)
+            raise
+
+        purge.rows_deleted += deleted
+        purge.error = None
+        purge.failures = 0
+        purge.retry_at = None
+        if done:
+            purge.status = PurgeStatus.COMPLETED
+            purge.finished_at = datetime.datetime.now()
+            logger.info(
+                "Purged %s %s: %s rows",
+                purge.target.value.lower(),
+                purge.target_id,
+                purge.rows_deleted,
+            )
+        session.commit()
+        return deleted
+    finally:
+        session.close()
+
+
+class PurgeWorker(threading.Thread):
+    """Works through pending purges, batch by batch."""
+
+    def __init__(self):
+        super().__init__(name="purge-worker", daemon=True)
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                while not self._stop_event.is_set() and purge_step() is not None:
+                    pass
+            except Exception:
+                logger.exception("Purge batch failed")
+            self._stop_event.wait(PURGE_POLL_SECONDS)
@@ -0,0 +1,199 @@
+"""PNG map tiles rendered from the prediction rasters (COGs).
+
+Open dataset handles are kept in an LRU, and GDAL's block cache holds the
+decoded COG blocks, so neighbouring tiles and repeated views of a raster
+cost no new reads. With RASTER_LOCAL_ROOT set, the path of every
+raster_url is looked up below that directory instead, e.g. for local
+development with downloaded rasters.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Iterable
+from urllib.parse import urlparse
+
+import rasterio
+from rio_tiler.colormap import cmap
+from rio_tiler.errors import TileOutsideBounds
+from rio_tiler.io import Reader
+
+from app.config.config import (
+    RASTER_BLOCK_CACHE_MB,
+    RASTER_DATASET_CACHE_SIZE,
+    RASTER_LOCAL_ROOT,
+)
+from app.db.connect import ReadSession
+from app.db.models import Image, Job, PredictionRaster
+from app.services.cache_invalidation import register_aoi_cache
+
+TILE_SIZE = 256
+COLORMAP_NAME = "viridis"
+
+# GDAL options for reading COGs over HTTP/S3 with few requests.
+GDAL_OPTIONS = {
+    "GDAL_CACHEMAX": RASTER_BLOCK_CACHE_MB,
+    "GDAL_DISABLE_READDIR_ON_OPEN": "EMPTY_DIR",
+    "GDAL_HTTP_MERGE_CONSECUTIVE_RANGES": "YES",
+    "GDAL_HTTP_MULTIPLEX": "YES",
+    "VSI_CACHE": "TRUE",
+}
+
+
+class RasterNotFound(Exception):
+    pass
+
+
+@lru_cache(maxsize=1)
+def prediction_colormap() -> dict:
+    colormap = dict(cmap.get(COLORMAP_NAME))
+    # 0 means no detection; keep it transparent over the base map.
+    colormap[0] = (0, 0, 0, 0)
+    return colormap
+
+
+def resolve_raster_url(raster_url: str) -> str:
+    if not RASTER_LOCAL_ROOT:
+        return raster_url
+    path = urlparse(raster_url).path.lstrip("/")
+    return os.path.join(RASTER_LOCAL_ROOT, path)
+
+
+def _lookup_raster(prediction_raster_id: int) -> tuple[int, str] | None:
+    """(AOI id, raster_url) of the raster, None if unknown or its job is
+    deleted."""
+    session = ReadSession()
+    try:
+        row = (
+            session.query(Job.aoi_id, PredictionRaster.raster_url)
+            .join(Image, Image.id == PredictionRaster.image_id)
+            .join(Job, Job.id == Image.job_id)
+            .filter(
+                PredictionRaster.id == prediction_raster_id,
+                Job.is_deleted == False,  # noqa <E712>
+            )
+            .one_or_none()
+        )
+    finally:
+        session.close()
+    return None if row is None else tuple(row)
+
+
+class RasterUrls:
+    """LRU of the resolved raster_url of each prediction raster.
+
+    Other workers learn that a job was deleted only through the aoi_changed
+    notification, so urls are cached only while the change listener
+    (services/cache_invalidation.py) is connected; without it, every tile
+    looks its raster up again.
+    """
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._urls: OrderedDict[int, tuple[int, str]] = OrderedDict()
+        self._listening = False
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, prediction_raster_id: int) -> str:
+        """Raises RasterNotFound for an unknown raster or a deleted job."""
+        with self._lock:
+            entry = self._urls.get(prediction_raster_id)
+            if entry is not None:
+                self._urls.move_to_end(prediction_raster_id)
+                return entry[1]
+            generation = self._generation
+        found = _lookup_raster(prediction_raster_id)
+        if found is None:
+            raise RasterNotFound(prediction_raster_id)
+        aoi_id, raster_url = found
+        url = resolve_raster_url(raster_url)
+        with self._lock:
+            # Not if its job may have been deleted while we looked it up.
+            if self._listening and generation == self._generation:
+                self._urls[prediction_raster_id] = (aoi_id, url)
+                if len(self._urls) > self.max_entries:
+                    self._urls.popitem(last=False)
+        return url
+
+    def mark_changed(self, aoi_ids: Iterable[int]):
+        aoi_ids = set(aoi_ids)
+        with self._lock:
+            self._generation += 1
+            for raster_id in [
+                raster_id
+                for raster_id, (aoi_id, _) in self._urls.items()
+                if aoi_id in aoi_ids
+            ]:
+                del self._urls[raster_id]
+
+    def listen(self):
+        with self._lock:
+            self._listening = True
+
+    def stop_listening(self):
+        with self._lock:
+            self._listening = False
+            self._generation += 1
+            self._urls.clear()
+
+
+raster_urls = register_aoi_cache(RasterUrls())
+
+
+class DatasetCache:
+    """LRU of open rasterio datasets, each with a lock.
+
+    A dataset handle must not be used by two threads at once.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._datasets: OrderedDict[str, tuple] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, url: str) -> tuple:
+        with self._lock:
+            entry = self._datasets.get(url)
+            if entry is not None:
+                self._datasets.move_to_end(url)
+                return entry
+        with rasterio.Env(**GDAL_OPTIONS):
+            dataset = rasterio.open(url)
+        with self._lock:
+            if url in self._datasets:
+                dataset.close()
+                return self._datasets[url]
+            entry = (dataset, threading.Lock())
+            self._datasets[url] = entry
+            while len(self._datasets) > self.max_size:
+                _, (evicted, evicted_lock) = self._datasets.popitem(last=False)
+                with evicted_lock:
+                    evicted.close()
+            return entry
+
+
+datasets = DatasetCache(RASTER_DATASET_CACHE_SIZE)
+
+
+def render_tile(prediction_raster_id: int, z: int, x: int, y: int) -> bytes | None:
+    """PNG of the raster within tile z/x/y, or None if they do not overlap.
+
+    Raises RasterNotFound for an unknown raster id.
+    """
+    url = raster_urls.get(prediction_raster_id)
+    while True:
+        dataset, lock = datasets.get(url)
+        with lock:
+            if dataset.closed:
+                # Evicted between the lookup and taking its lock.
+                continue
+            with rasterio.Env(**GDAL_OPTIONS):
+                try:
+                    image = Reader(dataset.name, dataset=dataset).tile(
+                        x, y, z, tilesize=TILE_SIZE, indexes=1
+                    )
+                except TileOutsideBounds:
+                    return None
+        return image.render(img_format="PNG", colormap=prediction_colormap())
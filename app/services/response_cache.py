@@ -0,0 +1,155 @@
+import threading
+from collections import OrderedDict
+from functools import partial
+from typing import Callable
+
+from fastapi import Request
+
+from app.config.config import RESPONSE_CACHE_MAX_BYTES
+from app.core.conditional import read_data_version, request_data_version
+from app.core.metrics import Counter, registry
+from app.services.single_flight import single_flight
+
+CACHE_REQUESTS = registry.register(
+    Counter(
+        "response_cache_requests_total",
+        "Response cache lookups by result.",
+        ("result",),
+    )
+)
+
+# Tag for entries that depend on the set of AOIs rather than a single AOI.
+ALL_AOIS_TAG = "aois"
+
+
+def aoi_tag(aoi_id: int) -> str:
+    return f"aoi:{aoi_id}"
+
+
+class ResponseCache:
+    """Thread-safe LRU of encoded response bodies, invalidated by tag.
+
+    The cache is only trusted while something keeps it fresh: it stays
+    disabled (every lookup misses) until the change listener is connected.
+    The listener reports the data version up to which it has evicted the
+    tags of every change. A request whose ETag is newer than that version
+    only gets entries computed at its version or later, so no body is
+    served under an ETag before the listener has evicted it.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.enabled = False
+        # key -> (body, tags, data version)
+        self._entries: OrderedDict[str, tuple[bytes, tuple, int]] = OrderedDict()
+        self._size = 0
+        self._generation = 0
+        self._covered_version: int | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, key: str, min_version: int | None = None) -> bytes | None:
+        """The body for key, unless it was computed before min_version and
+        the changes up to min_version may not have been evicted yet."""
+        with self._lock:
+            entry = self._entries.get(key) if self.enabled else None
+            if (
+                entry is not None
+                and min_version is not None
+                and entry[2] < min_version
+                and (self._covered_version is None or self._covered_version < min_version)
+            ):
+                entry = None
+            if entry is None:
+                CACHE_REQUESTS.inc(("miss",))
+                return None
+            self._entries.move_to_end(key)
+        CACHE_REQUESTS.inc(("hit",))
+        return entry[0]
+
+    def set(self, key: str, body: bytes, tags: tuple, generation: int, version: int):
+        """Store body unless an invalidation happened since `generation`.
+
+        version is a data version read before body was computed.
+        """
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            if not self.enabled or generation != self._generation:
+                return
+            self._pop(key)
+            self._entries[key] = (body, tags, version)
+            self._size += len(body)
+            while self._size > self.max_bytes:
+                self._pop(next(iter(self._entries)))
+
+    def invalidate(self, tags: set):
+        with self._lock:
+            self._generation += 1
+            stale = [key for key, (_, t, _) in self._entries.items() if tags & set(t)]
+            for key in stale:
+                self._pop(key)
+
+    def mark_covered(self, version: int):
+        """The tags of every change up to version have been invalidated."""
+        with self._lock:
+            if self._covered_version is None or version > self._covered_version:
+                self._covered_version = version
+
+    def enable(self):
+        with self._lock:
+            self.enabled = True
+
+    def disable(self):
+        with self._lock:
+            self.enabled = False
+            self._generation += 1
+            self._covered_version = None
+            self._entries.clear()
+            self._size = 0
+
+    def _pop(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= len(entry[0])
+
+
+response_cache = ResponseCache(RESPONSE_CACHE_MAX_BYTES)
+
+
+def compute_and_store(
+    key: str, tags: tuple, fn: Callable[..., bytes], *args, version: int | None = None
+) -> bytes:
+    """Compute and cache a body; version, if given, was read before the call."""
+    generation = response_cache.generation
+    if version is None:
+        version = read_data_version()
+    body = fn(*args)
+    response_cache.set(key, body, tags, generation, version)
+    return body
+
+
+async def cached_response(
+    key: str, tags: tuple, fn: Callable[..., bytes], *args, request: Request = None
+) -> bytes:
+    """Serve from the cache, or compute once for all concurrent callers.
+
+    Neither a cached body nor a shared computation older than the data
+    version of the request's ETag is used.
+    """
+    version = request_data_version()
+    body = response_cache.get(key, version)
+    if body is None:
+        body = await single_flight.do(
+            key if version is None else f"{key}@{version}",
+            partial(compute_and_store, version=version),
+            key,
+            tags,
+            fn,
+            *args,
+            request=request,
+        )
+    return body
@@ -0,0 +1,83 @@
+import asyncio
+import json
+from typing import Any, Callable
+
+from fastapi import Request
+
+from app.core.metrics import Counter, registry
+from app.db.deadline import (
+    ClientDisconnected,
+    QueryCanceller,
+    client_closed_request,
+    start_cancellable,
+    wait_for_client,
+)
+
+COALESCED_REQUESTS = registry.register(
+    Counter(
+        "single_flight_coalesced_total",
+        "Requests that joined an identical in-flight computation.",
+        ("name",),
+    )
+)
+
+
+def make_key(name: str, **params: Any) -> str:
+    """Normalized key: the same parsed parameters always give the same key."""
+    return name + ":" + json.dumps(params, sort_keys=True, default=str)
+
+
+class _Call:
+    def __init__(self, task: asyncio.Future, canceller: QueryCanceller):
+        self.task = task
+        self.canceller = canceller
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Share one execution of a blocking function between concurrent callers.
+
+    The function runs in the threadpool as its own task, so a caller going
+    away does not cancel the work for everybody else waiting on it. Once the
+    last waiter is gone (callers passing their request are watched for client
+    disconnects), the database statements of the execution are cancelled.
+    """
+
+    def __init__(self):
+        self._calls: dict[str, _Call] = {}
+
+    async def do(
+        self, key: str, fn: Callable[..., bytes], *args, request: Request = None
+    ) -> bytes:
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(*start_cancellable(fn, *args))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            COALESCED_REQUESTS.inc((key.split(":", 1)[0],))
+
+        call.waiters += 1
+        try:
+            if request is None:
+                return await asyncio.shield(call.task)
+            return await wait_for_client(request, call.task)
+        except ClientDisconnected:
+            raise client_closed_request()
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                call.canceller.cancel()
+                # Later callers must not join an execution that is being torn down.
+                self._forget(key, call.task)
+
+    def _forget(self, key: str, task: asyncio.Future):
+        call = self._calls.get(key)
+        if call is not None and call.task is task:
+            del self._calls[key]
+        if task.done() and not task.cancelled():
+            # Nobody may be left to retrieve the error of a cancelled execution.
+            task.exception()
+
+
+single_flight = SingleFlight()
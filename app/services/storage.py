@@ -0,0 +1,107 @@
+"""Object storage for generated files: a local directory or an S3 bucket.
+
+OBJECT_STORAGE_URL selects the backend: `s3://bucket/prefix` or a
+directory path (optionally `file://`).
+"""
+
+import os
+import shutil
+from urllib.parse import urlparse
+
+import boto3
+from botocore.exceptions import ClientError
+
+from app.config.config import OBJECT_STORAGE_URL
+
+
+class ObjectNotFound(Exception):
+    pass
+
+
+class LocalStorage:
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+
+    def _path(self, key: str) -> str:
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Invalid key: {key}")
+        return path
+
+    def put_file(self, key: str, source_path: str):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Copy next to the target and rename, so readers never see half a file.
+        partial = path + ".partial"
+        shutil.copyfile(source_path, partial)
+        os.replace(partial, path)
+
+    def read_range(self, key: str, offset: int, length: int) -> bytes:
+        try:
+            with open(self._path(key), "rb") as f:
+                f.seek(offset)
+                return f.read(length)
+        except FileNotFoundError:
+            raise ObjectNotFound(key)
+
+    def size(self, key: str) -> int:
+        try:
+            return os.path.getsize(self._path(key))
+        except FileNotFoundError:
+            raise ObjectNotFound(key)
+
+    def delete(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+
+class S3Storage:
+    def __init__(self, bucket: str, prefix: str = ""):
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self.client = boto3.client("s3")
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    def put_file(self, key: str, source_path: str):
+        self.client.upload_file(source_path, self.bucket, self._key(key))
+
+    def read_range(self, key: str, offset: int, length: int) -> bytes:
+        try:
+            response = self.client.get_object(
+                Bucket=self.bucket,
+                Key=self._key(key),
+                Range=f"bytes={offset}-{offset + length - 1}",
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("NoSuchKey", "404"):
+                raise ObjectNotFound(key)
+            raise
+        return response["Body"].read()
+
+    def size(self, key: str) -> int:
+        try:
+            response = self.client.head_object(Bucket=self.bucket, Key=self._key(key))
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("NoSuchKey", "404"):
+                raise ObjectNotFound(key)
+            raise
+        return response["ContentLength"]
+
+    def delete(self, key: str):
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+
+def get_storage(url: str):
+    parsed = urlparse(url)
+    if parsed.scheme == "s3":
+        return S3Storage(parsed.netloc, parsed.path)
+    if parsed.scheme == "file":
+        return LocalStorage(parsed.path)
+    return LocalStorage(url)
+
+
+storage = get_storage(OBJECT_STORAGE_URL)
@@ -0,0 +1,70 @@
+from shapely.geometry import box
+
+from app.services import aoi_index as aoi_index_module
+from app.services.aoi_index import AOIIndex, IndexedAOI
+from app.types.helpers import BoundingBox
+
+
+def make_entry(aoi_id, polygon):
+    return IndexedAOI(
+        id=aoi_id,
+        name=f"aoi {aoi_id}",
+        created_at=None,
+        start_date=None,
+        end_date=None,
+        image_count=0,
+        plastic_timestamp_count=0,
+        geometry="{}",
+        centroid="{}",
+        bbox=list(polygon.bounds),
+        area_km2=0.0,
+        shape=polygon,
+    )
+
+
+def make_index(aois, monkeypatch, version=1):
+    """An index loaded from the dict aois, at data version `version`."""
+    loads = []
+
+    def load(aoi_ids):
+        loads.append(aoi_ids)
+        ids = sorted(aois) if aoi_ids is None else aoi_ids
+        return [make_entry(aoi_id, aois[aoi_id]) for aoi_id in ids if aoi_id in aois]
+
+    monkeypatch.setattr(aoi_index_module, "_read_data_version", lambda: version)
+    index = AOIIndex()
+    index.loader(load)
+    index.reload()
+    return index, loads
+
+
+WEST = BoundingBox(-10, -10, 0, 10)
+
+
+def test_lookup_returns_intersecting_aois_by_id(monkeypatch):
+    aois = {2: box(-5, -5, -4, -4), 1: box(-2, 0, -1, 1), 3: box(5, 5, 6, 6)}
+    index, _ = make_index(aois, monkeypatch)
+
+    assert [entry.id for entry in index.lookup(WEST)] == [1, 2]
+
+
+def test_changed_aois_are_reloaded_while_listening(monkeypatch):
+    aois = {1: box(-2, 0, -1, 1)}
+    index, loads = make_index(aois, monkeypatch)
+    index.listen()
+    index.reload()
+
+    aois[2] = box(-5, -5, -4, -4)
+    del aois[1]
+    index.mark_changed([1, 2])
+
+    assert [entry.id for entry in index.lookup(WEST)] == [2]
+    assert loads[-1] == [1, 2]
+
+
+def test_stale_index_falls_back_to_the_database(monkeypatch):
+    index, _ = make_index({1: box(-2, 0, -1, 1)}, monkeypatch)
+    monkeypatch.setattr(aoi_index_module, "_read_data_version", lambda: 2)
+    monkeypatch.setattr(index, "_reload_in_background", lambda: None)
+
+    assert index.lookup(WEST) is None
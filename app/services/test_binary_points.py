@@ -0,0 +1,47 @@
+import datetime
+
+import numpy as np
+
+from app.services.binary_points import decode_points, encode_points
+
+
+def test_round_trip_with_timestamps():
+    base = datetime.datetime(2024, 5, 1, 10, 0)
+    timestamps = [base, base + datetime.timedelta(seconds=90)]
+
+    data = encode_points(
+        [12.5, -70.25],
+        [-3.25, 45.0],
+        [200, 17],
+        timestamps=timestamps,
+        value_scale=0.5,
+        properties={"modelId": "m"},
+    )
+    header, arrays = decode_points(data)
+
+    assert header["count"] == 2
+    assert header["value_scale"] == 0.5
+    assert header["properties"] == {"modelId": "m"}
+    assert header["timestamp_base"] == int(base.timestamp())
+    np.testing.assert_allclose(arrays["lon"], [12.5, -70.25])
+    np.testing.assert_allclose(arrays["lat"], [-3.25, 45.0])
+    assert arrays["timestamp_offset"].tolist() == [0, 90]
+    assert arrays["value"].tolist() == [200, 17]
+
+
+def test_arrays_are_aligned_and_compact():
+    count = 1000
+    data = encode_points(np.zeros(count), np.zeros(count), np.zeros(count))
+    header, _ = decode_points(data)
+
+    assert all(entry["offset"] % 4 == 0 for entry in header["arrays"])
+    assert "timestamp_offset" not in {entry["name"] for entry in header["arrays"]}
+    # 9 bytes per point plus the header
+    assert len(data) < count * 9 + 512
+
+
+def test_no_points():
+    header, arrays = decode_points(encode_points([], [], [], timestamps=[]))
+
+    assert header["count"] == 0
+    assert arrays["value"].size == 0
@@ -0,0 +1,46 @@
+import datetime
+import io
+import json
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from shapely import wkb
+from shapely.geometry import Point
+
+from app.services.export import ExportFormat, encode_batches, record_batches
+
+TIMESTAMP = datetime.datetime(2024, 5, 1, 10, 30)
+
+
+def _partitions():
+    point = Point(12.5, -3.25)
+    yield [(12.5, -3.25, 200, TIMESTAMP, 1, wkb.dumps(point))] * 3
+    yield [(1.0, 2.0, 90, TIMESTAMP, 2, wkb.dumps(Point(1, 2)))]
+
+
+def test_geoparquet_round_trip():
+    data = b"".join(
+        encode_batches(record_batches(_partitions()), ExportFormat.GEOPARQUET)
+    )
+    table = pq.read_table(io.BytesIO(data))
+
+    assert table.num_rows == 4
+    assert table.column("pixel_value").to_pylist() == [200, 200, 200, 90]
+    assert wkb.loads(table.column("geometry")[3].as_py()) == Point(1, 2)
+    geo = json.loads(table.schema.metadata[b"geo"])
+    assert geo["columns"]["geometry"]["encoding"] == "WKB"
+
+
+def test_arrow_stream_round_trip_with_no_rows():
+    data = b"".join(encode_batches(record_batches([]), ExportFormat.ARROW))
+    table = pa.ipc.open_stream(data).read_all()
+
+    assert table.num_rows == 0
+    assert table.schema.names == [
+        "lon",
+        "lat",
+        "pixel_value",
+        "timestamp",
+        "image_id",
+        "geometry",
+    ]
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from app.services.binary_points import decode_points
+from app.services.heatmap import (
+    PNG_SUPPORTED,
+    accumulate,
+    encode_grid,
+    grid_shape,
+    render_png,
+)
+
+BBOX = (10.0, 50.0, 14.0, 52.0)
+
+
+def test_grid_shape_keeps_cells_square():
+    assert grid_shape(BBOX, 100) == (50, 100)
+    assert grid_shape((0.0, 0.0, 1.0, 4.0), 100) == (100, 25)
+    assert grid_shape((0.0, 0.0, 0.0, 0.0), 10) == (10, 10)
+
+
+def test_accumulate_sums_weights_across_batches():
+    partitions = [
+        [(10.1, 51.9, 200), (10.2, 51.8, 55)],  # north-west cell
+        [(13.9, 50.1, 7), (14.0, 50.0, 1)],  # south-east cell, incl. the edge
+    ]
+
+    grid = accumulate(partitions, BBOX, (2, 4))
+
+    assert grid.shape == (2, 4)
+    assert grid[0, 0] == 255
+    assert grid[1, 3] == 8
+    assert grid.sum() == 263
+
+
+def test_encoded_grid_round_trip():
+    grid = np.arange(6, dtype=np.float64).reshape(2, 3)
+
+    header, arrays = decode_points(encode_grid(grid, BBOX, {"modelId": "m"}))
+
+    assert (header["width"], header["height"]) == (3, 2)
+    assert header["bbox"] == list(BBOX)
+    assert header["max"] == 5
+    assert arrays["value"].reshape(2, 3).tolist() == grid.tolist()
+
+
+@pytest.mark.skipif(not PNG_SUPPORTED, reason="rio-tiler is not installed")
+def test_render_png():
+    png = render_png(np.array([[0.0, 1.0], [1000.0, 0.0]]))
+    assert png.startswith(b"\x89PNG")
+    assert render_png(np.zeros((2, 2))).startswith(b"\x89PNG")
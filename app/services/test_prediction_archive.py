@@ -0,0 +1,126 @@
+import datetime
+from types import SimpleNamespace
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from app.services import prediction_archive
+from app.services.prediction_archive import (
+    ARCHIVE_SCHEMA,
+    archive_cutoff,
+    archive_key,
+    archived_image_ids,
+    batch_rows,
+    point_geometry,
+    read_archived,
+)
+from app.services.storage import LocalStorage
+
+DAY = datetime.datetime(2023, 3, 1)
+
+
+def _write_archive(storage, tmp_path, key, rows, row_group_size):
+    batch = prediction_archive._record_batch(rows)
+    path = str(tmp_path / "archive.parquet")
+    pq.write_table(pa.Table.from_batches([batch]), path, row_group_size=row_group_size)
+    storage.put_file(key, path)
+    return SimpleNamespace(storage_key=key, image_ids=sorted({row[1] for row in rows}))
+
+
+def test_cutoff_is_a_month_start():
+    cutoff = archive_cutoff(datetime.date(2024, 5, 20))
+    assert cutoff.day == 1 and cutoff.time() == datetime.time()
+    assert cutoff <= datetime.datetime(2024, 5, 20) - datetime.timedelta(
+        days=prediction_archive.PREDICTION_ARCHIVE_AFTER_DAYS
+    )
+    assert archive_key(3, datetime.date(2023, 3, 1), 41) == "predictions/aoi=3/2023-03/41.parquet"
+
+
+def test_read_archived_filters_and_skips_row_groups(tmp_path, monkeypatch):
+    storage = LocalStorage(str(tmp_path / "storage"))
+    monkeypatch.setattr(prediction_archive, "storage", storage)
+    reads = []
+    read_range = storage.read_range
+    monkeypatch.setattr(
+        storage, "read_range", lambda *args: reads.append(args) or read_range(*args)
+    )
+    rows = [
+        # job_id, image_id, timestamp, pixel_value, lon, lat, geometry, in_aoi
+        (1, 10, DAY + datetime.timedelta(days=day), value, 10.0 + day, 50.0, b"wkb", in_aoi)
+        for day in range(10)
+        for value, in_aoi in ((200, True), (30, True), (250, False))
+    ]
+    rows.append((2, 11, DAY + datetime.timedelta(days=2), 220, 0.0, 0.0, b"wkb", True))
+    archive = _write_archive(storage, tmp_path, "predictions/aoi=1/2023-03/10.parquet", rows, 3)
+
+    batches = list(
+        read_archived(
+            [archive],
+            [1],
+            DAY + datetime.timedelta(days=2),
+            DAY + datetime.timedelta(days=4),
+            ["timestamp", "lon", "pixel_value"],
+            min_pixel_value=100,
+        )
+    )
+
+    assert [row for batch in batches for row in batch_rows(batch)] == [
+        (DAY + datetime.timedelta(days=2), 12.0, 200),
+        (DAY + datetime.timedelta(days=3), 13.0, 200),
+    ]
+    # Footer plus the two matching row groups of the 11 in the file.
+    assert len(reads) < 11
+    assert archived_image_ids([archive]) == [10, 11]
+    assert list(read_archived([archive], [], DAY, DAY, ["lon"])) == []
+
+
+def test_read_archived_with_tz_aware_bounds(tmp_path, monkeypatch):
+    storage = LocalStorage(str(tmp_path / "storage"))
+    monkeypatch.setattr(prediction_archive, "storage", storage)
+    rows = [
+        (1, 10, DAY + datetime.timedelta(hours=hour), 200, 10.0 + hour, 50.0, b"wkb", True)
+        for hour in range(4)
+    ]
+    archive = _write_archive(storage, tmp_path, "predictions/aoi=1/2023-03/10.parquet", rows, 2)
+    # 03:00+02:00 is 01:00 UTC.
+    offset = datetime.timezone(datetime.timedelta(hours=2))
+    start = (DAY + datetime.timedelta(hours=3)).replace(tzinfo=offset)
+
+    batches = list(read_archived([archive], [1], start, None, ["lon"]))
+
+    assert [row for batch in batches for row in batch_rows(batch)] == [
+        (11.0,),
+        (12.0,),
+        (13.0,),
+    ]
+
+
+def test_read_archived_without_time_range_or_aoi_filter(tmp_path, monkeypatch):
+    storage = LocalStorage(str(tmp_path / "storage"))
+    monkeypatch.setattr(prediction_archive, "storage", storage)
+    rows = [
+        (1, 10, DAY, 200, 10.0, 50.0, b"wkb", True),
+        (1, 10, DAY + datetime.timedelta(days=20), 250, 11.0, 50.0, b"wkb", False),
+        (2, 11, DAY, 220, 12.0, 50.0, b"wkb", True),
+    ]
+    archive = _write_archive(storage, tmp_path, "predictions/aoi=1/2023-03/10.parquet", rows, 2)
+
+    batches = read_archived(
+        [archive], [1], None, None, ["image_id", "lon"], inside_aoi=False
+    )
+
+    assert [row for batch in batches for row in batch_rows(batch)] == [
+        (10, 10.0),
+        (10, 11.0),
+    ]
+    assert point_geometry(10.1234567891, 50.0) == {
+        "type": "Point",
+        "coordinates": [10.123456789, 50.0],
+    }
+
+
+def test_archive_schema_matches_export_columns():
+    from app.services.export import PREDICTION_SCHEMA
+
+    for field in PREDICTION_SCHEMA:
+        assert ARCHIVE_SCHEMA.field(field.name).type == field.type
@@ -0,0 +1,11 @@
+import datetime
+
+from app.services import purge
+from app.services.purge import retry_delay
+
+
+def test_retry_delay_doubles_with_each_failure(monkeypatch):
+    monkeypatch.setattr(purge, "PURGE_POLL_SECONDS", 5)
+    assert retry_delay(1) == datetime.timedelta(seconds=10)
+    assert retry_delay(2) == datetime.timedelta(seconds=20)
+    assert retry_delay(5) == datetime.timedelta(seconds=160)
@@ -0,0 +1,83 @@
+import morecantile
+import numpy as np
+import pytest
+
+rasterio = pytest.importorskip("rasterio")
+
+from rasterio.transform import from_bounds  # noqa: E402
+
+from app.services import raster_tiles  # noqa: E402
+
+
+def _write_raster(path):
+    data = (np.arange(256 * 256) % 256).astype("uint8").reshape(256, 256)
+    with rasterio.open(
+        path,
+        "w",
+        driver="GTiff",
+        width=256,
+        height=256,
+        count=1,
+        dtype="uint8",
+        crs="EPSG:4326",
+        transform=from_bounds(10, 40, 11, 41, 256, 256),
+        tiled=True,
+        nodata=0,
+    ) as dataset:
+        dataset.write(data, 1)
+
+
+def test_render_tile_from_local_raster(tmp_path, monkeypatch):
+    path = str(tmp_path / "prediction.tif")
+    _write_raster(path)
+    monkeypatch.setattr(raster_tiles.raster_urls, "get", lambda raster_id: path)
+    tile = morecantile.tms.get("WebMercatorQuad").tile(10.5, 40.5, 9)
+
+    png = raster_tiles.render_tile(1, tile.z, tile.x, tile.y)
+
+    assert png.startswith(b"\x89PNG")
+    assert raster_tiles.render_tile(1, 9, 0, 0) is None
+
+
+def test_raster_urls_are_cached_only_while_listening(monkeypatch):
+    rasters = {1: (7, "/rasters/1.tif")}
+    monkeypatch.setattr(raster_tiles, "_lookup_raster", rasters.get)
+    urls = raster_tiles.RasterUrls()
+
+    assert urls.get(1) == "/rasters/1.tif"
+    rasters[1] = (7, "/rasters/moved.tif")
+    assert urls.get(1) == "/rasters/moved.tif"
+
+    urls.listen()
+    assert urls.get(1) == "/rasters/moved.tif"
+    # The job was deleted: only the notification of its AOI hides it.
+    del rasters[1]
+    assert urls.get(1) == "/rasters/moved.tif"
+    urls.mark_changed([8])
+    assert urls.get(1) == "/rasters/moved.tif"
+    urls.mark_changed([7])
+    with pytest.raises(raster_tiles.RasterNotFound):
+        urls.get(1)
+
+
+def test_dataset_cache_evicts_least_recently_used(tmp_path):
+    paths = [str(tmp_path / f"{i}.tif") for i in range(3)]
+    for path in paths:
+        _write_raster(path)
+    cache = raster_tiles.DatasetCache(max_size=2)
+
+    first, _ = cache.get(paths[0])
+    second, _ = cache.get(paths[1])
+    cache.get(paths[0])
+    cache.get(paths[2])
+
+    assert not first.closed
+    assert second.closed
+
+
+def test_local_root_replaces_the_host(monkeypatch):
+    monkeypatch.setattr(raster_tiles, "RASTER_LOCAL_ROOT", "/data/rasters")
+    assert (
+        raster_tiles.resolve_raster_url("https://bucket.s3.amazonaws.com/job/1.tif")
+        == "/data/rasters/job/1.tif"
+    )
@@ -0,0 +1,68 @@
+from app.services.response_cache import ResponseCache
+
+
+def make_cache(max_bytes=100):
+    cache = ResponseCache(max_bytes)
+    cache.enable()
+    return cache
+
+
+def test_disabled_cache_never_hits():
+    cache = ResponseCache(100)
+    cache.set("a", b"body", ("aoi:1",), cache.generation, 1)
+    assert cache.get("a") is None
+
+
+def test_invalidate_by_tag():
+    cache = make_cache()
+    cache.set("a", b"one", ("aoi:1",), cache.generation, 1)
+    cache.set("b", b"two", ("aoi:2",), cache.generation, 1)
+
+    cache.invalidate({"aoi:1"})
+
+    assert cache.get("a") is None
+    assert cache.get("b") == b"two"
+
+
+def test_entry_older_than_the_requested_version_misses():
+    cache = make_cache()
+    cache.set("a", b"v1", ("aoi:1",), cache.generation, 1)
+
+    assert cache.get("a", 1) == b"v1"
+    assert cache.get("a", 2) is None
+    assert cache.get("a") == b"v1"
+
+
+def test_entry_is_served_under_versions_the_listener_covered():
+    cache = make_cache()
+    cache.set("a", b"v1", ("aoi:1",), cache.generation, 1)
+
+    # e.g. ingest for another AOI: evicts nothing, but the version moves on.
+    cache.mark_covered(5)
+    assert cache.get("a", 5) == b"v1"
+    assert cache.get("a", 6) is None
+
+    cache.disable()
+    cache.enable()
+    cache.set("a", b"v5", ("aoi:1",), cache.generation, 5)
+    assert cache.get("a", 6) is None
+
+
+def test_result_computed_before_invalidation_is_not_stored():
+    cache = make_cache()
+    generation = cache.generation
+    cache.invalidate({"aoi:1"})
+    cache.set("a", b"stale", ("aoi:1",), generation, 1)
+    assert cache.get("a") is None
+
+
+def test_least_recently_used_entries_are_evicted_by_size():
+    cache = make_cache(max_bytes=10)
+    cache.set("a", b"12345", (), cache.generation, 1)
+    cache.set("b", b"12345", (), cache.generation, 1)
+    cache.get("a")
+    cache.set("c", b"12345", (), cache.generation, 1)
+
+    assert cache.get("a") == b"12345"
+    assert cache.get("b") is None
+    assert cache.get("c") == b"12345"
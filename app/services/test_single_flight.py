@@ -0,0 +1,120 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from app.services.single_flight import SingleFlight, make_key
+
+
+def test_make_key_ignores_parameter_order():
+    assert make_key("aoi", a=1, b="x") == make_key("aoi", b="x", a=1)
+    assert make_key("aoi", a=1) != make_key("aoi", a=2)
+
+
+def test_concurrent_identical_calls_share_one_execution():
+    calls = []
+
+    def compute(value):
+        calls.append(threading.get_ident())
+        time.sleep(0.05)
+        return value.encode()
+
+    async def scenario():
+        flight = SingleFlight()
+        results = await asyncio.gather(
+            *(flight.do("key", compute, "payload") for _ in range(10))
+        )
+        return results, flight
+
+    results, flight = asyncio.run(scenario())
+
+    assert results == [b"payload"] * 10
+    assert len(calls) == 1
+    assert flight._calls == {}
+
+
+def test_errors_reach_every_waiter():
+    def fail():
+        time.sleep(0.01)
+        raise ValueError("boom")
+
+    async def scenario():
+        flight = SingleFlight()
+        return await asyncio.gather(
+            flight.do("key", fail), flight.do("key", fail), return_exceptions=True
+        )
+
+    results = asyncio.run(scenario())
+
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_sequential_calls_run_again():
+    calls = []
+
+    async def scenario():
+        flight = SingleFlight()
+        await flight.do("key", lambda: calls.append(1) or b"")
+        await asyncio.sleep(0)
+        await flight.do("key", lambda: calls.append(1) or b"")
+
+    asyncio.run(scenario())
+
+    assert len(calls) == 2
+
+
+
+class FakeRequest:
+    def __init__(self, disconnected: bool):
+        self.disconnected = disconnected
+
+    async def is_disconnected(self):
+        return self.disconnected
+
+
+def test_last_disconnecting_waiter_cancels_the_execution():
+    release = threading.Event()
+
+    async def scenario():
+        flight = SingleFlight()
+        waiter = asyncio.ensure_future(
+            flight.do("key", release.wait, request=FakeRequest(True))
+        )
+        await asyncio.sleep(0)
+        call = flight._calls["key"]
+        with pytest.raises(HTTPException) as error:
+            await waiter
+        release.set()
+        await call.task
+        return flight, call, error.value
+
+    flight, call, error = asyncio.run(scenario())
+
+    assert error.status_code == 499
+    assert call.canceller.cancelled
+    assert flight._calls == {}
+
+
+def test_disconnect_does_not_cancel_for_remaining_waiters():
+    def compute():
+        time.sleep(0.8)
+        return b"payload"
+
+    async def scenario():
+        flight = SingleFlight()
+        gone = asyncio.ensure_future(
+            flight.do("key", compute, request=FakeRequest(True))
+        )
+        await asyncio.sleep(0)
+        call = flight._calls["key"]
+        staying = flight.do("key", compute, request=FakeRequest(False))
+        results = await asyncio.gather(gone, staying, return_exceptions=True)
+        return call, results
+
+    call, (gone, staying) = asyncio.run(scenario())
+
+    assert isinstance(gone, HTTPException)
+    assert staying == b"payload"
+    assert not call.canceller.cancelled
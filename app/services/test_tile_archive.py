@@ -0,0 +1,63 @@
+import gzip
+
+from pmtiles.tile import Compression, TileType, zxy_to_tileid
+from pmtiles.writer import Writer
+
+from app.services import tile_archive
+from app.services.storage import LocalStorage
+from app.services.tile_service import get_point_tiles
+
+
+def test_point_tiles_match_morecantile():
+    lon, lat = [12.4924, -70.0], [41.8902, -33.5]
+    for z in (0, 5, 16):
+        expected = {
+            (tile.x, tile.y)
+            for tile in (tile_archive.TMS.tile(x, y, z) for x, y in zip(lon, lat))
+        }
+        assert get_point_tiles(lon, lat, z) == expected
+
+
+def test_tiles_are_read_back_from_storage(tmp_path, monkeypatch):
+    storage = LocalStorage(str(tmp_path / "storage"))
+    monkeypatch.setattr(tile_archive, "storage", storage)
+    tiles = {(0, 0, 0): b"world", (3, 4, 2): b"detail"}
+
+    archive_path = tmp_path / "archive.pmtiles"
+    with open(archive_path, "wb") as f:
+        writer = Writer(f)
+        for (z, x, y), data in sorted(tiles.items(), key=lambda t: zxy_to_tileid(*t[0])):
+            writer.write_tile(zxy_to_tileid(z, x, y), gzip.compress(data))
+        writer.finalize(
+            {"tile_type": TileType.MVT, "tile_compression": Compression.GZIP}, {}
+        )
+    storage.put_file(tile_archive.archive_key(7), str(archive_path))
+    tile_archive.archive_heads.forget([7])
+
+    assert gzip.decompress(tile_archive.read_tile(7, 3, 4, 2)) == b"detail"
+    assert tile_archive.read_tile(7, 3, 0, 0) is None
+    body, size = tile_archive.read_archive_range(7, 0, 6)
+    assert body == b"PMTiles"
+    assert size == archive_path.stat().st_size
+
+
+def test_heads_are_cached_only_while_listening(tmp_path, monkeypatch):
+    storage = LocalStorage(str(tmp_path / "storage"))
+    monkeypatch.setattr(tile_archive, "storage", storage)
+    path = tmp_path / "archive"
+    heads = tile_archive.ArchiveHeads()
+
+    path.write_bytes(b"old")
+    storage.put_file(tile_archive.archive_key(7), str(path))
+    assert heads.get(7) == b"old"
+    path.write_bytes(b"new")
+    storage.put_file(tile_archive.archive_key(7), str(path))
+    assert heads.get(7) == b"new"
+
+    heads.listen()
+    assert heads.get(7) == b"new"
+    path.write_bytes(b"rebuilt")
+    storage.put_file(tile_archive.archive_key(7), str(path))
+    assert heads.get(7) == b"new"
+    heads.forget([7])
+    assert heads.get(7) == b"rebuilt"
@@ -0,0 +1,44 @@
+from app.services import warmup
+from app.services.warmup import Readiness, Warmup
+
+
+def test_failed_steps_are_retried_until_ready(monkeypatch):
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ConnectionError("database is starting up")
+
+    readiness = Readiness()
+    monkeypatch.setattr(warmup, "readiness", readiness)
+    monkeypatch.setattr(warmup, "WARMUP_RETRY_SECONDS", 0)
+    monkeypatch.setattr(warmup, "_steps", lambda: [("pool", flaky), ("noop", lambda: None)])
+
+    worker = Warmup()
+    worker.start()
+    worker.join(timeout=5)
+
+    status = readiness.status()
+    assert status["ready"]
+    assert len(attempts) == 2
+    assert set(status["steps"]) == {"pool", "noop"}
+    assert "seconds" in status["steps"]["pool"]
+
+
+def test_not_ready_while_a_step_fails(monkeypatch):
+    def broken():
+        raise ConnectionError("database unreachable")
+
+    readiness = Readiness()
+    monkeypatch.setattr(warmup, "readiness", readiness)
+    monkeypatch.setattr(warmup, "_steps", lambda: [("pool", broken)])
+
+    worker = Warmup()
+    worker.start()
+    worker.stop()
+    worker.join(timeout=5)
+
+    status = readiness.status()
+    assert not status["ready"]
+    assert status["steps"]["pool"] == {"error": "database unreachable"}
@@ -0,0 +1,416 @@
+"""PMTiles archives of the predictions (and optionally SCL) of completed jobs.
+
+A completed job's predictions never change, so its vector tiles are
+rendered once (PostGIS ST_AsMVT, one statement per tile) into a PMTiles
+archive in object storage. Tiles are then read from the archive with
+byte-range reads and no database access.
+"""
+
+import gzip
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Iterable
+
+from pmtiles.reader import Reader
+from pmtiles.tile import Compression, TileType, tileid_to_zxy, zxy_to_tileid
+from pmtiles.writer import Writer
+from sqlalchemy import func, select, text
+
+from app.config.config import TILE_ARCHIVE_INCLUDE_SCL, TILE_ARCHIVE_POLL_SECONDS
+from app.core.request import TileCoords
+from app.db.connect import Session
+from app.db.models import (
+    AOI,
+    Image,
+    Job,
+    JobStatus,
+    PredictionRaster,
+    PredictionVector,
+    SceneClassificationVector,
+    TileArchive,
+)
+from app.services.storage import storage
+from app.services.tile_service import (
+    TMS,
+    get_point_tiles,
+    get_xy_bbox_from_tile_coords,
+)
+
+logger = logging.getLogger(__name__)
+
+MIN_ZOOM = 0
+MAX_ZOOM = 16
+# SCL polygons are coarse; clients overzoom them past this level.
+SCL_MAX_ZOOM = 12
+MVT_EXTENT = 4096
+# Header and root directory; PMTiles writers keep both within 16 KiB.
+ARCHIVE_HEAD_BYTES = 16384
+# First key of pg_try_advisory_xact_lock(key, job_id) while building.
+_BUILD_LOCK_CLASS = 7301
+PENDING_BATCH = 20
+# Points fetched per round trip while collecting a job's tiles.
+TILE_POINT_BATCH = 50_000
+
+_PREDICTIONS_LAYER_SQL = text(
+    """
+    SELECT ST_AsMVT(tile, 'predictions', :extent, 'geom')
+    FROM (
+        SELECT
+            ST_AsMVTGeom(
+                ST_Transform(points.geometry, 3857),
+                ST_MakeEnvelope(:min_x, :min_y, :max_x, :max_y, 3857),
+                :extent
+            ) AS geom,
+            points.pixel_value,
+            extract(epoch FROM points.timestamp)::bigint AS timestamp,
+            points.image_id
+        FROM (
+            -- The points the read routes serve: inside the AOI, without
+            -- exact duplicates within an image.
+            SELECT DISTINCT
+                prediction_vectors.geometry,
+                prediction_vectors.pixel_value,
+                images.timestamp,
+                images.id AS image_id
+            FROM prediction_vectors
+            JOIN prediction_rasters
+                ON prediction_rasters.id = prediction_vectors.prediction_raster_id
+            JOIN images ON images.id = prediction_rasters.image_id
+            JOIN jobs ON jobs.id = images.job_id
+            JOIN aois ON aois.id = jobs.aoi_id
+            WHERE images.job_id = :job_id
+                AND prediction_vectors.geometry && ST_Transform(
+                    ST_MakeEnvelope(:min_x, :min_y, :max_x, :max_y, 3857), 4326
+                )
+                AND ST_Intersects(prediction_vectors.geometry, aois.geometry)
+        ) points
+    ) tile
+    """
+)
+
+_SCL_LAYER_SQL = text(
+    """
+    SELECT ST_AsMVT(tile, 'scl', :extent, 'geom')
+    FROM (
+        SELECT
+            ST_AsMVTGeom(
+                ST_Transform(scene_classification_vectors.geometry, 3857),
+                ST_MakeEnvelope(:min_x, :min_y, :max_x, :max_y, 3857),
+                :extent
+            ) AS geom,
+            scene_classification_vectors.pixel_value AS classification,
+            images.id AS image_id
+        FROM scene_classification_vectors
+        JOIN images ON images.id = scene_classification_vectors.image_id
+        WHERE images.job_id = :job_id
+            AND scene_classification_vectors.geometry && ST_Transform(
+                ST_MakeEnvelope(:min_x, :min_y, :max_x, :max_y, 3857), 4326
+            )
+    ) tile
+    """
+)
+
+
+def archive_key(job_id: int) -> str:
+    return f"tiles/jobs/{job_id}.pmtiles"
+
+
+def _render_tile(session, job_id: int, z: int, x: int, y: int, include_scl: bool) -> bytes:
+    min_x, min_y, max_x, max_y = get_xy_bbox_from_tile_coords(TileCoords(x=x, y=y, z=z))
+    params = {
+        "job_id": job_id,
+        "extent": MVT_EXTENT,
+        "min_x": min_x,
+        "min_y": min_y,
+        "max_x": max_x,
+        "max_y": max_y,
+    }
+    # MVT layers are independent messages, so concatenated tiles stay valid.
+    tile = bytes(session.execute(_PREDICTIONS_LAYER_SQL, params).scalar() or b"")
+    if include_scl and z <= SCL_MAX_ZOOM:
+        tile += bytes(session.execute(_SCL_LAYER_SQL, params).scalar() or b"")
+    return tile
+
+
+def _job_points(job_id: int):
+    """lon/lat of the job's points inside its AOI, as the tiles render them."""
+    return (
+        select(
+            func.ST_X(PredictionVector.geometry), func.ST_Y(PredictionVector.geometry)
+        )
+        .select_from(PredictionVector)
+        .join(PredictionRaster, PredictionRaster.id == PredictionVector.prediction_raster_id)
+        .join(Image, Image.id == PredictionRaster.image_id)
+        .join(Job, Job.id == Image.job_id)
+        .join(AOI, AOI.id == Job.aoi_id)
+        .where(
+            Image.job_id == job_id,
+            func.ST_Intersects(PredictionVector.geometry, AOI.geometry),
+        )
+    )
+
+
+def _job_tiles(session, job_id: int, include_scl: bool) -> tuple[set, tuple | None]:
+    """Tile ids to render and the lon/lat bounds of the predictions.
+
+    The points are streamed in batches from a server-side cursor, so memory
+    grows with the number of tiles, not of points.
+    """
+    tile_ids = set()
+    bounds = None
+    result = session.execute(
+        _job_points(job_id).execution_options(yield_per=TILE_POINT_BATCH)
+    )
+    for points in result.partitions():
+        lon, lat = zip(*points)
+        for z in range(MIN_ZOOM, MAX_ZOOM + 1):
+            tile_ids.update(
+                zxy_to_tileid(z, x, y) for x, y in get_point_tiles(lon, lat, z)
+            )
+        if bounds is not None:
+            lon += (bounds[0], bounds[2])
+            lat += (bounds[1], bounds[3])
+        bounds = (min(lon), min(lat), max(lon), max(lat))
+
+    if include_scl:
+        extents = (
+            session.query(
+                func.ST_XMin(func.ST_Extent(SceneClassificationVector.geometry)),
+                func.ST_YMin(func.ST_Extent(SceneClassificationVector.geometry)),
+                func.ST_XMax(func.ST_Extent(SceneClassificationVector.geometry)),
+                func.ST_YMax(func.ST_Extent(SceneClassificationVector.geometry)),
+            )
+            .join(Image, Image.id == SceneClassificationVector.image_id)
+            .filter(Image.job_id == job_id)
+            .group_by(Image.id)
+            .all()
+        )
+        for extent in extents:
+            for tile in TMS.tiles(*extent, zooms=range(MIN_ZOOM, SCL_MAX_ZOOM + 1)):
+                tile_ids.add(zxy_to_tileid(tile.z, tile.x, tile.y))
+
+    return tile_ids, bounds
+
+
+def _header(bounds: tuple | None) -> dict:
+    header = {"tile_type": TileType.MVT, "tile_compression": Compression.GZIP}
+    if bounds is not None:
+        header.update(
+            {
+                "min_lon_e7": int(bounds[0] * 1e7),
+                "min_lat_e7": int(bounds[1] * 1e7),
+                "max_lon_e7": int(bounds[2] * 1e7),
+                "max_lat_e7": int(bounds[3] * 1e7),
+            }
+        )
+    return header
+
+
+def _metadata(job_id: int, include_scl: bool) -> dict:
+    layers = [
+        {
+            "id": "predictions",
+            "fields": {"pixel_value": "Number", "timestamp": "Number", "image_id": "Number"},
+            "minzoom": MIN_ZOOM,
+            "maxzoom": MAX_ZOOM,
+        }
+    ]
+    if include_scl:
+        layers.append(
+            {
+                "id": "scl",
+                "fields": {"classification": "Number", "image_id": "Number"},
+                "minzoom": MIN_ZOOM,
+                "maxzoom": SCL_MAX_ZOOM,
+            }
+        )
+    return {"name": f"job-{job_id}", "vector_layers": layers}
+
+
+def build_job_archive(
+    job_id: int, include_scl: bool = TILE_ARCHIVE_INCLUDE_SCL
+) -> TileArchive | None:
+    """Render and store the archive of a completed job.
+
+    Returns None if the job is not (or no longer) completed, or another
+    process is building it right now.
+    """
+    session = Session()
+    try:
+        locked = session.execute(
+            text("SELECT pg_try_advisory_xact_lock(:lock_class, :job_id)"),
+            {"lock_class": _BUILD_LOCK_CLASS, "job_id": job_id},
+        ).scalar()
+        job = session.get(Job, job_id)
+        if (
+            not locked
+            or job is None
+            or job.is_deleted
+            or job.status != JobStatus.COMPLETED
+        ):
+            return None
+
+        tile_ids, bounds = _job_tiles(session, job_id, include_scl)
+        if not tile_ids:
+            # An archive needs at least one tile; an empty one says "no data".
+            tile_ids = {zxy_to_tileid(0, 0, 0)}
+
+        with tempfile.NamedTemporaryFile(suffix=".pmtiles") as archive_file:
+            writer = Writer(archive_file)
+            for tile_id in sorted(tile_ids):
+                z, x, y = tileid_to_zxy(tile_id)
+                tile = _render_tile(session, job_id, z, x, y, include_scl)
+                writer.write_tile(tile_id, gzip.compress(tile, mtime=0))
+            writer.finalize(_header(bounds), _metadata(job_id, include_scl))
+            archive_file.flush()
+            size = os.path.getsize(archive_file.name)
+            storage.put_file(archive_key(job_id), archive_file.name)
+
+        archive = session.merge(
+            TileArchive(
+                job_id=job_id,
+                storage_key=archive_key(job_id),
+                include_scl=include_scl,
+                tile_count=len(tile_ids),
+                size_bytes=size,
+            )
+        )
+        session.commit()
+        archive_heads.forget([job_id])
+        logger.info("Built tile archive for job %s: %s tiles", job_id, len(tile_ids))
+        return archive
+    finally:
+        session.close()
+
+
+def delete_job_archive(session, job_id: int):
+    """Remove the job's archive from storage and its row; the caller commits."""
+    archive = session.get(TileArchive, job_id)
+    if archive is None:
+        return
+    storage.delete(archive.storage_key)
+    session.delete(archive)
+    archive_heads.forget([job_id])
+
+
+def pending_job_ids(limit: int = PENDING_BATCH) -> list[int]:
+    session = Session()
+    try:
+        rows = (
+            session.query(Job.id)
+            .outerjoin(TileArchive, TileArchive.job_id == Job.id)
+            .filter(
+                Job.status == JobStatus.COMPLETED,
+                Job.is_deleted == False,  # noqa <E712>
+                TileArchive.job_id.is_(None),
+            )
+            .order_by(Job.id)
+            .limit(limit)
+            .all()
+        )
+        return [row.id for row in rows]
+    finally:
+        session.close()
+
+
+class TileArchiveWorker(threading.Thread):
+    """Builds the archives of newly completed jobs."""
+
+    def __init__(self):
+        super().__init__(name="tile-archive-worker", daemon=True)
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                for job_id in pending_job_ids():
+                    if self._stop_event.is_set():
+                        break
+                    build_job_archive(job_id)
+            except Exception:
+                logger.exception("Building tile archives failed")
+            self._stop_event.wait(TILE_ARCHIVE_POLL_SECONDS)
+
+
+class ArchiveHeads:
+    """LRU of the first ARCHIVE_HEAD_BYTES of each job's archive.
+
+    Other workers learn about a rebuilt or deleted archive only through the
+    tile_archive_changed notification, so heads are cached only while the
+    change listener (services/cache_invalidation.py) is connected; without
+    it, every tile reads its archive's head again.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._heads: OrderedDict[int, bytes] = OrderedDict()
+        self._listening = False
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, job_id: int) -> bytes:
+        with self._lock:
+            head = self._heads.get(job_id)
+            if head is not None:
+                self._heads.move_to_end(job_id)
+                return head
+            generation = self._generation
+        head = storage.read_range(archive_key(job_id), 0, ARCHIVE_HEAD_BYTES)
+        with self._lock:
+            # Not if the archive may have changed while we read it.
+            if self._listening and generation == self._generation:
+                self._heads[job_id] = head
+                if len(self._heads) > self.max_entries:
+                    self._heads.popitem(last=False)
+        return head
+
+    def forget(self, job_ids: Iterable[int]):
+        with self._lock:
+            self._generation += 1
+            for job_id in job_ids:
+                self._heads.pop(job_id, None)
+
+    def listen(self):
+        with self._lock:
+            self._listening = True
+
+    def stop_listening(self):
+        with self._lock:
+            self._listening = False
+            self._generation += 1
+            self._heads.clear()
+
+
+archive_heads = ArchiveHeads()
+
+
+def read_tile(job_id: int, z: int, x: int, y: int) -> bytes | None:
+    """The gzip-compressed MVT tile, or None for an empty tile.
+
+    Raises ObjectNotFound if the job has no archive.
+    """
+    key = archive_key(job_id)
+    head = archive_heads.get(job_id)
+
+    def get_bytes(offset: int, length: int) -> bytes:
+        if offset + length <= len(head):
+            return head[offset : offset + length]
+        return storage.read_range(key, offset, length)
+
+    return Reader(get_bytes).get(z, x, y)
+
+
+def read_archive_range(job_id: int, start: int, end: int | None) -> tuple[bytes, int]:
+    """Bytes start..end (inclusive) of the archive, and its total size."""
+    key = archive_key(job_id)
+    size = storage.size(key)
+    if start >= size:
+        return b"", size
+    end = size - 1 if end is None else min(end, size - 1)
+    return storage.read_range(key, start, end - start + 1), size
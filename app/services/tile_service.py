@@ -1,10 +1,32 @@
 import morecantile
+import numpy as np
 
 from app.core.request import TileCoords
 
+TMS = morecantile.tms.get("WebMercatorQuad")
+
 
 def get_bbox_from_tile_coords(tile_coords: TileCoords) -> tuple[float, float, float, float]:
-    tms = morecantile.tms.get("WebMercatorQuad")
-    bounds = tms.bounds(morecantile.Tile(**tile_coords.dict()))
+    bounds = TMS.bounds(morecantile.Tile(**tile_coords.dict()))
 
     return bounds.left, bounds.bottom, bounds.right, bounds.top
+
+
+def get_xy_bbox_from_tile_coords(tile_coords: TileCoords) -> tuple[float, float, float, float]:
+    """Tile bounds in web mercator (EPSG:3857) metres."""
+    bounds = TMS.xy_bounds(morecantile.Tile(**tile_coords.dict()))
+
+    return bounds.left, bounds.bottom, bounds.right, bounds.top
+
+
+def get_point_tiles(lon, lat, zoom: int) -> set[tuple[int, int]]:
+    """(x, y) of the WebMercatorQuad tiles containing the points at `zoom`."""
+    lon = np.asarray(lon, dtype=np.float64)
+    lat = np.clip(np.asarray(lat, dtype=np.float64), -85.0511287798, 85.0511287798)
+    n = 2**zoom
+    x = np.floor((lon + 180.0) / 360.0 * n)
+    lat_rad = np.radians(lat)
+    y = np.floor((1.0 - np.arcsinh(np.tan(lat_rad)) / np.pi) / 2.0 * n)
+    x = np.clip(x, 0, n - 1).astype(np.int64)
+    y = np.clip(y, 0, n - 1).astype(np.int64)
+    return set(zip(x.tolist(), y.tolist()))
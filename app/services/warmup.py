@@ -0,0 +1,121 @@
+"""Startup warm-up, and the readiness GET /ready reports.
+
+The first requests of a fresh worker used to pay for opening pool
+connections, loading the PROJ database (determine_utm_epsg, to_crs) and
+compiling the hot SQLAlchemy statements. The Warmup worker does all of it
+at startup and /ready answers 503 until it is done, so the load balancer
+only sends traffic to warm workers. Steps that fail, e.g. because the
+database is not reachable yet, are retried every WARMUP_RETRY_SECONDS.
+
+Route modules register their query warm-ups with @register_warmup: each
+runs the route's statements once with parameters matching (next to)
+nothing, which puts their compiled form into the engine's statement cache.
+"""
+
+import logging
+import threading
+import time
+from typing import Callable
+
+import geopandas as gpd
+from shapely.geometry import box
+
+from app.config.config import AOI_INDEX_ENABLED, WARMUP_RETRY_SECONDS
+from app.db.connect import warm_pool
+from app.services.aoi_index import aoi_index
+from app.services.utils import determine_utm_epsg
+
+logger = logging.getLogger(__name__)
+
+_query_warmups: list[Callable[[], None]] = []
+
+
+def register_warmup(warmup: Callable[[], None]) -> Callable[[], None]:
+    _query_warmups.append(warmup)
+    return warmup
+
+
+def warm_projections():
+    # A small box off Manila Bay, like the AOIs the app serves.
+    polygon = box(120.8, 14.4, 120.9, 14.5)
+    epsg = determine_utm_epsg(
+        source_epsg=4326,
+        west_lon=polygon.bounds[0],
+        south_lat=polygon.bounds[1],
+        east_lon=polygon.bounds[2],
+        north_lat=polygon.bounds[3],
+        contains=True,
+    )
+    gpd.GeoDataFrame(index=[0], crs="EPSG:4326", geometry=[polygon]).to_crs(epsg=epsg)
+
+
+def warm_queries():
+    for warmup in _query_warmups:
+        warmup()
+
+
+def _steps() -> list[tuple[str, Callable[[], None]]]:
+    steps = [
+        ("pool", warm_pool),
+        ("projections", warm_projections),
+        ("queries", warm_queries),
+    ]
+    if AOI_INDEX_ENABLED:
+        steps.append(("aoi-index", aoi_index.reload))
+    return steps
+
+
+class Readiness:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.ready = False
+        # step name -> seconds taken, or the error of its last attempt
+        self.steps: dict[str, dict] = {}
+
+    def record(self, name: str, entry: dict):
+        with self._lock:
+            self.steps[name] = entry
+
+    def mark_ready(self):
+        with self._lock:
+            self.ready = True
+
+    def status(self) -> dict:
+        with self._lock:
+            return {"ready": self.ready, "steps": dict(self.steps)}
+
+
+readiness = Readiness()
+
+
+class Warmup(threading.Thread):
+    """Runs the warm-up steps until all of them succeeded once."""
+
+    def __init__(self):
+        super().__init__(name="warmup", daemon=True)
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        pending = _steps()
+        while pending and not self._stop_event.is_set():
+            failed = []
+            for name, step in pending:
+                start = time.perf_counter()
+                try:
+                    step()
+                except Exception as e:
+                    logger.exception("Warm-up step %s failed", name)
+                    readiness.record(name, {"error": str(e)[:500]})
+                    failed.append((name, step))
+                    continue
+                seconds = round(time.perf_counter() - start, 3)
+                readiness.record(name, {"seconds": seconds})
+            pending = failed
+            if pending:
+                self._stop_event.wait(WARMUP_RETRY_SECONDS)
+        if not pending:
+            readiness.mark_ready()
+            logger.info("Warm-up done: %s", readiness.status()["steps"])
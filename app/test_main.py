@@ -9,3 +9,13 @@ def test_health_status():
     response = client.get("/health")
     assert response.status_code == 200
     assert response.json() == {"message": "Application running"}
+
+
+def test_metrics_exposes_route_latency():
+    client.get("/health")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'http_request_duration_seconds_count{method="GET",route="/health"}' in (
+        response.text
+    )
@@ -0,0 +1,43 @@
+"""Compare two benchmark result files: python -m benchmarks.compare OLD NEW"""
+
+import argparse
+import json
+
+METRICS = ("p50_ms", "p95_ms", "memory_peak_bytes", "response_bytes")
+
+
+def _change(old: float, new: float) -> str:
+    if not old:
+        return "n/a"
+    return f"{(new - old) / old * 100:+.1f}%"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("old")
+    parser.add_argument("new")
+    args = parser.parse_args(argv)
+
+    with open(args.old) as f:
+        old = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    if old["world"] != new["world"]:
+        print("WARNING: the runs used different synthetic worlds")
+
+    old_scenarios = {s["name"]: s for s in old["scenarios"]}
+    print(f"{old.get('revision')} -> {new.get('revision')}")
+    for scenario in new["scenarios"]:
+        before = old_scenarios.get(scenario["name"])
+        if before is None:
+            print(f"{scenario['name']:<32} (new)")
+            continue
+        changes = "  ".join(
+            f"{metric} {_change(before[metric], scenario[metric])}"
+            for metric in METRICS
+        )
+        print(f"{scenario['name']:<32} {changes}")
+
+
+if __name__ == "__main__":
+    main()
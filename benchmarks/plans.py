@@ -0,0 +1,295 @@
+"""EXPLAIN-based regression checks for the queries of the hot read routes.
+
+Each PlanCheck builds a route's query with the route's own query builder
+against a seeded world (benchmarks/seed.py) and runs
+EXPLAIN (FORMAT JSON) on it. A check fails when:
+
+- an index it expects is not used,
+- a table it protects (prediction_vectors by default) is read with a
+  sequential scan,
+- the estimated total cost is over its budget, or more than
+  COST_TOLERANCE times the cost in its snapshot.
+
+The snapshot in benchmarks/plan_snapshots/<name>.json keeps the plan tree
+(node types, tables, indexes) and its cost, and any change to the tree
+fails the check too, as does a missing snapshot. Set
+UPDATE_PLAN_SNAPSHOTS=1 (or pass --update) to record them after an intended
+change, against PostGIS, and commit them.
+
+Usage (resets the configured database, like `benchmarks.run --reset`):
+    python -m benchmarks.plans [--update]
+"""
+
+import argparse
+import datetime
+import fnmatch
+import json
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+
+from sqlalchemy import text
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from app.db.connect import Session, engine
+from app.db.models import Model
+from app.db.partitions import PARTITION_PREFIX
+from app.db.prediction_facts import backfill_prediction_facts
+from app.routes.aoi import DEFAULT_PLASTIC_THRESHOLD, _aoi_centers_query, _query_aois
+from app.routes.job import _jobs_by_aoi_query
+from app.routes.predictions import (
+    _images_by_day_query,
+    _joined_predictions_by_day,
+    _predictions_query,
+    _prediction_facts_by_day,
+)
+from app.routes.scl import _scl_query
+from app.services.utils import parse_bbox
+from benchmarks.scenarios import VIEWPORT_BBOX
+from benchmarks.seed import SeededWorld, WorldConfig, reset_schema, seed_world
+
+SNAPSHOT_DIR = Path(__file__).parent / "plan_snapshots"
+COST_TOLERANCE = 2.0
+# Big enough for the planner to prefer indexes, small enough to seed in CI.
+PLAN_WORLD = WorldConfig(
+    aois=10, jobs_per_aoi=2, images_per_job=5, points_per_image=5_000
+)
+
+
+class Explain(Executable, ClauseElement):
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(Explain, "postgresql")
+def _compile_explain(element, compiler, **kw):
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+
+@dataclass
+class PlanCheck:
+    name: str
+    # (session, world) -> ORM query of the route
+    build: Callable
+    max_cost: float
+    # Index names (fnmatch patterns) the plan must use
+    indexes: tuple = ()
+    # Tables that must not be read with a sequential scan
+    no_seq_scan: tuple = ("prediction_vectors",)
+
+
+def _world_model(session, world: SeededWorld) -> Model:
+    return session.query(Model).filter(Model.model_id == world.model_id).one()
+
+
+def _first_day(world: SeededWorld) -> tuple:
+    first = min(world.image_days[world.aoi_ids[0]])
+    start = first.replace(hour=0, minute=0, second=0, microsecond=0)
+    return start, start + datetime.timedelta(days=1)
+
+
+def _no_geometry(column):
+    return (column,)
+
+
+PLAN_CHECKS = [
+    PlanCheck(
+        "aoi_centers_viewport",
+        lambda session, world: _aoi_centers_query(session, parse_bbox(VIEWPORT_BBOX)),
+        max_cost=5_000,
+    ),
+    PlanCheck(
+        "aoi_by_bbox",
+        lambda session, world: _query_aois(
+            session, parse_bbox(VIEWPORT_BBOX), None, DEFAULT_PLASTIC_THRESHOLD
+        ),
+        max_cost=20_000,
+    ),
+    PlanCheck(
+        "images_by_day",
+        lambda session, world: _images_by_day_query(session, world.aoi_ids[0]),
+        max_cost=5_000,
+    ),
+    PlanCheck(
+        "predictions_by_day_facts",
+        lambda session, world: _prediction_facts_by_day(
+            session,
+            _world_model(session, world),
+            world.aoi_ids[0],
+            *_first_day(world),
+            80,
+            _no_geometry,
+        ),
+        max_cost=10_000,
+        indexes=(f"{PARTITION_PREFIX}*_pkey",),
+    ),
+    PlanCheck(
+        "predictions_by_day_joined",
+        lambda session, world: _joined_predictions_by_day(
+            session,
+            _world_model(session, world),
+            world.aoi_ids[0],
+            *_first_day(world),
+            80,
+            _no_geometry,
+        ),
+        max_cost=50_000,
+        indexes=("ix_prediction_vectors_prediction_raster_id",),
+    ),
+    PlanCheck(
+        # A LIMIT over any scan order is fine here; only its cost counts.
+        "predictions_limit_10000",
+        lambda session, world: _predictions_query(session, 10_000),
+        max_cost=50_000,
+        no_seq_scan=(),
+    ),
+    PlanCheck(
+        "jobs_by_aoi",
+        lambda session, world: _jobs_by_aoi_query(session, world.aoi_ids[0], None),
+        max_cost=100_000,
+        indexes=("ix_prediction_vectors_prediction_raster_id",),
+    ),
+    PlanCheck(
+        "scl_by_day",
+        lambda session, world: _scl_query(
+            session, None, world.aoi_ids[0], *_first_day(world)
+        ),
+        max_cost=20_000,
+        indexes=("scene_classification_vectors_image_id_brin",),
+        no_seq_scan=("prediction_vectors", "scene_classification_vectors"),
+    ),
+]
+
+
+def prepare_database(config: WorldConfig = PLAN_WORLD) -> SeededWorld:
+    """Reset the schema, seed a world and refresh the planner statistics."""
+    reset_schema(engine)
+    session = Session()
+    try:
+        world = seed_world(session, config)
+    finally:
+        session.close()
+    while backfill_prediction_facts():
+        pass
+    with engine.connect() as conn:
+        conn.execution_options(isolation_level="AUTOCOMMIT").execute(text("ANALYZE"))
+    return world
+
+
+def explain(session, query) -> dict:
+    """The root plan node of EXPLAIN (FORMAT JSON) for an ORM query."""
+    return session.execute(Explain(query.statement)).scalar_one()[0]["Plan"]
+
+
+def _nodes(plan: dict):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from _nodes(child)
+
+
+def _table(relation: str) -> str:
+    """The partitioned table a partition belongs to, or relation itself."""
+    suffix = relation[len(PARTITION_PREFIX):]
+    if relation.startswith(PARTITION_PREFIX) and suffix.isdigit():
+        return PARTITION_PREFIX.rstrip("_")
+    return relation
+
+
+def plan_tree(plan: dict) -> dict:
+    """The plan without estimates: what a snapshot compares."""
+    node = {"node": plan["Node Type"]}
+    if "Relation Name" in plan:
+        node["relation"] = _table(plan["Relation Name"])
+    if "Index Name" in plan:
+        node["index"] = plan["Index Name"]
+    children = [plan_tree(child) for child in plan.get("Plans", [])]
+    if children:
+        node["plans"] = children
+    return node
+
+
+def check_plan(check: PlanCheck, plan: dict) -> list[str]:
+    problems = []
+    used = {node["Index Name"] for node in _nodes(plan) if "Index Name" in node}
+    for pattern in check.indexes:
+        if not fnmatch.filter(used, pattern):
+            problems.append(
+                f"index {pattern} not used (used: {sorted(used) or 'none'})"
+            )
+    for node in _nodes(plan):
+        if (
+            node["Node Type"] == "Seq Scan"
+            and _table(node["Relation Name"]) in check.no_seq_scan
+        ):
+            problems.append(f"sequential scan on {node['Relation Name']}")
+    cost = plan["Total Cost"]
+    if cost > check.max_cost:
+        problems.append(f"estimated cost {cost} over the budget of {check.max_cost}")
+    return problems
+
+
+def snapshot_path(name: str) -> Path:
+    return SNAPSHOT_DIR / f"{name}.json"
+
+
+def update_requested() -> bool:
+    return os.environ.get("UPDATE_PLAN_SNAPSHOTS") == "1"
+
+
+def compare_snapshot(check: PlanCheck, plan: dict, update: bool = False) -> list[str]:
+    """Differences from the stored snapshot; only update writes it."""
+    path = snapshot_path(check.name)
+    current = {"total_cost": plan["Total Cost"], "plan": plan_tree(plan)}
+    if update:
+        SNAPSHOT_DIR.mkdir(exist_ok=True)
+        path.write_text(json.dumps(current, indent=2) + "\n")
+        return []
+    if not path.exists():
+        return [f"no snapshot {path.name}; record it with UPDATE_PLAN_SNAPSHOTS=1"]
+    stored = json.loads(path.read_text())
+    problems = []
+    if current["plan"] != stored["plan"]:
+        problems.append(
+            f"plan differs from {path.name}:\n"
+            + json.dumps(current["plan"], indent=2)
+        )
+    if current["total_cost"] > stored["total_cost"] * COST_TOLERANCE:
+        problems.append(
+            f"estimated cost {current['total_cost']} is over {COST_TOLERANCE}x "
+            f"the snapshot's {stored['total_cost']}"
+        )
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--update", action="store_true", help="Rewrite the snapshots")
+    args = parser.parse_args(argv)
+
+    world = prepare_database()
+    failed = False
+    session = Session()
+    try:
+        for check in PLAN_CHECKS:
+            plan = explain(session, check.build(session, world))
+            problems = check_plan(check, plan) + compare_snapshot(
+                check, plan, args.update or update_requested()
+            )
+            failed = failed or bool(problems)
+            print(
+                f"{check.name:<28} cost {plan['Total Cost']:>12.2f}  "
+                f"{'FAIL' if problems else 'ok'}"
+            )
+            for problem in problems:
+                print(f"    {problem}")
+    finally:
+        session.close()
+    raise SystemExit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
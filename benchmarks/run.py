@@ -0,0 +1,153 @@
+"""Seed a synthetic world and time every read endpoint against it.
+
+Usage:
+    python -m benchmarks.run --aois 20 --points-per-image 5000 --output results.json
+    python -m benchmarks.compare before.json after.json
+
+The database configured through the usual DB_* environment variables is
+written to, so point it at a local PostGIS. Use --reset for runs that
+should be comparable, otherwise every run adds another world.
+"""
+
+import argparse
+import datetime
+import json
+import math
+import subprocess
+import time
+import tracemalloc
+
+from fastapi.testclient import TestClient
+
+from app.db.connect import Session, engine
+from app.main import app
+from benchmarks.scenarios import build_scenarios
+from benchmarks.seed import WorldConfig, reset_schema, seed_world
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    rank = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[rank]
+
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_scenario(client: TestClient, scenario, repeat: int, warmup: int) -> dict:
+    for _ in range(warmup):
+        client.get(scenario.path)
+
+    latencies = []
+    status_code = None
+    response_bytes = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.get(scenario.path)
+        latencies.append(time.perf_counter() - start)
+        status_code = response.status_code
+        response_bytes = len(response.content)
+
+    # Separate pass: tracemalloc slows allocation-heavy code too much to
+    # share a run with the latency measurements.
+    tracemalloc.start()
+    client.get(scenario.path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "name": scenario.name,
+        "path": scenario.path,
+        "status_code": status_code,
+        "repeat": repeat,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "max_ms": round(max(latencies) * 1000, 2),
+        "memory_peak_bytes": peak,
+        "response_bytes": response_bytes,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--aois", type=int, default=WorldConfig.aois)
+    parser.add_argument("--jobs-per-aoi", type=int, default=WorldConfig.jobs_per_aoi)
+    parser.add_argument(
+        "--images-per-job", type=int, default=WorldConfig.images_per_job
+    )
+    parser.add_argument(
+        "--points-per-image", type=int, default=WorldConfig.points_per_image
+    )
+    parser.add_argument(
+        "--scl-per-image", type=int, default=WorldConfig.scl_polygons_per_image
+    )
+    parser.add_argument("--seed", type=int, default=WorldConfig.seed)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument(
+        "--reset",
+        action="store_true",
+        help="Drop and recreate all tables before seeding. Destroys existing data.",
+    )
+    parser.add_argument("--only", nargs="*", help="Run only these scenario names")
+    parser.add_argument("--output", default="bench_results.json")
+    args = parser.parse_args(argv)
+
+    config = WorldConfig(
+        aois=args.aois,
+        jobs_per_aoi=args.jobs_per_aoi,
+        images_per_job=args.images_per_job,
+        points_per_image=args.points_per_image,
+        scl_polygons_per_image=args.scl_per_image,
+        seed=args.seed,
+    )
+    if args.reset:
+        reset_schema(engine)
+
+    session = Session()
+    try:
+        seed_start = time.perf_counter()
+        world = seed_world(session, config)
+        seed_seconds = time.perf_counter() - seed_start
+    finally:
+        session.close()
+
+    client = TestClient(app)
+    results = []
+    for scenario in build_scenarios(world):
+        if args.only and scenario.name not in args.only:
+            continue
+        result = run_scenario(client, scenario, args.repeat, args.warmup)
+        results.append(result)
+        print(
+            f"{result['name']:<32} p50 {result['p50_ms']:>9.2f} ms  "
+            f"p95 {result['p95_ms']:>9.2f} ms  "
+            f"peak {result['memory_peak_bytes'] / 1e6:>8.1f} MB  "
+            f"size {result['response_bytes'] / 1e3:>10.1f} kB  "
+            f"[{result['status_code']}]"
+        )
+
+    report = {
+        "revision": _git_revision(),
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "world": config.to_dict(),
+        "seed_seconds": round(seed_seconds, 2),
+        "scenarios": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
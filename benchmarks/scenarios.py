@@ -0,0 +1,45 @@
+from dataclasses import dataclass
+
+from app.constants.geo import WORLD_WIDE_BBOX
+from benchmarks.seed import SeededWorld
+
+
+@dataclass
+class Scenario:
+    name: str
+    path: str
+
+
+# A viewport over the first coastal anchor, large enough to hold a few AOIs.
+VIEWPORT_BBOX = "120.0,13.5,122.0,15.5"
+
+
+def build_scenarios(world: SeededWorld) -> list[Scenario]:
+    aoi_id = world.aoi_ids[0]
+    job_id = world.job_ids[0]
+    first_image = min(world.image_days[aoi_id])
+    day = int(first_image.replace(hour=0, minute=0, second=0).timestamp())
+    return [
+        Scenario("aoi_centers_world", f"/aoi-centers?bbox={WORLD_WIDE_BBOX['query_str']}"),
+        Scenario("aoi_centers_viewport", f"/aoi-centers?bbox={VIEWPORT_BBOX}"),
+        Scenario("aoi_by_bbox", f"/aoi?bbox={VIEWPORT_BBOX}"),
+        Scenario("aoi_by_id", f"/aoi?id={aoi_id}"),
+        Scenario("images_by_day", f"/images-by-day?aoiId={aoi_id}"),
+        Scenario(
+            "predictions_by_day",
+            f"/predictions-by-day-and-aoi?day={day}&aoi_id={aoi_id}&model_id={world.model_id}",
+        ),
+        Scenario(
+            "predictions_by_day_accuracy_80",
+            f"/predictions-by-day-and-aoi?day={day}&aoi_id={aoi_id}"
+            f"&model_id={world.model_id}&accuracy_limit=80",
+        ),
+        Scenario("predictions_limit_10000", "/predictions?limit=10000"),
+        Scenario("jobs_by_aoi", f"/jobs?aoiId={aoi_id}"),
+        Scenario("job_by_id", f"/jobs/{job_id}"),
+        Scenario(
+            "scl_by_day",
+            f"/scl?aoi_id={aoi_id}&timestamp={first_image.date().isoformat()}",
+        ),
+        Scenario("models", "/model"),
+    ]
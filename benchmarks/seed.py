@@ -0,0 +1,304 @@
+"""Synthetic world generator used to seed a local PostGIS for benchmarks."""
+
+import datetime
+import math
+import random
+from dataclasses import asdict, dataclass
+
+from sqlalchemy import insert
+
+from app.db.models import (
+    AOI,
+    Band,
+    Base,
+    Image,
+    Job,
+    JobStatus,
+    Model,
+    ModelType,
+    PredictionRaster,
+    PredictionVector,
+    Satellite,
+    SceneClassificationVector,
+)
+from app.db.notifications import install_notify_triggers
+from app.db.partitions import install_partitioning
+from app.db.prediction_facts import install_prediction_facts_triggers
+from app.db.raster_stats import install_raster_stats_triggers
+from app.db.versioning import install_version_triggers
+from app.types.helpers import SCL
+
+SATELLITE_NAME = "BENCH_SENTINEL2_L2A"
+SEGMENTATION_MODEL_ID = "bench/segmentation:1.0.0"
+PIXEL_DEG = 10 / 111_320  # ~10 m pixel at the equator
+INSERT_CHUNK = 10_000
+
+# Coastal places where floating debris is actually monitored.
+COASTAL_ANCHORS = [
+    (120.85, 14.50),  # Manila Bay
+    (-58.40, -34.80),  # Rio de la Plata
+    (90.20, 21.80),  # Bay of Bengal
+    (106.70, -6.00),  # Jakarta Bay
+    (-88.20, 15.90),  # Gulf of Honduras
+    (3.20, 6.35),  # Lagos lagoon
+    (14.20, 40.80),  # Bay of Naples
+    (-17.40, 14.70),  # Dakar
+    (121.50, 31.20),  # Yangtze estuary
+    (-79.90, -2.20),  # Gulf of Guayaquil
+]
+
+SCL_WEIGHTS = {
+    SCL.WATER: 0.6,
+    SCL.CLOUD_MEDIUM_PROB: 0.1,
+    SCL.CLOUD_HIGH_PROB: 0.1,
+    SCL.THIN_CIRRUS: 0.05,
+    SCL.CLOUD_SHADOWS: 0.05,
+    SCL.NOT_VEGETATED: 0.05,
+    SCL.VEGETATION: 0.05,
+}
+
+
+@dataclass
+class WorldConfig:
+    aois: int = 10
+    jobs_per_aoi: int = 2
+    images_per_job: int = 5
+    points_per_image: int = 2_000
+    scl_polygons_per_image: int = 50
+    seed: int = 42
+    start_date: datetime.date = datetime.date(2024, 1, 1)
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        data["start_date"] = self.start_date.isoformat()
+        return data
+
+
+@dataclass
+class SeededWorld:
+    aoi_ids: list
+    job_ids: list
+    image_days: dict  # aoi_id -> list of image timestamps
+    model_id: str
+
+
+def _ewkt_polygon(coords) -> str:
+    ring = ", ".join(f"{x} {y}" for x, y in coords)
+    return f"SRID=4326;POLYGON(({ring}))"
+
+
+def _aoi_polygon(rng: random.Random, lon: float, lat: float, radius_km: float):
+    """Irregular polygon of roughly radius_km around (lon, lat), closed ring."""
+    deg_lat = radius_km / 111.32
+    deg_lon = deg_lat / max(math.cos(math.radians(lat)), 0.1)
+    vertices = []
+    for i in range(10):
+        angle = 2 * math.pi * i / 10
+        scale = rng.uniform(0.7, 1.0)
+        vertices.append(
+            (
+                lon + math.cos(angle) * deg_lon * scale,
+                lat + math.sin(angle) * deg_lat * scale,
+            )
+        )
+    vertices.append(vertices[0])
+    return vertices
+
+
+def _bounds(coords):
+    xs = [x for x, _ in coords]
+    ys = [y for _, y in coords]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def _box(min_x, min_y, max_x, max_y):
+    return [
+        (min_x, min_y),
+        (max_x, min_y),
+        (max_x, max_y),
+        (min_x, max_y),
+        (min_x, min_y),
+    ]
+
+
+def _prediction_rows(rng, bounds, count, raster_id):
+    """Points snapped to the pixel grid, clustered in a few debris patches."""
+    min_x, min_y, max_x, max_y = bounds
+    patches = [
+        (rng.uniform(min_x, max_x), rng.uniform(min_y, max_y))
+        for _ in range(max(1, count // 500))
+    ]
+    spread = (max_x - min_x) / 20
+    rows = []
+    for _ in range(count):
+        cx, cy = rng.choice(patches)
+        x = min(max(rng.gauss(cx, spread), min_x), max_x)
+        y = min(max(rng.gauss(cy, spread), min_y), max_y)
+        x = round(x / PIXEL_DEG) * PIXEL_DEG
+        y = round(y / PIXEL_DEG) * PIXEL_DEG
+        rows.append(
+            {
+                "pixel_value": int(rng.betavariate(2, 5) * 255),
+                "geometry": f"SRID=4326;POINT({x} {y})",
+                "prediction_raster_id": raster_id,
+            }
+        )
+    return rows
+
+
+def _scl_rows(rng, bounds, count, image_id):
+    min_x, min_y, max_x, max_y = bounds
+    classes = list(SCL_WEIGHTS)
+    weights = list(SCL_WEIGHTS.values())
+    size = 20 * PIXEL_DEG
+    rows = []
+    for _ in range(count):
+        x = rng.uniform(min_x, max_x - size)
+        y = rng.uniform(min_y, max_y - size)
+        rows.append(
+            {
+                "pixel_value": int(rng.choices(classes, weights)[0]),
+                "geometry": _ewkt_polygon(_box(x, y, x + size, y + size)),
+                "image_id": image_id,
+            }
+        )
+    return rows
+
+
+def _bulk_insert(session, model, rows):
+    for i in range(0, len(rows), INSERT_CHUNK):
+        session.execute(insert(model), rows[i : i + INSERT_CHUNK])
+
+
+def reset_schema(engine):
+    """Drop and recreate the schema as app/__init__.py installs it, with the
+    triggers, partitions and indexes that are not part of the models."""
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    install_version_triggers(engine)
+    install_notify_triggers(engine)
+    install_raster_stats_triggers(engine)
+    install_prediction_facts_triggers(engine)
+    install_partitioning(engine)
+
+
+def _reference_data(session):
+    satellite = session.query(Satellite).filter_by(name=SATELLITE_NAME).one_or_none()
+    if satellite is None:
+        satellite = Satellite(name=SATELLITE_NAME)
+        session.add(satellite)
+        session.flush()
+        session.add(
+            Band(
+                satellite_id=satellite.id,
+                index=1,
+                name="B01",
+                description="Coastal aerosol",
+                resolution=60.0,
+                wavelength="443nm",
+            )
+        )
+    model = session.query(Model).filter_by(model_id=SEGMENTATION_MODEL_ID).one_or_none()
+    if model is None:
+        model = Model(
+            model_id=SEGMENTATION_MODEL_ID,
+            model_url="http://localhost/bench-model",
+            expected_image_height=480,
+            expected_image_width=480,
+            type=ModelType.SEGMENTATION,
+            output_dtype="uint8",
+        )
+        session.add(model)
+        session.flush()
+    return satellite, model
+
+
+def seed_world(session, config: WorldConfig) -> SeededWorld:
+    rng = random.Random(config.seed)
+    satellite, model = _reference_data(session)
+
+    world = SeededWorld(
+        aoi_ids=[], job_ids=[], image_days={}, model_id=model.model_id
+    )
+    for aoi_index in range(config.aois):
+        anchor_lon, anchor_lat = COASTAL_ANCHORS[aoi_index % len(COASTAL_ANCHORS)]
+        lon = anchor_lon + rng.uniform(-0.5, 0.5)
+        lat = anchor_lat + rng.uniform(-0.5, 0.5)
+        polygon = _aoi_polygon(rng, lon, lat, radius_km=rng.uniform(2, 7))
+        aoi = AOI(name=f"bench-aoi-{aoi_index}", geometry=_ewkt_polygon(polygon))
+        session.add(aoi)
+        session.flush()
+        world.aoi_ids.append(aoi.id)
+        world.image_days[aoi.id] = []
+
+        pad = 0.01
+        min_x, min_y, max_x, max_y = _bounds(polygon)
+        image_bounds = (min_x - pad, min_y - pad, max_x + pad, max_y + pad)
+        image_bbox = _ewkt_polygon(_box(*image_bounds))
+
+        for job_index in range(config.jobs_per_aoi):
+            job_start = datetime.datetime.combine(
+                config.start_date, datetime.time()
+            ) + datetime.timedelta(days=31 * job_index)
+            job = Job(
+                start_date=job_start,
+                end_date=job_start + datetime.timedelta(days=30),
+                maxcc=0.1,
+                aoi_id=aoi.id,
+                model_id=model.id,
+                status=JobStatus.COMPLETED,
+            )
+            session.add(job)
+            session.flush()
+            world.job_ids.append(job.id)
+
+            for image_index in range(config.images_per_job):
+                timestamp = job_start + datetime.timedelta(
+                    days=image_index * 30 / max(config.images_per_job, 1),
+                    hours=10,
+                    minutes=rng.randint(0, 59),
+                )
+                image = Image(
+                    satellite_id=satellite.id,
+                    image_id=f"bench-{aoi.id}-{job.id}-{image_index}",
+                    image_url=f"http://localhost/images/{aoi.id}/{job.id}/{image_index}.tif",
+                    timestamp=timestamp,
+                    dtype="uint16",
+                    crs=4326,
+                    resolution=10.0,
+                    image_width=480,
+                    image_height=480,
+                    bbox=image_bbox,
+                    job_id=job.id,
+                )
+                session.add(image)
+                session.flush()
+                world.image_days[aoi.id].append(timestamp)
+
+                raster = PredictionRaster(
+                    raster_url=f"http://localhost/predictions/{image.id}.tif",
+                    dtype="uint8",
+                    image_width=480,
+                    image_height=480,
+                    bbox=image_bbox,
+                    image_id=image.id,
+                )
+                session.add(raster)
+                session.flush()
+
+                _bulk_insert(
+                    session,
+                    PredictionVector,
+                    _prediction_rows(
+                        rng, image_bounds, config.points_per_image, raster.id
+                    ),
+                )
+                _bulk_insert(
+                    session,
+                    SceneClassificationVector,
+                    _scl_rows(
+                        rng, image_bounds, config.scl_polygons_per_image, image.id
+                    ),
+                )
+        session.commit()
+    return world
@@ -0,0 +1,103 @@
+"""Query plan regression tests, see benchmarks/plans.py.
+
+test_query_plan resets and seeds the configured database, so it only runs
+with PLAN_TESTS=1 (against a local or CI PostGIS).
+"""
+
+import os
+
+import pytest
+
+from app.db.connect import Session
+from benchmarks import plans
+from benchmarks.plans import (
+    PLAN_CHECKS,
+    PlanCheck,
+    check_plan,
+    compare_snapshot,
+    explain,
+    plan_tree,
+    prepare_database,
+    update_requested,
+)
+
+RUN_PLAN_TESTS = os.environ.get("PLAN_TESTS") == "1"
+
+SEQ_SCAN_PLAN = {
+    "Node Type": "Limit",
+    "Total Cost": 120.0,
+    "Plans": [
+        {
+            "Node Type": "Seq Scan",
+            "Relation Name": "prediction_vectors",
+            "Total Cost": 100.0,
+        },
+        {
+            "Node Type": "Index Scan",
+            "Relation Name": "prediction_facts_202401",
+            "Index Name": "prediction_facts_202401_pkey",
+            "Total Cost": 20.0,
+        },
+    ],
+}
+
+
+def test_check_plan_reports_seq_scans_missing_indexes_and_cost():
+    check = PlanCheck(
+        "example",
+        build=None,
+        max_cost=100,
+        indexes=("prediction_facts_*_pkey", "ix_prediction_vectors_prediction_raster_id"),
+    )
+    assert check_plan(check, SEQ_SCAN_PLAN) == [
+        "index ix_prediction_vectors_prediction_raster_id not used "
+        "(used: ['prediction_facts_202401_pkey'])",
+        "sequential scan on prediction_vectors",
+        "estimated cost 120.0 over the budget of 100",
+    ]
+
+
+def test_plan_tree_drops_estimates_and_partition_months():
+    assert plan_tree(SEQ_SCAN_PLAN) == {
+        "node": "Limit",
+        "plans": [
+            {"node": "Seq Scan", "relation": "prediction_vectors"},
+            {
+                "node": "Index Scan",
+                "relation": "prediction_facts",
+                "index": "prediction_facts_202401_pkey",
+            },
+        ],
+    }
+
+
+def test_missing_snapshot_fails_unless_updating(tmp_path, monkeypatch):
+    monkeypatch.setattr(plans, "SNAPSHOT_DIR", tmp_path)
+    check = PlanCheck("example", build=None, max_cost=100)
+
+    assert compare_snapshot(check, SEQ_SCAN_PLAN) == [
+        "no snapshot example.json; record it with UPDATE_PLAN_SNAPSHOTS=1"
+    ]
+    assert not (tmp_path / "example.json").exists()
+
+    assert compare_snapshot(check, SEQ_SCAN_PLAN, update=True) == []
+    assert compare_snapshot(check, SEQ_SCAN_PLAN) == []
+
+
+@pytest.fixture(scope="module")
+def world():
+    return prepare_database()
+
+
+@pytest.mark.skipif(not RUN_PLAN_TESTS, reason="set PLAN_TESTS=1 to run")
+@pytest.mark.parametrize("check", PLAN_CHECKS, ids=lambda check: check.name)
+def test_query_plan(world, check):
+    session = Session()
+    try:
+        plan = explain(session, check.build(session, world))
+    finally:
+        session.close()
+    problems = check_plan(check, plan) + compare_snapshot(
+        check, plan, update_requested()
+    )
+    assert not problems, "\n".join(problems)